@@ -4,10 +4,14 @@ from fastapi.responses import JSONResponse
 import os
 import time
 from datetime import datetime
-from typing import Dict
+from app.api.rate_limit import get_rate_limiter
 from app.api.routes import router
+from app.ingestion.jobs import get_job_manager
 from app.config import get_settings
 from app.utils.logger import setup_logger, get_logger
+from app.utils.deadline import Deadline
+from app.utils.metrics import HTTP_REQUEST_DURATION
+from app.utils.tracing import current_trace_id, extract_context, mark_error, set_attributes, setup_tracing, shutdown_tracing, span
 
 setup_logger()
 logger = get_logger(__name__)
@@ -31,45 +35,28 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Rate limiting simples (em memória)
-rate_limit_store: Dict[str, list] = {}
-
-
 @app.middleware("http")
 async def rate_limit_middleware(request: Request, call_next):
-    """Rate limiting básico"""
-    settings = get_settings()
-    client_ip = request.client.host if request.client else "unknown"
-    
-    now = time.time()
-    if client_ip not in rate_limit_store:
-        rate_limit_store[client_ip] = []
-    
-    # Limpar requisições antigas
-    rate_limit_store[client_ip] = [
-        t for t in rate_limit_store[client_ip]
-        if now - t < 60
-    ]
-    
-    # Verificar limite
-    if len(rate_limit_store[client_ip]) >= settings.rate_limit_per_minute:
+    """Rate limiting por rota e por IP / API key (token bucket)"""
+    decision = await get_rate_limiter().check(request)
+    if not decision.allowed:
         return JSONResponse(
             status_code=429,
-            content={"error": "Rate limit exceeded"}
+            content={"error": "Rate limit exceeded"},
+            headers=decision.headers()
         )
     
-    # Registrar requisição
-    rate_limit_store[client_ip].append(now)
-    
     response = await call_next(request)
+    response.headers.update(decision.headers())
     return response
 
 
 @app.middleware("http")
 async def timeout_middleware(request: Request, call_next):
-    """Timeout middleware"""
+    """Cria o prazo da requisição (API_TIMEOUT), propagado pelas rotas ao pipeline"""
     settings = get_settings()
     start_time = time.time()
+    request.state.deadline = Deadline(settings.api_timeout)
     
     try:
         response = await call_next(request)
@@ -84,6 +71,46 @@ async def timeout_middleware(request: Request, call_next):
         raise
 
 
+@app.middleware("http")
+async def metrics_middleware(request: Request, call_next):
+    """Latência por rota (inclui respostas 429 do rate limit)"""
+    start_time = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        # Template da rota ("/reindex/jobs/{job_id}"), não o path: cardinalidade limitada
+        route = request.scope.get("route")
+        HTTP_REQUEST_DURATION.labels(
+            method=request.method,
+            route=getattr(route, "path", "unmatched"),
+            status=str(status)
+        ).observe(time.perf_counter() - start_time)
+
+
+@app.middleware("http")
+async def tracing_middleware(request: Request, call_next):
+    """Span raiz da requisição (continua o trace do cliente se vier traceparent)"""
+    with span(
+        f"{request.method} {request.url.path}",
+        context=extract_context(request.headers),
+        **{"http.method": request.method, "http.target": request.url.path}
+    ) as current:
+        response = await call_next(request)
+        route = request.scope.get("route")
+        if route is not None and current is not None:
+            current.update_name(f"{request.method} {route.path}")
+        set_attributes(current, **{"http.route": getattr(route, "path", None), "http.status_code": response.status_code})
+        if response.status_code >= 500:
+            mark_error(current, f"HTTP {response.status_code}")
+        trace_id = current_trace_id()
+        if trace_id:
+            response.headers["X-Trace-Id"] = trace_id
+        return response
+
+
 # Incluir rotas
 app.include_router(router)
 
@@ -91,11 +118,19 @@ app.include_router(router)
 @app.on_event("startup")
 async def startup_event():
     """Inicialização da aplicação"""
+    # Por processo: com gunicorn --preload, o import acontece no master, mas a
+    # thread do BatchSpanProcessor precisa existir em cada worker
+    setup_tracing()
+    # Worker de reindexação em cada processo: reivindica jobs enfileirados por
+    # qualquer worker, inclusive por um que morreu antes de executá-los
+    get_job_manager().start()
     logger.info("Aplicação iniciada", timestamp=datetime.now().isoformat())
 
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """Finalização da aplicação"""
+    get_job_manager().shutdown()
+    shutdown_tracing()
     logger.info("Aplicação finalizada", timestamp=datetime.now().isoformat())
 
@@ -0,0 +1,259 @@
+"""
+Rate limiting da API.
+
+- Token bucket por chave (O(1) por requisição: só tokens + timestamp)
+- Orçamentos separados por rota (/chat, /health, /reindex, /reindex/jobs,
+  demais) e por identidade (header X-API-Key quando presente, senão IP do
+  cliente)
+- Limites próprios por API key e rota (RATE_LIMIT_API_KEYS): "chave:rota:limite"
+  vale só para a regra `rota`; "chave:limite" vale para /chat e demais rotas.
+  Rotas sem limite da chave (ex: /reindex) mantêm o limite da regra
+- Backend plugável:
+  - memória (padrão): buckets ociosos são descartados, sem crescimento
+    ilimitado com IPs únicos; limite vale por processo/worker
+  - Redis (RATE_LIMIT_BACKEND=redis): limite compartilhado entre workers;
+    requer o pacote redis
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+from fastapi import Request
+from app.config import get_settings
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Redis (opcional)
+try:
+    import redis.asyncio as redis_asyncio
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+
+API_KEY_HEADER = "X-API-Key"
+
+# Regras que "chave:limite" (sem rota) alcança; as demais exigem "chave:rota:limite"
+API_KEY_DEFAULT_RULES = ("chat", "default")
+
+
+@dataclass(frozen=True)
+class RateLimitRule:
+    """Orçamento de uma rota: limit requisições por window_seconds"""
+    name: str
+    limit: int
+    window_seconds: float = 60.0
+
+
+@dataclass(frozen=True)
+class RateLimitDecision:
+    allowed: bool
+    limit: int
+    remaining: int
+    retry_after: float
+    
+    def headers(self) -> Dict[str, str]:
+        headers = {
+            "X-RateLimit-Limit": str(self.limit),
+            "X-RateLimit-Remaining": str(self.remaining),
+        }
+        if not self.allowed:
+            headers["Retry-After"] = str(max(1, int(self.retry_after + 0.999)))
+        return headers
+
+
+class InMemoryBackend:
+    """
+    Token buckets em memória (por processo).
+    
+    Buckets ficam em um OrderedDict por ordem de uso; os que ficaram ociosos
+    por idle_seconds (tempo para encher de novo, ou seja, equivalentes a um
+    bucket novo) são descartados, e max_keys limita a memória no pior caso.
+    """
+    
+    def __init__(self, idle_seconds: float = 300.0, max_keys: int = 100_000):
+        self.idle_seconds = idle_seconds
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def __len__(self) -> int:
+        return len(self._buckets)
+    
+    def _evict(self, now: float):
+        while self._buckets:
+            key, (_, updated) = next(iter(self._buckets.items()))
+            if now - updated < self.idle_seconds and len(self._buckets) <= self.max_keys:
+                break
+            del self._buckets[key]
+    
+    async def take(self, key: str, capacity: int, refill_per_second: float, now: float) -> Tuple[bool, float]:
+        """Consome um token; retorna (permitido, tokens restantes)"""
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (float(capacity), now))
+            tokens = min(float(capacity), tokens + (now - updated) * refill_per_second)
+            allowed = tokens >= 1.0
+            if allowed:
+                tokens -= 1.0
+            self._buckets[key] = (tokens, now)
+            self._evict(now)
+        return allowed, tokens
+
+
+# Token bucket atômico no Redis (estado: hash com tokens e timestamp)
+_REDIS_TOKEN_BUCKET = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local allowed = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+return {allowed, tostring(tokens)}
+"""
+
+
+class RedisBackend:
+    """Token buckets no Redis: limite compartilhado entre workers e réplicas"""
+    
+    def __init__(self, url: str, prefix: str = "ratelimit:"):
+        if not REDIS_AVAILABLE:
+            raise RuntimeError("RATE_LIMIT_BACKEND=redis requer o pacote redis (pip install redis)")
+        self.prefix = prefix
+        self._client = redis_asyncio.from_url(url)
+        self._script = self._client.register_script(_REDIS_TOKEN_BUCKET)
+    
+    async def take(self, key: str, capacity: int, refill_per_second: float, now: float) -> Tuple[bool, float]:
+        allowed, tokens = await self._script(keys=[self.prefix + key], args=[capacity, refill_per_second, now])
+        return bool(int(allowed)), float(tokens)
+
+
+def parse_api_key_limits(value: str) -> Dict[str, Dict[str, int]]:
+    """
+    "chave1:120,chave1:reindex:20,chave2:600" -> {chave: {regra: limite por minuto}}
+    
+    Limite com rota explícita prevalece sobre o "chave:limite" da mesma regra.
+    """
+    limits: Dict[str, Dict[str, int]] = {}
+    explicit = set()
+    for item in (value or "").split(","):
+        parts = [part.strip() for part in item.split(":")]
+        if len(parts) not in (2, 3) or not parts[0]:
+            if item.strip():
+                logger.warning("Limite de API key inválido ignorado", item=item.strip()[:4] + "...")
+            continue
+        try:
+            limit = int(parts[-1])
+        except ValueError:
+            logger.warning("Limite de API key inválido ignorado", item=parts[0][:4] + "...")
+            continue
+        key_limits = limits.setdefault(parts[0], {})
+        if len(parts) == 3:
+            key_limits[parts[1]] = limit
+            explicit.add((parts[0], parts[1]))
+            continue
+        for rule_name in API_KEY_DEFAULT_RULES:
+            if (parts[0], rule_name) not in explicit:
+                key_limits[rule_name] = limit
+    return limits
+
+
+class RateLimiter:
+    """Resolve a regra da rota e a identidade da requisição e consulta o backend"""
+    
+    def __init__(
+        self,
+        backend,
+        rules: List[Tuple[str, RateLimitRule]],
+        default_rule: RateLimitRule,
+        api_key_limits: Optional[Dict[str, Dict[str, int]]] = None,
+        fail_open: bool = True
+    ):
+        self.backend = backend
+        # Prefixos mais longos primeiro ("/reindex/jobs" antes de "/reindex")
+        self.rules = sorted(rules, key=lambda item: len(item[0]), reverse=True)
+        self.default_rule = default_rule
+        self.api_key_limits = api_key_limits or {}
+        self.fail_open = fail_open
+    
+    def rule_for(self, path: str) -> RateLimitRule:
+        for prefix, rule in self.rules:
+            if path == prefix or path.startswith(prefix.rstrip("/") + "/"):
+                return rule
+        return self.default_rule
+    
+    def identity(self, request: Request) -> Tuple[str, Optional[Dict[str, int]]]:
+        """
+        (identidade do bucket, limites da API key por regra).
+        
+        Só API keys configuradas ganham bucket próprio (chaves inventadas não
+        contornam o limite por IP); a chave nunca vai em claro para o backend.
+        """
+        api_key = request.headers.get(API_KEY_HEADER)
+        if api_key and api_key in self.api_key_limits:
+            digest = hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:32]
+            return "key:" + digest, self.api_key_limits[api_key]
+        return "ip:" + (request.client.host if request.client else "unknown"), None
+    
+    async def check(self, request: Request) -> RateLimitDecision:
+        rule = self.rule_for(request.url.path)
+        identity, key_limits = self.identity(request)
+        limit = (key_limits or {}).get(rule.name) or rule.limit
+        refill = limit / rule.window_seconds
+        
+        try:
+            allowed, tokens = await self.backend.take(f"{rule.name}:{identity}", limit, refill, time.time())
+        except Exception as e:
+            # Backend compartilhado indisponível: não derrubar a API
+            logger.warning("Backend de rate limit indisponível", error=str(e), fail_open=self.fail_open)
+            return RateLimitDecision(self.fail_open, limit, 0, rule.window_seconds)
+        
+        retry_after = 0.0 if allowed else (1.0 - tokens) / refill
+        return RateLimitDecision(allowed, limit, int(tokens), retry_after)
+
+
+def build_rate_limiter(settings=None) -> RateLimiter:
+    settings = settings or get_settings()
+    if settings.rate_limit_backend == "redis":
+        backend = RedisBackend(settings.rate_limit_redis_url)
+    else:
+        backend = InMemoryBackend(idle_seconds=settings.rate_limit_idle_seconds)
+    
+    rules = [
+        ("/chat", RateLimitRule("chat", settings.rate_limit_chat_per_minute)),
+        ("/health", RateLimitRule("health", settings.rate_limit_health_per_minute)),
+        ("/reindex", RateLimitRule("reindex", settings.rate_limit_reindex_per_minute)),
+        # Consulta de status (polling) não consome o orçamento de POST /reindex
+        ("/reindex/jobs", RateLimitRule("reindex_jobs", settings.rate_limit_reindex_jobs_per_minute)),
+    ]
+    return RateLimiter(
+        backend,
+        rules,
+        default_rule=RateLimitRule("default", settings.rate_limit_per_minute),
+        api_key_limits=parse_api_key_limits(settings.rate_limit_api_keys)
+    )
+
+
+_limiter_instance: Optional[RateLimiter] = None
+
+
+def get_rate_limiter() -> RateLimiter:
+    global _limiter_instance
+    if _limiter_instance is None:
+        _limiter_instance = build_rate_limiter()
+    return _limiter_instance
+
+
+def set_rate_limiter(limiter: Optional[RateLimiter]):
+    """Substitui o limitador do processo (ex: backend local em testes)"""
+    global _limiter_instance
+    _limiter_instance = limiter
@@ -1,11 +1,18 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
 from datetime import datetime
-from app.models.schemas import ChatRequest, ChatResponse, HealthResponse, ReindexResponse
+from typing import List, Optional
+import os
+import threading
+from app.models.schemas import ChatRequest, ChatResponse, ChatTimeoutResponse, HealthResponse, ReindexJobResponse
 from app.rag.engine import RegulatoryRAGEngine
 from app.rag.vector_store import VectorStore
-from app.ingestion.main import ingest_documents
+from app.ingestion.jobs import get_job_manager
 from app.config import get_settings
+from app.utils.deadline import Deadline, DeadlineExceeded
 from app.utils.logger import get_logger
+from app.utils.metrics import PROMETHEUS_AVAILABLE, render_metrics
 
 router = APIRouter()
 logger = get_logger(__name__)
@@ -22,6 +29,8 @@ async def root():
             "health": "/health",
             "chat": "/chat",
             "reindex": "/reindex",
+            "reindex_jobs": "/reindex/jobs",
+            "metrics": "/metrics",
             "docs": "/docs",
             "openapi": "/openapi.json"
         },
@@ -29,24 +38,49 @@ async def root():
     }
 
 
+_engine_instance: Optional[RegulatoryRAGEngine] = None
+_engine_pid: Optional[int] = None
+_engine_lock = threading.Lock()
+
+
 def get_rag_engine() -> RegulatoryRAGEngine:
-    """Dependency para RAG engine"""
-    return RegulatoryRAGEngine()
+    """
+    Dependency para RAG engine.
+    
+    Um por processo: os clientes OpenAI/Qdrant (e seus pools de conexão) são
+    reutilizados entre requisições. Uma instância herdada do master via fork
+    (gunicorn --preload) é descartada, pois conexões não sobrevivem ao fork.
+    """
+    global _engine_instance, _engine_pid
+    if _engine_instance is None or _engine_pid != os.getpid():
+        with _engine_lock:
+            if _engine_instance is None or _engine_pid != os.getpid():
+                _engine_instance = RegulatoryRAGEngine()
+                _engine_pid = os.getpid()
+    return _engine_instance
 
 
 def get_vector_store() -> VectorStore:
-    """Dependency para vector store"""
-    return VectorStore()
+    """Dependency para vector store (o mesmo do RAG engine)"""
+    return get_rag_engine().vector_store
+
 
+def get_request_deadline(request: Request) -> Deadline:
+    """Dependency para o prazo da requisição (criado no timeout_middleware)"""
+    return getattr(request.state, "deadline", None) or Deadline(get_settings().api_timeout)
 
-@router.post("/chat", response_model=ChatResponse)
+
+@router.post("/chat", response_model=ChatResponse, responses={504: {"model": ChatTimeoutResponse}})
 async def chat(
     request: ChatRequest,
-    engine: RegulatoryRAGEngine = Depends(get_rag_engine)
+    engine: RegulatoryRAGEngine = Depends(get_rag_engine),
+    deadline: Deadline = Depends(get_request_deadline)
 ):
     """
     Endpoint principal de chat.
     Recebe pergunta e retorna resposta baseada em documentos normativos.
+    
+    Esgotado o prazo (API_TIMEOUT), responde 504 com as fontes já recuperadas.
     """
     try:
         logger.info(
@@ -55,12 +89,14 @@ async def chat(
             domain=request.domain
         )
         
-        # Executar query
-        result = engine.query(
+        # Executar query (síncrona: em thread, sem bloquear o event loop)
+        result = await run_in_threadpool(
+            engine.query,
             question=request.question,
             domain=request.domain,
             top_k=request.top_k,
-            min_score=request.min_score
+            min_score=request.min_score,
+            deadline=deadline
         )
         
         # Log de auditoria
@@ -82,6 +118,30 @@ async def chat(
             timestamp=datetime.now()
         )
         
+    except DeadlineExceeded as e:
+        logger.warning(
+            "Prazo da consulta esgotado",
+            question=request.question[:100],
+            domain=request.domain,
+            stage=e.stage,
+            stage_timeout=e.timeout,
+            sources_count=len(e.sources),
+            error=str(e)
+        )
+        if e.timeout is not None:
+            # Só o limite do estágio acabou (ex.: SEARCH_TIMEOUT_SECONDS)
+            timeout_seconds = e.timeout
+            detail = f"Prazo do estágio {e.stage} esgotado ({e.timeout:g}s)"
+        else:
+            timeout_seconds = get_settings().api_timeout
+            detail = f"Prazo da consulta esgotado ({timeout_seconds}s)"
+        timeout_response = ChatTimeoutResponse(
+            detail=detail,
+            stage=e.stage,
+            timeout_seconds=timeout_seconds,
+            sources=e.sources
+        )
+        return JSONResponse(status_code=504, content=timeout_response.model_dump(mode="json"))
     except Exception as e:
         logger.error(
             "Erro ao processar consulta",
@@ -136,46 +196,58 @@ async def health(vector_store: VectorStore = Depends(get_vector_store)):
         )
 
 
-@router.post("/reindex", response_model=ReindexResponse)
+@router.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Métricas no formato do Prometheus (latência por estágio, tokens, caches)"""
+    if not PROMETHEUS_AVAILABLE:
+        raise HTTPException(status_code=503, detail="Métricas indisponíveis - instale prometheus_client")
+    content, content_type = render_metrics()
+    return Response(content=content, headers={"Content-Type": content_type})
+
+
+@router.post("/reindex", response_model=ReindexJobResponse, status_code=202)
 async def reindex(
     domain: str = "pix",
-    force: bool = True
+    force: bool = True,
+    resume: bool = False
 ):
     """
-    Reindexa documentos de um domínio.
+    Enfileira reindexação de um domínio em background.
+    Retorna o job; acompanhe por GET /reindex/jobs/{job_id}.
     """
     settings = get_settings()
     
     if domain not in settings.domain_list:
         raise HTTPException(status_code=400, detail=f"Domínio inválido: {domain}")
     
-    try:
-        logger.info("Iniciando reindexação", domain=domain, force=force)
-        
-        # Executar ingestão
-        ingest_documents(domain, force_reindex=force)
-        
-        # Obter estatísticas
-        vector_store = VectorStore()
-        collection_info = vector_store.get_collection_info(domain)
-        chunks_count = collection_info.get("points_count", 0) if collection_info else 0
-        
-        # Contar arquivos processados (aproximação)
-        from pathlib import Path
-        processed_path = Path(settings.data_processed_path) / domain
-        files_count = len(list(processed_path.glob("*.pdf"))) + len(list(processed_path.glob("*.html")))
-        
-        logger.info("Reindexação concluída", domain=domain, chunks=chunks_count)
-        
-        return ReindexResponse(
-            status="success",
-            message=f"Reindexação concluída para domínio {domain}",
-            documents_processed=files_count,
-            chunks_created=chunks_count,
-            timestamp=datetime.now()
-        )
-        
-    except Exception as e:
-        logger.error("Erro na reindexação", domain=domain, error=str(e), exc_info=True)
-        raise HTTPException(status_code=500, detail=f"Erro na reindexação: {str(e)}")
+    logger.info("Reindexação solicitada", domain=domain, force=force, resume=resume)
+    
+    job = get_job_manager().submit(domain, force=force, resume=resume)
+    return ReindexJobResponse(**job.snapshot())
+
+
+@router.get("/reindex/jobs", response_model=List[ReindexJobResponse])
+async def list_reindex_jobs():
+    """Lista jobs de reindexação (mais recentes primeiro)"""
+    return [ReindexJobResponse(**job.snapshot()) for job in get_job_manager().list_jobs()]
+
 
+@router.get("/reindex/jobs/{job_id}", response_model=ReindexJobResponse)
+async def get_reindex_job(job_id: str):
+    """Progresso de um job: arquivos, chunks, embeddings/s e ETA"""
+    job = get_job_manager().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job não encontrado: {job_id}")
+    return ReindexJobResponse(**job.snapshot())
+
+
+@router.post("/reindex/jobs/{job_id}/cancel", response_model=ReindexJobResponse)
+async def cancel_reindex_job(job_id: str):
+    """
+    Cancela um job de reindexação.
+    O progresso já gravado fica no journal e pode ser retomado com resume=true.
+    """
+    job = get_job_manager().cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job não encontrado: {job_id}")
+    return ReindexJobResponse(**job.snapshot())
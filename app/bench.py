@@ -0,0 +1,535 @@
+"""
+Benchmark offline de latência do RAG (sem OpenAI nem Qdrant reais).
+
+Executa o RegulatoryRAGEngine completo contra:
+- Qdrant embutido: QdrantClient(":memory:") ou um diretório local (--qdrant)
+- servidor OpenAI falso local (embeddings + chat completions) com latência
+  e limite de requisições configuráveis (429 com Retry-After e headers
+  x-ratelimit-*, como a API real)
+
+Os embeddings falsos são determinísticos (hash das palavras), então a busca
+retorna trechos relacionados à pergunta e o prompt tem o tamanho real.
+
+Reporta p50/p95/p99 de cada estágio (collection_check, embed, search,
+context, llm, validation) e da consulta completa, e o throughput em cada
+nível de concorrência. Consultas que falharam ou estouraram o prazo entram
+nos percentis da consulta completa com o tempo que levaram até falhar (e
+também aparecem à parte, em "failed"), para o p99 não melhorar justamente
+quando as requisições lentas viram timeout. Os resultados vão para um JSON com o commit atual,
+para comparar execuções entre commits (--baseline).
+
+Uso:
+    python -m app.bench
+    python -m app.bench --concurrency 1,4,16 --requests 200 --llm-latency-ms 800
+    python -m app.bench --rate-limit-rpm 600 --output data/bench/pr.json --baseline data/bench/main.json
+    python -m app.bench --corpus data/processed/pix    # corpus JSONL real em vez do sintético
+"""
+import argparse
+import base64
+import json
+import os
+import random
+import re
+import struct
+import subprocess
+import sys
+import threading
+import time
+import uuid
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, List, Optional
+
+EMBEDDING_DIM = 3072  # text-embedding-3-large (dimensão da coleção)
+
+QUESTIONS = [
+    "Quais são as obrigações dos participantes do Pix?",
+    "Qual o prazo para devolução dos recursos no Pix?",
+    "Como deve ser obtido o consentimento do cliente no Open Finance?",
+    "Quais controles internos a instituição de pagamento deve manter?",
+    "Como as transações Pix são liquidadas?",
+    "Quais dados podem ser compartilhados no Open Finance?",
+    "Quais são os limites de valor para transações Pix no período noturno?",
+    "Quem pode ser participante direto do arranjo Pix?",
+]
+
+FRASES = [
+    "os participantes do arranjo Pix devem observar as regras deste Regulamento",
+    "a instituição de pagamento deverá manter controles internos compatíveis com o porte",
+    "o prazo para devolução dos recursos será de até noventa dias",
+    "as transações Pix serão liquidadas no Sistema de Pagamentos Instantâneos",
+    "o consentimento do cliente deverá ser obtido de forma clara e objetiva no Open Finance",
+    "o compartilhamento de dados cadastrais e transacionais depende de consentimento prévio",
+    "os limites de valor no período noturno podem ser definidos pelo usuário pagador",
+    "o participante direto deve manter conta PI no Banco Central",
+]
+
+
+# Servidor OpenAI falso
+
+def fake_embedding(text: str, dim: int = EMBEDDING_DIM) -> List[float]:
+    """Vetor determinístico: palavras em posições por hash, normalizado"""
+    vector = [0.0] * dim
+    for word in re.findall(r"\w+", text.lower()):
+        vector[zlib.crc32(word.encode("utf-8")) % dim] += 1.0
+    norm = sum(value * value for value in vector) ** 0.5 or 1.0
+    return [value / norm for value in vector]
+
+
+REFERENCE_PATTERN = re.compile(r"Referência: ([^\n,]+)(?:, Art\. ([^\n]+))?")
+
+
+def fake_answer(prompt: str) -> str:
+    """Resposta que cita o primeiro documento do prompt (passa na validação)"""
+    match = REFERENCE_PATTERN.search(prompt)
+    if not match:
+        return "Não há base normativa explícita nos documentos analisados para responder a esta pergunta."
+    artigo = f"Art. {match.group(2).strip()} da " if match.group(2) else ""
+    return f"Conforme {artigo}{match.group(1).strip()}, os participantes devem observar as regras descritas no trecho."
+
+
+class FakeOpenAIServer:
+    """
+    API OpenAI local (/v1/embeddings e /v1/chat/completions).
+    
+    Latência: média em ms com jitter gaussiano. Limite: token bucket de
+    rate_limit_rpm requisições por minuto (0 = sem limite), compartilhado
+    entre os endpoints; acima dele responde 429 com Retry-After.
+    """
+    
+    def __init__(
+        self,
+        embed_latency_ms: float = 80.0,
+        llm_latency_ms: float = 600.0,
+        jitter: float = 0.2,
+        rate_limit_rpm: int = 0,
+        dim: int = EMBEDDING_DIM,
+        seed: int = 0
+    ):
+        self.embed_latency_ms = embed_latency_ms
+        self.llm_latency_ms = llm_latency_ms
+        self.jitter = jitter
+        self.rate_limit_rpm = rate_limit_rpm
+        self.dim = dim
+        self.stats = {"embeddings": 0, "chat": 0, "rate_limited": 0}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._tokens = max(1.0, rate_limit_rpm / 60.0)
+        self._updated = time.monotonic()
+        self._httpd: Optional[ThreadingHTTPServer] = None
+    
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+    
+    def start(self) -> "FakeOpenAIServer":
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), _FakeOpenAIHandler)
+        self._httpd.daemon_threads = True
+        self._httpd.fake = self
+        threading.Thread(target=self._httpd.serve_forever, name="fake-openai", daemon=True).start()
+        return self
+    
+    def stop(self):
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+    
+    def delay(self, mean_ms: float):
+        with self._lock:
+            value = self._random.gauss(mean_ms, mean_ms * self.jitter)
+        time.sleep(max(0.0, value) / 1000)
+    
+    @property
+    def capacity(self) -> float:
+        # Rajada de até 1 s de requisições (o limite aparece já em poucos segundos)
+        return max(1.0, self.rate_limit_rpm / 60.0)
+    
+    def take(self) -> tuple:
+        """(permitido, restantes, segundos até o próximo token, segundos até encher)"""
+        if self.rate_limit_rpm <= 0:
+            return True, 0, 0.0, 0.0
+        rate = self.rate_limit_rpm / 60.0
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * rate)
+            self._updated = now
+            allowed = self._tokens >= 1.0
+            if allowed:
+                self._tokens -= 1.0
+            else:
+                self.stats["rate_limited"] += 1
+            retry_after = 0.0 if allowed else (1.0 - self._tokens) / rate
+            return allowed, int(self._tokens), retry_after, (self.capacity - self._tokens) / rate
+    
+    def count(self, key: str):
+        with self._lock:
+            self.stats[key] += 1
+
+
+class _FakeOpenAIHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    
+    def log_message(self, format, *args):
+        pass
+    
+    def _send(self, status: int, body: Dict, headers: Optional[Dict[str, str]] = None):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+    
+    def do_POST(self):
+        fake: FakeOpenAIServer = self.server.fake
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        
+        allowed, remaining, retry_after, reset = fake.take()
+        # Como a API real: reset = tempo até o limite voltar ao valor inicial
+        limit_headers = {
+            "x-ratelimit-limit-requests": str(int(fake.capacity)),
+            "x-ratelimit-remaining-requests": str(remaining),
+            "x-ratelimit-reset-requests": f"{reset:.3f}s",
+        } if fake.rate_limit_rpm > 0 else {}
+        if not allowed:
+            limit_headers["retry-after"] = f"{retry_after:.3f}"
+            self._send(429, {"error": {
+                "message": "Rate limit reached for requests",
+                "type": "requests",
+                "code": "rate_limit_exceeded",
+            }}, limit_headers)
+            return
+        
+        if self.path.endswith("/embeddings"):
+            fake.count("embeddings")
+            fake.delay(fake.embed_latency_ms)
+            inputs = request.get("input", "")
+            inputs = inputs if isinstance(inputs, list) else [inputs]
+            data = []
+            for index, text in enumerate(inputs):
+                vector = fake_embedding(str(text), fake.dim)
+                if request.get("encoding_format") == "base64":
+                    vector = base64.b64encode(struct.pack(f"<{len(vector)}f", *vector)).decode("ascii")
+                data.append({"object": "embedding", "index": index, "embedding": vector})
+            tokens = sum(len(str(text)) // 4 for text in inputs)
+            self._send(200, {
+                "object": "list",
+                "data": data,
+                "model": request.get("model", ""),
+                "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+            }, limit_headers)
+        elif self.path.endswith("/chat/completions"):
+            fake.count("chat")
+            fake.delay(fake.llm_latency_ms)
+            prompt = "\n".join(message.get("content", "") for message in request.get("messages", []))
+            answer = fake_answer(prompt)
+            self._send(200, {
+                "id": f"chatcmpl-{uuid.uuid4().hex}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": request.get("model", ""),
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": answer},
+                    "finish_reason": "stop",
+                }],
+                "usage": {
+                    "prompt_tokens": len(prompt) // 4,
+                    "completion_tokens": len(answer) // 4,
+                    "total_tokens": (len(prompt) + len(answer)) // 4,
+                },
+            }, limit_headers)
+        else:
+            self._send(404, {"error": {"message": f"Rota desconhecida: {self.path}"}})
+
+
+# Corpus
+
+def synthetic_chunks(domain: str, normativos: int, artigos: int, seed: int = 0):
+    """Artigos sintéticos no formato dos normativos do Bacen"""
+    from app.models.records import ChunkMetadata, ChunkRecord
+    
+    rng = random.Random(seed)
+    chunks = []
+    for n in range(1, normativos + 1):
+        base = ChunkMetadata(
+            fonte="bench",
+            norma="Resolução BCB",
+            numero_norma=str(n),
+            ano=2020 + n % 5,
+            tema=domain,
+        )
+        for a in range(1, artigos + 1):
+            text = f"Art. {a}º " + ". ".join(
+                frase.capitalize() for frase in rng.sample(FRASES, rng.randint(2, 4))
+            ) + "."
+            chunks.append(ChunkRecord(text=text, metadata=base.with_artigo(str(a))))
+    return chunks
+
+
+def corpus_chunks(directory: Path):
+    """Chunks dos arquivos de corpus JSONL de um diretório (mesmo caminho da ingestão)"""
+    from app.ingestion.chunker import JuridicalChunker
+    from app.ingestion.corpus import list_corpus_files
+    from app.ingestion.document_parser import DocumentParser
+    
+    parser = DocumentParser()
+    chunker = JuridicalChunker(max_tokens=600)
+    chunks = []
+    for corpus_file in list_corpus_files(directory):
+        chunks.extend(chunker.chunk_prechunked(parser.parse_corpus(corpus_file)))
+    return chunks
+
+
+def index_corpus(vector_store, collection: str, chunks, batch_size: int = 256):
+    """Grava os chunks com embeddings falsos direto no Qdrant (sem gerar embeddings pelo servidor falso)"""
+    from qdrant_client.models import PointStruct
+    
+    vector_store.ensure_collection(collection)
+    for start in range(0, len(chunks), batch_size):
+        points = []
+        for chunk in chunks[start:start + batch_size]:
+            payload = chunk.payload()
+            payload["text"] = chunk.text
+            points.append(PointStruct(id=str(uuid.uuid4()), vector=fake_embedding(chunk.text), payload=payload))
+        vector_store.client.upsert(collection_name=collection, points=points)
+
+
+# Medição
+
+def percentile(values: List[float], p: float) -> float:
+    """Percentil com interpolação linear (p em 0-100)"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * p / 100
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def summarize(values: List[float]) -> Dict[str, float]:
+    """Estatísticas em milissegundos"""
+    return {
+        "count": len(values),
+        "mean_ms": round(sum(values) / len(values) * 1000, 3) if values else 0.0,
+        "p50_ms": round(percentile(values, 50) * 1000, 3),
+        "p95_ms": round(percentile(values, 95) * 1000, 3),
+        "p99_ms": round(percentile(values, 99) * 1000, 3),
+    }
+
+
+class StageRecorder:
+    """Coleta as durações de estágio (app.utils.metrics) da requisição da thread atual"""
+    
+    def __init__(self):
+        self._local = threading.local()
+    
+    def __call__(self, stage: str, elapsed: float):
+        stages = getattr(self._local, "stages", None)
+        if stages is not None:
+            stages[stage] = stages.get(stage, 0.0) + elapsed
+    
+    def begin(self):
+        self._local.stages = {}
+    
+    def end(self) -> Dict[str, float]:
+        stages, self._local.stages = self._local.stages, None
+        return stages
+
+
+def run_level(engine, domain: str, concurrency: int, requests: int, recorder: StageRecorder) -> Dict:
+    """Dispara `requests` consultas com `concurrency` threads"""
+    def one(i: int):
+        recorder.begin()
+        start = time.perf_counter()
+        timed_out = False
+        try:
+            result = engine.query(QUESTIONS[i % len(QUESTIONS)], domain)
+            ok, sufficient = True, result["has_sufficient_context"]
+        except Exception as e:
+            ok, sufficient, timed_out = False, False, isinstance(e, TimeoutError)
+        return ok, sufficient, time.perf_counter() - start, recorder.end(), timed_out
+    
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="bench") as executor:
+        results = list(executor.map(one, range(requests)))
+    elapsed = time.perf_counter() - started
+    
+    succeeded = [total for ok, _, total, _, _ in results if ok]
+    failed = [total for ok, _, total, _, _ in results if not ok]
+    stage_values: Dict[str, List[float]] = {}
+    for ok, _, _, stages, _ in results:
+        if ok:
+            for stage, value in stages.items():
+                stage_values.setdefault(stage, []).append(value)
+    
+    return {
+        "concurrency": concurrency,
+        "requests": requests,
+        "errors": len(failed),
+        "timeouts": sum(1 for _, _, _, _, timed_out in results if timed_out),
+        "without_context": sum(1 for ok, sufficient, _, _, _ in results if ok and not sufficient),
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(len(succeeded) / elapsed, 3) if elapsed else 0.0,
+        # Todas as consultas; as que falharam valem o tempo até a falha
+        "total": summarize(succeeded + failed),
+        "succeeded": summarize(succeeded),
+        "failed": summarize(failed),
+        "stages": {stage: summarize(values) for stage, values in stage_values.items()},
+    }
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_level(level: Dict):
+    total = level["total"]
+    print(
+        f"\nconcorrência {level['concurrency']:>3}: {level['throughput_rps']:8.2f} req/s   "
+        f"p50 {total['p50_ms']:9.1f} ms   p95 {total['p95_ms']:9.1f} ms   p99 {total['p99_ms']:9.1f} ms   "
+        f"erros {level['errors']} (timeouts {level.get('timeouts', 0)})"
+    )
+    failed = level.get("failed") or {}
+    if failed.get("count"):
+        print(
+            f"    {'falhas':<18} p50 {failed['p50_ms']:9.2f} ms   p95 {failed['p95_ms']:9.2f} ms   "
+            f"p99 {failed['p99_ms']:9.2f} ms"
+        )
+    for stage, stats in level["stages"].items():
+        print(
+            f"    {stage:<18} p50 {stats['p50_ms']:9.2f} ms   p95 {stats['p95_ms']:9.2f} ms   "
+            f"p99 {stats['p99_ms']:9.2f} ms"
+        )
+
+
+def print_comparison(current: Dict, baseline: Dict):
+    """Variação do p95 por nível de concorrência em relação a outra execução"""
+    print(f"\nComparação com {baseline.get('commit') or 'baseline'} (p95):")
+    previous = {level["concurrency"]: level for level in baseline.get("levels", [])}
+    for level in current["levels"]:
+        old = previous.get(level["concurrency"])
+        if old is None:
+            continue
+        rows = [("total", level["total"], old["total"])] + [
+            (stage, stats, old["stages"][stage])
+            for stage, stats in level["stages"].items()
+            if stage in old.get("stages", {})
+        ]
+        print(f"  concorrência {level['concurrency']}:")
+        for name, new_stats, old_stats in rows:
+            before, after = old_stats["p95_ms"], new_stats["p95_ms"]
+            delta = (after - before) / before * 100 if before else 0.0
+            print(f"    {name:<18} {before:9.2f} → {after:9.2f} ms  ({delta:+.1f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark offline de latência do RAG")
+    parser.add_argument("--concurrency", default="1,4,8", help="Níveis de concorrência (ex: 1,4,16)")
+    parser.add_argument("--requests", type=int, default=50, help="Consultas por nível")
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--domain", default="pix")
+    parser.add_argument("--qdrant", default=":memory:", help='":memory:" ou diretório do Qdrant local')
+    parser.add_argument("--corpus", help="Diretório com corpus JSONL (padrão: corpus sintético)")
+    parser.add_argument("--normativos", type=int, default=40, help="Normativos do corpus sintético")
+    parser.add_argument("--artigos", type=int, default=25, help="Artigos por normativo sintético")
+    parser.add_argument("--embed-latency-ms", type=float, default=80.0)
+    parser.add_argument("--llm-latency-ms", type=float, default=600.0)
+    parser.add_argument("--jitter", type=float, default=0.2, help="Desvio relativo da latência")
+    parser.add_argument("--rate-limit-rpm", type=int, default=0, help="Limite do servidor falso (0 = sem limite)")
+    parser.add_argument("--output", help="Arquivo JSON de resultados (padrão: data/bench/rag_<commit>_<data>.json)")
+    parser.add_argument("--baseline", help="JSON de uma execução anterior para comparar")
+    args = parser.parse_args()
+    
+    server = FakeOpenAIServer(
+        embed_latency_ms=args.embed_latency_ms,
+        llm_latency_ms=args.llm_latency_ms,
+        jitter=args.jitter,
+        rate_limit_rpm=args.rate_limit_rpm
+    ).start()
+    
+    # Antes de carregar settings e criar os clientes OpenAI
+    os.environ["OPENAI_API_KEY"] = "bench"
+    os.environ["OPENAI_BASE_URL"] = server.base_url
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    
+    from qdrant_client import QdrantClient
+    from app.rag.engine import RegulatoryRAGEngine
+    from app.rag.vector_store import VectorStore
+    from app.utils.logger import setup_logger
+    from app.utils.metrics import add_stage_listener, remove_stage_listener
+    
+    setup_logger()
+    
+    if args.qdrant == ":memory:":
+        qdrant = QdrantClient(":memory:")
+    else:
+        qdrant = QdrantClient(path=args.qdrant)
+    vector_store = VectorStore(client=qdrant)
+    
+    chunks = corpus_chunks(Path(args.corpus)) if args.corpus else synthetic_chunks(args.domain, args.normativos, args.artigos)
+    vector_store.delete_collection(args.domain)
+    started = time.perf_counter()
+    index_corpus(vector_store, args.domain, chunks)
+    print(f"\n{len(chunks)} chunks indexados em {time.perf_counter() - started:.1f}s ({args.qdrant})")
+    print(f"OpenAI falso em {server.base_url}: embed {args.embed_latency_ms:.0f} ms, "
+          f"LLM {args.llm_latency_ms:.0f} ms, limite {args.rate_limit_rpm or 'nenhum'} rpm")
+    
+    engine = RegulatoryRAGEngine(vector_store=vector_store)
+    recorder = StageRecorder()
+    add_stage_listener(recorder)
+    
+    try:
+        for i in range(args.warmup):
+            engine.query(QUESTIONS[i % len(QUESTIONS)], args.domain)
+        
+        levels = []
+        for concurrency in [int(value) for value in args.concurrency.split(",") if value.strip()]:
+            level = run_level(engine, args.domain, concurrency, args.requests, recorder)
+            print_level(level)
+            levels.append(level)
+    finally:
+        remove_stage_listener(recorder)
+        server.stop()
+    
+    commit = git_commit()
+    results = {
+        "commit": commit,
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "config": vars(args),
+        "corpus_chunks": len(chunks),
+        "server": dict(server.stats),
+        "levels": levels,
+    }
+    
+    output = Path(args.output) if args.output else (
+        Path("data/bench") / f"rag_{commit or 'local'}_{datetime.now().strftime('%Y%m%d%H%M%S')}.json"
+    )
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    print(f"\nResultados: {output}  (rate limited: {server.stats['rate_limited']})")
+    
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            print_comparison(results, json.load(f))
+
+
+if __name__ == "__main__":
+    # Configurar encoding para Windows
+    if sys.platform == "win32":
+        sys.stdout.reconfigure(encoding='utf-8')
+    main()
@@ -0,0 +1,158 @@
+"""
+Configuração do gunicorn para produção (workers uvicorn).
+
+Uso:
+    gunicorn -c python:app.config.gunicorn app.api.main:app
+
+- Workers: WEB_CONCURRENCY ou 2 x CPUs disponíveis + 1 (respeita a cota de
+  CPU do container, não só os núcleos do host)
+- --preload: settings, logging e o encoder tiktoken (usado por /reindex)
+  são carregados uma vez no master e compartilhados via fork (copy-on-write)
+- Clientes OpenAI/Qdrant NÃO são criados no master: conexões HTTP não
+  sobrevivem ao fork. Cada worker cria os seus em post_worker_init
+- Timeouts dimensionados para chamadas ao LLM (API_TIMEOUT)
+
+Estado por processo (cada worker tem o seu):
+- rate limit em memória: o limite efetivo por cliente vira até N x o
+  configurado; use RATE_LIMIT_BACKEND=redis para um limite compartilhado
+- gateway OpenAI: OPENAI_MAX_CONCURRENCY e o orçamento de rate limit são
+  divididos entre os workers (OPENAI_PROCESSES = workers, exportado no
+  ambiente se não vier dele). Com mais workers que OPENAI_MAX_CONCURRENCY
+  cada um fica com 1 vaga e o total passa do limite: use
+  OPENAI_CONCURRENCY_BACKEND=redis para um semáforo global
+- jobs de /reindex: registro compartilhado (SQLite em REINDEX_JOBS_DB_PATH)
+  e um worker de reindexação por processo, iniciado no startup: qualquer
+  worker consulta, cancela e executa, e o lock por domínio impede duas
+  reindexações simultâneas
+- métricas: agregadas entre workers via PROMETHEUS_MULTIPROC_DIR (definido
+  aqui se não vier do ambiente)
+- tracing: cada worker cria o seu TracerProvider (BatchSpanProcessor usa
+  uma thread, que não sobrevive ao fork)
+"""
+import math
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from app.config import Settings
+
+# Instância própria, fora do cache de get_settings(): o app (--preload) lê as
+# settings depois deste módulo e precisa ver o OPENAI_PROCESSES exportado abaixo
+settings = Settings()
+
+
+def available_cpus() -> int:
+    """CPUs utilizáveis pelo processo: cota do cgroup (containers) ou afinidade"""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    
+    # cgroup v2 ("max 100000" = sem cota) e v1
+    quota = None
+    try:
+        value, period = Path("/sys/fs/cgroup/cpu.max").read_text().split()
+        if value != "max":
+            quota = int(value) / int(period)
+    except (OSError, ValueError):
+        try:
+            value = int(Path("/sys/fs/cgroup/cpu/cpu.cfs_quota_us").read_text())
+            period = int(Path("/sys/fs/cgroup/cpu/cpu.cfs_period_us").read_text())
+            if value > 0:
+                quota = value / period
+        except (OSError, ValueError):
+            pass
+    
+    if quota:
+        cpus = min(cpus, max(1, math.ceil(quota)))
+    return cpus
+
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+worker_class = "uvicorn.workers.UvicornWorker"
+# Requisições passam a maior parte do tempo esperando OpenAI/Qdrant (I/O)
+workers = settings.web_concurrency or 2 * available_cpus() + 1
+preload_app = True
+
+# Cada worker cria o seu gateway OpenAI (post_worker_init) com as settings
+# carregadas no preload: o limite total é dividido entre os workers
+os.environ.setdefault("OPENAI_PROCESSES", str(workers))
+
+# O worker uvicorn avisa o master a cada ciclo do event loop; o /chat roda em
+# thread e responde 504 em API_TIMEOUT, o dobro é só margem
+timeout = settings.api_timeout * 2
+# Deploy/restart: requisições em andamento terminam antes do SIGKILL
+graceful_timeout = settings.api_timeout + 15
+# Acima do idle timeout típico de proxies (conexões reutilizadas)
+keepalive = 75
+
+accesslog = "-"
+errorlog = "-"
+loglevel = settings.log_level.lower()
+
+# Métricas de vários processos: prometheus_client lê a variável no import,
+# que acontece no master (--preload), então ela precisa existir antes
+if workers > 1 and not os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+    os.environ["PROMETHEUS_MULTIPROC_DIR"] = os.path.join(tempfile.gettempdir(), "rag_prometheus")
+if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+    # Arquivos de uma execução anterior somariam contadores antigos
+    shutil.rmtree(os.environ["PROMETHEUS_MULTIPROC_DIR"], ignore_errors=True)
+    os.makedirs(os.environ["PROMETHEUS_MULTIPROC_DIR"], exist_ok=True)
+
+
+def when_ready(server):
+    """Master, após o preload e antes do fork dos workers"""
+    from app.utils.logger import get_logger
+    from app.utils.tokenizer import get_encoding
+    
+    logger = get_logger("app.config.gunicorn")
+    try:
+        # Ranks BPE (dezenas de MB) carregados uma vez e compartilhados pelos workers
+        get_encoding()
+    except RuntimeError as e:
+        logger.warning("Encoder tiktoken não pré-carregado", error=str(e))
+    
+    if server.cfg.workers > 1 and settings.rate_limit_backend == "memory":
+        logger.warning(
+            "Rate limit em memória é por worker - use RATE_LIMIT_BACKEND=redis para limite compartilhado",
+            workers=server.cfg.workers
+        )
+    openai_processes = int(os.environ.get("OPENAI_PROCESSES") or server.cfg.workers)
+    if openai_processes > settings.openai_max_concurrency and settings.openai_concurrency_backend == "memory":
+        # Mínimo de 1 vaga por worker: o total passa de OPENAI_MAX_CONCURRENCY
+        logger.warning(
+            "Mais workers que OPENAI_MAX_CONCURRENCY - use OPENAI_CONCURRENCY_BACKEND=redis para um limite global",
+            openai_processes=openai_processes,
+            openai_max_concurrency=settings.openai_max_concurrency,
+            effective_concurrency=openai_processes
+        )
+    logger.info(
+        "Gunicorn pronto",
+        workers=server.cfg.workers,
+        openai_processes=openai_processes,
+        cpus=available_cpus(),
+        timeout=server.cfg.timeout,
+        graceful_timeout=server.cfg.graceful_timeout
+    )
+
+
+def post_worker_init(worker):
+    """Worker: cria os clientes OpenAI/Qdrant antes da primeira requisição"""
+    from app.api.routes import get_rag_engine
+    from app.utils.logger import get_logger
+    
+    try:
+        get_rag_engine()
+    except Exception as e:
+        # Sem OPENAI_API_KEY/Qdrant o worker sobe mesmo assim (/health reporta)
+        get_logger("app.config.gunicorn").warning("Clientes não inicializados no worker", pid=worker.pid, error=str(e))
+
+
+def child_exit(server, worker):
+    """Remove os arquivos de métricas do worker encerrado (gauges de processo)"""
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        try:
+            from prometheus_client import multiprocess
+        except ImportError:
+            return
+        multiprocess.mark_process_dead(worker.pid)
@@ -15,8 +15,25 @@ class Settings(BaseSettings):
     # Aplicação
     app_env: str = "production"
     log_level: str = "INFO"
-    api_timeout: int = 60  # Aumentado para dar tempo aos retries de rate limit
-    rate_limit_per_minute: int = 60
+    api_timeout: int = 60  # Prazo do /chat (504 ao esgotar): busca, retentativas e fallback de modelos param nele
+    search_timeout_seconds: float = 10  # Parte do prazo para a busca (embedding + Qdrant); o resto fica para o LLM
+    web_concurrency: int = 0  # Workers do gunicorn (0 = 2 x CPUs disponíveis + 1)
+    rate_limit_per_minute: int = 60  # Demais rotas (por IP ou API key)
+    rate_limit_chat_per_minute: int = 60  # /chat (chama embeddings + LLM)
+    rate_limit_health_per_minute: int = 600  # /health (orçamento próprio para monitoração)
+    rate_limit_reindex_per_minute: int = 10  # POST /reindex
+    rate_limit_reindex_jobs_per_minute: int = 120  # /reindex/jobs (status e cancelamento)
+    rate_limit_api_keys: str = ""  # Limites por API key (header X-API-Key): "chave:limite" (/chat e demais) ou "chave:rota:limite"
+    rate_limit_backend: str = "memory"  # "memory" (por worker) ou "redis" (compartilhado)
+    rate_limit_redis_url: str = "redis://localhost:6379/0"
+    rate_limit_idle_seconds: float = 300  # Buckets ociosos descartados da memória
+    
+    # Tracing (OpenTelemetry)
+    tracing_exporter: str = "none"  # "none", "otlp" (coletor) ou "file" (JSON por linha)
+    tracing_otlp_endpoint: str = ""  # Ex: http://localhost:4318/v1/traces (vazio = OTEL_EXPORTER_OTLP_*)
+    tracing_file_path: str = "logs/traces.jsonl"
+    tracing_service_name: str = "rag-regulatorio"
+    tracing_sample_ratio: float = 1.0  # Fração de traces amostrados
     
     # RAG Config
     top_k_results: int = 5
@@ -24,6 +41,16 @@ class Settings(BaseSettings):
     max_tokens_response: int = 1000
     embedding_model: str = "text-embedding-3-large"
     llm_model: str = "gpt-4o-mini"  # GPT-4.1-mini não existe, usando gpt-4o-mini
+    llm_models: str = ""  # Fallback ordenado "modelo[:timeout[:hedge]],..." (vazio = só llm_model)
+    llm_timeout_seconds: float = 20  # Timeout padrão por modelo (o último da lista usa o que resta de api_timeout)
+    llm_hedge_min_samples: int = 20  # Latências observadas antes de ativar o hedge no p95
+    openai_max_concurrency: int = 8  # Requisições simultâneas à OpenAI no total (gateway)
+    openai_processes: int = 0  # Processos que dividem concorrência e orçamento da OpenAI (gunicorn define = workers; 0 = 1)
+    openai_concurrency_backend: str = "memory"  # "memory" (dividido entre os processos) ou "redis" (semáforo global, usa rate_limit_redis_url)
+    openai_slot_lease_seconds: float = 120  # Redis: vaga de um processo que morreu sem liberar expira após isso
+    openai_max_retries: int = 5  # Retentativas (429, 5xx, rede) com Retry-After ou backoff com jitter
+    openai_max_wait_seconds: float = 30  # Espera máxima por orçamento de rate limit / Retry-After (maior: falha sem retentar)
+    evaluation_cache_path: str = "data/eval_cache"  # Embeddings em cache da avaliação (python -m app.rag.evaluation)
     
     # Domínios
     domains: str = "pix,open_finance"
@@ -32,6 +59,29 @@ class Settings(BaseSettings):
     data_raw_path: str = "data/raw"
     data_processed_path: str = "data/processed"
     logs_path: str = "logs"
+    ingestion_journal_path: str = "data/journal"  # Checkpoints para --resume
+    ingestion_lock_path: str = "data/locks"  # Locks por domínio (ingestão x sincronização, entre processos)
+    reindex_jobs_db_path: str = "data/reindex_jobs.db"  # Registro dos jobs de /reindex (SQLite, compartilhado entre workers)
+    
+    # Ingestão
+    index_batch_size: int = 32  # Chunks por requisição de embeddings e por upsert no Qdrant (e por commit no journal)
+    collection_versions_to_keep: int = 1  # Versões anteriores mantidas após troca blue/green (rollback)
+    reindex_min_points_ratio: float = 0.9  # Nova versão com menos pontos que isso x a publicada não é publicada (0 = desliga)
+    tokenizer_model: str = "gpt-4"  # Modelo cujo encoder tiktoken mede os chunks
+    tiktoken_cache_dir: str = "data/tiktoken_cache"  # Cache dos arquivos BPE (uso offline)
+    
+    # Download de normativos (API do Bacen)
+    bacen_max_concurrency: int = 8  # Downloads simultâneos
+    bacen_requests_per_second: float = 5.0  # Limite por host
+    bacen_max_retries: int = 4  # Retentativas (rede, 429, 5xx) com backoff e jitter
+    bacen_max_retry_wait_seconds: float = 60  # Retry-After maior que isso falha a requisição em vez de esperar
+    bacen_http_cache_path: str = "data/http_cache"  # Validadores ETag/Last-Modified e respostas brutas
+    bacen_offline: bool = False  # Servir normativos apenas do cache de respostas (sem rede)
+    bacen_corpus_format: str = "jsonl"  # "jsonl" (um arquivo por normativo) ou "json" (um arquivo por artigo)
+    bacen_corpus_compress: bool = False  # Gravar corpus .jsonl.zst (requer zstandard)
+    bacen_feed_url: str = "https://www.bcb.gov.br/api/feed/app/normativos/normativos"  # Feed Atom por ano
+    bacen_feed_start_year: int = 2021  # Primeiro ano sincronizado pelo feed
+    sync_interval_minutes: float = 1440  # Intervalo do serviço de sincronização (python -m app.ingestion.sync)
     
     class Config:
         env_file = ".env"
@@ -0,0 +1,125 @@
+"""
+Cache em disco das respostas brutas da API de normativos do Bacen.
+
+Cada resposta é gravada como recebida, com chave (tipo, numero, VersaoNormativo):
+
+    <raiz>/<tipo>/<numero>/<versao>.json
+    <raiz>/<tipo>/<numero>/latest           (nome do arquivo da versão mais recente)
+
+Com o cache, experimentos de normalização/chunking e o reprocessamento do
+corpus inteiro rodam localmente (modo offline), sem nova ida à rede.
+"""
+import json
+import re
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from app.config import get_settings
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+LATEST_POINTER = "latest"
+TIPO_FILE = "tipo.txt"
+
+
+class NormativoNotCached(LookupError):
+    """Normativo pedido em modo offline não está no cache"""
+
+
+def _slug(value: str) -> str:
+    return re.sub(r"[^\w]+", "_", str(value)).strip("_") or "sem_valor"
+
+
+def _write_atomic(path: Path, data: bytes):
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    tmp_path.replace(path)
+
+
+def response_version(data) -> str:
+    """VersaoNormativo de uma resposta da API (conteudo[0])"""
+    try:
+        versao = data["conteudo"][0].get("VersaoNormativo")
+    except (KeyError, IndexError, TypeError, AttributeError):
+        versao = None
+    return str(versao) if versao not in (None, "") else "sem_versao"
+
+
+class NormativoResponseCache:
+    """Respostas brutas da API por (tipo, numero, VersaoNormativo)"""
+    
+    def __init__(self, root: Path):
+        self.root = Path(root)
+    
+    def _dir(self, tipo: str, numero) -> Path:
+        return self.root / _slug(tipo) / _slug(numero)
+    
+    def store(self, tipo: str, numero, content: bytes, versao: Optional[str] = None) -> Path:
+        """Grava a resposta bruta e a marca como versão mais recente"""
+        if versao is None:
+            versao = response_version(json.loads(content))
+        directory = self._dir(tipo, numero)
+        directory.mkdir(parents=True, exist_ok=True)
+        
+        path = directory / f"{_slug(versao)}.json"
+        _write_atomic(path, content)
+        _write_atomic(directory / LATEST_POINTER, path.name.encode("utf-8"))
+        # Tipo original (com acentos/espaços) para listar o cache sem a API
+        _write_atomic(directory.parent / TIPO_FILE, tipo.encode("utf-8"))
+        
+        logger.debug("Resposta do normativo em cache", tipo=tipo, numero=numero, versao=versao)
+        return path
+    
+    def path_for(self, tipo: str, numero, versao: Optional[str] = None) -> Optional[Path]:
+        directory = self._dir(tipo, numero)
+        if versao is not None:
+            path = directory / f"{_slug(versao)}.json"
+            return path if path.exists() else None
+        
+        pointer = directory / LATEST_POINTER
+        if not pointer.exists():
+            return None
+        path = directory / pointer.read_text(encoding="utf-8").strip()
+        return path if path.exists() else None
+    
+    def load(self, tipo: str, numero, versao: Optional[str] = None) -> Dict:
+        """Resposta JSON em cache (versão mais recente se versao=None)"""
+        path = self.path_for(tipo, numero, versao)
+        if path is None:
+            raise NormativoNotCached(
+                f"Normativo {tipo} {numero}" + (f" (versão {versao})" if versao else "") +
+                " não está no cache de respostas"
+            )
+        with open(path, "rb") as f:
+            return json.loads(f.read())
+    
+    def versions(self, tipo: str, numero) -> List[str]:
+        directory = self._dir(tipo, numero)
+        if not directory.exists():
+            return []
+        return sorted(path.stem for path in directory.glob("*.json"))
+    
+    def list_normativos(self) -> List[Tuple[str, str]]:
+        """(tipo, numero) de todos os normativos em cache"""
+        normativos = []
+        if not self.root.exists():
+            return normativos
+        for tipo_dir in sorted(p for p in self.root.iterdir() if p.is_dir()):
+            tipo_file = tipo_dir / TIPO_FILE
+            tipo = tipo_file.read_text(encoding="utf-8") if tipo_file.exists() else tipo_dir.name
+            for numero_dir in sorted(p for p in tipo_dir.iterdir() if p.is_dir()):
+                if (numero_dir / LATEST_POINTER).exists():
+                    normativos.append((tipo, numero_dir.name))
+        return normativos
+
+
+_cache_instance: Optional[NormativoResponseCache] = None
+
+
+def get_response_cache() -> NormativoResponseCache:
+    global _cache_instance
+    if _cache_instance is None:
+        settings = get_settings()
+        _cache_instance = NormativoResponseCache(Path(settings.bacen_http_cache_path) / "responses")
+    return _cache_instance
@@ -0,0 +1,230 @@
+"""
+Cliente HTTP compartilhado para as APIs do Banco Central.
+
+- requests.Session com pool de conexões (keep-alive entre normativos)
+- Limite de requisições por host (educado com o servidor do Bacen)
+- Retentativas com backoff exponencial e jitter (erros de rede, 429 e 5xx),
+  respeitando Retry-After até BACEN_MAX_RETRY_WAIT_SECONDS (acima disso a
+  requisição falha em vez de parar o download)
+- Requisições condicionais (ETag / Last-Modified) com validadores persistidos
+  em disco: conteúdo não modificado retorna 304 e não é reprocessado
+"""
+import json
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from pathlib import Path
+from typing import Dict, Optional
+from urllib.parse import urlparse
+import requests
+from requests.adapters import HTTPAdapter
+from app.config import get_settings
+from app.utils.logger import get_logger
+from app.utils.metrics import record_cache, record_rate_limit_retry
+
+logger = get_logger(__name__)
+
+# Status que justificam nova tentativa
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+USER_AGENT = "RAG-Regulatorio/1.0 (+https://www.bcb.gov.br)"
+
+
+def backoff_delay(attempt: int, base: float = 0.5, cap: float = 30.0) -> float:
+    """Backoff exponencial com jitter completo"""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+def retry_after_seconds(response: requests.Response) -> Optional[float]:
+    """Segundos indicados pelo header Retry-After (número ou data HTTP)"""
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+class HostRateLimiter:
+    """Intervalo mínimo entre requisições ao mesmo host (thread-safe)"""
+    
+    def __init__(self, requests_per_second: float):
+        self.interval = 1.0 / requests_per_second if requests_per_second > 0 else 0.0
+        self._next_slot: Dict[str, float] = {}
+        self._lock = threading.Lock()
+    
+    def wait(self, host: str):
+        if not self.interval:
+            return
+        # Reservar o próximo horário livre sob o lock; dormir fora dele
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, 0.0))
+            self._next_slot[host] = slot + self.interval
+        delay = slot - now
+        if delay > 0:
+            time.sleep(delay)
+
+
+class ConditionalValidators:
+    """Validadores HTTP (ETag / Last-Modified) por URL, persistidos em JSON"""
+    
+    def __init__(self, path: Optional[Path]):
+        self.path = path
+        self._lock = threading.Lock()
+        self._data: Dict[str, Dict[str, str]] = {}
+        self._dirty = False
+        if path is not None and path.exists():
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    self._data = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning("Validadores HTTP ilegíveis, ignorando", path=str(path), error=str(e))
+    
+    def headers_for(self, url: str) -> Dict[str, str]:
+        with self._lock:
+            validators = self._data.get(url, {})
+        headers = {}
+        if validators.get("etag"):
+            headers["If-None-Match"] = validators["etag"]
+        if validators.get("last_modified"):
+            headers["If-Modified-Since"] = validators["last_modified"]
+        return headers
+    
+    def remember(self, url: str, response: requests.Response):
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        if not etag and not last_modified:
+            return
+        with self._lock:
+            self._data[url] = {"etag": etag or "", "last_modified": last_modified or ""}
+            self._dirty = True
+    
+    def save(self):
+        if self.path is None:
+            return
+        with self._lock:
+            if not self._dirty:
+                return
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_suffix(".tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self._data, f, ensure_ascii=False)
+            tmp_path.replace(self.path)
+            self._dirty = False
+
+
+class BacenHttpClient:
+    """Cliente HTTP com pool, limite por host, retentativas e requisições condicionais"""
+    
+    def __init__(
+        self,
+        max_concurrency: Optional[int] = None,
+        requests_per_second: Optional[float] = None,
+        max_retries: Optional[int] = None,
+        timeout: float = 30,
+        validators_path: Optional[Path] = None,
+        max_retry_wait: Optional[float] = None
+    ):
+        settings = get_settings()
+        self.max_concurrency = max_concurrency or settings.bacen_max_concurrency
+        self.max_retries = settings.bacen_max_retries if max_retries is None else max_retries
+        self.max_retry_wait = settings.bacen_max_retry_wait_seconds if max_retry_wait is None else max_retry_wait
+        self.timeout = timeout
+        self.rate_limiter = HostRateLimiter(
+            settings.bacen_requests_per_second if requests_per_second is None else requests_per_second
+        )
+        if validators_path is None:
+            validators_path = Path(settings.bacen_http_cache_path) / "validators.json"
+        self.validators = ConditionalValidators(validators_path)
+        
+        self.session = requests.Session()
+        self.session.headers["User-Agent"] = USER_AGENT
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=self.max_concurrency)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+    
+    @staticmethod
+    def request_url(url: str, params: Optional[dict] = None) -> str:
+        """URL final (com query string), usada como chave dos validadores"""
+        return requests.Request("GET", url, params=params).prepare().url
+    
+    def get(self, url: str, params: Optional[dict] = None, conditional: bool = False) -> requests.Response:
+        """
+        GET com retentativas.
+        
+        Com conditional=True envia If-None-Match / If-Modified-Since e pode
+        retornar 304. Os validadores só são gravados via remember(), depois
+        que o chamador processou a resposta com sucesso.
+        """
+        full_url = self.request_url(url, params)
+        host = urlparse(full_url).netloc
+        headers = self.validators.headers_for(full_url) if conditional else {}
+        
+        for attempt in range(self.max_retries + 1):
+            last_attempt = attempt == self.max_retries
+            self.rate_limiter.wait(host)
+            
+            try:
+                response = self.session.get(full_url, headers=headers, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if last_attempt:
+                    raise
+                delay = backoff_delay(attempt)
+                logger.warning("Erro de rede, nova tentativa", url=full_url, attempt=attempt + 1, wait_seconds=round(delay, 2), error=str(e))
+                time.sleep(delay)
+                continue
+            
+            if response.status_code in RETRY_STATUSES and not last_attempt:
+                delay = retry_after_seconds(response)
+                if delay is not None and delay > self.max_retry_wait:
+                    # Esperar uma hora travaria o worker de download e o ciclo de sincronização
+                    logger.warning("Retry-After acima do máximo, desistindo", url=full_url, status=response.status_code, retry_after=round(delay, 1), max_wait=self.max_retry_wait)
+                    response.raise_for_status()
+                if delay is None:
+                    delay = backoff_delay(attempt)
+                if response.status_code == 429:
+                    record_rate_limit_retry("bacen")
+                logger.warning("Resposta temporária do servidor, nova tentativa", url=full_url, status=response.status_code, attempt=attempt + 1, wait_seconds=round(delay, 2))
+                time.sleep(delay)
+                continue
+            
+            if response.status_code != 304:
+                response.raise_for_status()
+            if headers:
+                # Requisição condicional: 304 = validadores em cache ainda valem
+                record_cache("bacen_http", response.status_code == 304)
+            return response
+    
+    def remember(self, response: requests.Response):
+        """Grava ETag / Last-Modified da resposta para requisições condicionais futuras"""
+        if response.status_code == 200:
+            # Chave = URL pedida (antes de redirecionamentos), a mesma usada em get()
+            request = response.history[0].request if response.history else response.request
+            self.validators.remember(request.url, response)
+    
+    def save(self):
+        self.validators.save()
+    
+    def close(self):
+        self.save()
+        self.session.close()
+
+
+_client_instance: Optional[BacenHttpClient] = None
+_client_lock = threading.Lock()
+
+
+def get_http_client() -> BacenHttpClient:
+    global _client_instance
+    if _client_instance is None:
+        with _client_lock:
+            if _client_instance is None:
+                _client_instance = BacenHttpClient()
+    return _client_instance
@@ -0,0 +1,302 @@
+"""
+Sincronização incremental com o feed Atom de normativos do Banco Central.
+
+Feed: https://www.bcb.gov.br/api/feed/app/normativos/normativos?ano=<ano> (BACEN_FEED_URL)
+
+- Feeds dos anos pedidos baixados em paralelo (cliente HTTP compartilhado:
+  pool, limite por host, retentativas e requisições condicionais: feed sem
+  mudança retorna 304 e nem é lido)
+- Só entradas novas ou com <updated> mais recente que o da última execução
+  são baixadas (estado persistido em disco): a sincronização diária busca
+  apenas o delta
+- Cada normativo relevante (Pix / Open Finance) é baixado pela API
+  estruturada e salvo no corpus de ingestão (data/raw/<tema>), com a mesma
+  concorrência limitada de download_normativos
+
+Uso:
+    python -m app.ingestion.bacen_feed                  # anos padrão até o atual
+    python -m app.ingestion.bacen_feed 2024 2025 --force
+"""
+import json
+import re
+import sys
+import threading
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlparse, parse_qs
+import requests
+from app.config import get_settings
+from app.ingestion.bacen_client import BacenHttpClient, get_http_client
+from app.ingestion.bacen_normativos import download_normativos
+from app.utils.logger import setup_logger, get_logger
+
+logger = get_logger(__name__)
+
+ATOM_NS = {"atom": "http://www.w3.org/2005/Atom"}
+
+NORMA_TITLE_PATTERN = re.compile(
+    r"(Resolução\s+Conjunta|Resolução|Instrução\s+Normativa|Carta\s+Circular|Circular|Comunicado)"
+    r"\s+(BCB|BC|CMN)?\s*N[°º.]?\s*(\d+)(?:\s*,?\s+de\s+\d+/\d+/(\d{4}))?",
+    re.IGNORECASE
+)
+
+PIX_KEYWORDS = ("pix", "pagamento instantâneo", "pagamento instantaneo")
+OPEN_FINANCE_KEYWORDS = ("open finance", "open banking", "dados abertos", "compartilhamento de dados")
+
+
+def parse_feed(content: bytes) -> List[Dict]:
+    """Entradas de um feed Atom: id, title, url, content, updated"""
+    root = ET.fromstring(content)
+    entries = []
+    for entry in root.findall("atom:entry", ATOM_NS):
+        entry_data = {}
+        for field, tag in (("id", "id"), ("title", "title"), ("content", "content"), ("updated", "updated")):
+            element = entry.find(f"atom:{tag}", ATOM_NS)
+            if element is not None and element.text:
+                entry_data[field] = element.text.strip()
+        link = entry.find("atom:link", ATOM_NS)
+        if link is not None:
+            entry_data["url"] = link.get("href", "")
+        entries.append(entry_data)
+    return entries
+
+
+def extract_norma_info(title: str, url: str = "") -> Dict[str, Optional[str]]:
+    """
+    Tipo e número do normativo (no formato da API exibenormativo).
+    
+    Usa os parâmetros tipo/numero do link da entrada quando existem;
+    senão, o título ("Resolução BCB N° 1 de 12/8/2020").
+    """
+    info = {"tipo": None, "numero": None, "ano": None}
+    
+    query = parse_qs(urlparse(url).query) if url else {}
+    if query.get("tipo") and query.get("numero"):
+        info["tipo"] = query["tipo"][0]
+        info["numero"] = query["numero"][0]
+    
+    match = NORMA_TITLE_PATTERN.search(title or "")
+    if match:
+        if info["tipo"] is None:
+            tipo = re.sub(r"\s+", " ", match.group(1))
+            info["tipo"] = f"{tipo} {match.group(2).upper()}" if match.group(2) else tipo
+            info["numero"] = match.group(3)
+        info["ano"] = match.group(4)
+    
+    return info
+
+
+def classify_entry(title: str, content: str = "") -> Optional[str]:
+    """Tema da entrada (pix ou open_finance), ou None se irrelevante"""
+    text = (title + " " + (content or "")).lower()
+    if any(keyword in text for keyword in PIX_KEYWORDS):
+        return "pix"
+    if any(keyword in text for keyword in OPEN_FINANCE_KEYWORDS):
+        return "open_finance"
+    return None
+
+
+def is_pix_or_open_finance(title: str, content: str = "") -> bool:
+    """Verifica se o normativo é sobre Pix ou Open Finance"""
+    return classify_entry(title, content) is not None
+
+
+def _parse_updated(value: str) -> Optional[datetime]:
+    try:
+        parsed = datetime.fromisoformat(value.strip().replace("Z", "+00:00"))
+    except (AttributeError, ValueError):
+        return None
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+class FeedSyncState:
+    """<updated> da última versão sincronizada de cada entrada, persistido em JSON"""
+    
+    def __init__(self, path: Optional[Path]):
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries: Dict[str, str] = {}
+        self._dirty = False
+        if path is not None and path.exists():
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    self._entries = json.load(f).get("entries", {})
+            except (OSError, ValueError) as e:
+                logger.warning("Estado do feed ilegível, sincronizando tudo", path=str(path), error=str(e))
+    
+    @staticmethod
+    def entry_key(entry: Dict) -> str:
+        return entry.get("id") or entry.get("url") or entry.get("title", "")
+    
+    def is_new_or_updated(self, entry: Dict) -> bool:
+        with self._lock:
+            previous = self._entries.get(self.entry_key(entry))
+        if previous is None:
+            return True
+        current = entry.get("updated", "")
+        previous_dt, current_dt = _parse_updated(previous), _parse_updated(current)
+        if previous_dt and current_dt:
+            return current_dt > previous_dt
+        return current != previous
+    
+    def mark_synced(self, entry: Dict):
+        with self._lock:
+            self._entries[self.entry_key(entry)] = entry.get("updated", "")
+            self._dirty = True
+    
+    def save(self):
+        if self.path is None:
+            return
+        with self._lock:
+            if not self._dirty:
+                return
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_suffix(".tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"entries": self._entries}, f, ensure_ascii=False)
+            tmp_path.replace(self.path)
+            self._dirty = False
+
+
+def fetch_feed(year: int, client: Optional[BacenHttpClient] = None, conditional: bool = True):
+    """
+    Feed de um ano.
+    
+    Returns:
+        (entradas, response); (None, None) se o feed não mudou (304)
+    """
+    client = client or get_http_client()
+    response = client.get(get_settings().bacen_feed_url, params={"ano": year}, conditional=conditional)
+    if response.status_code == 304:
+        logger.info("Feed de normativos sem alterações", ano=year)
+        return None, None
+    return parse_feed(response.content), response
+
+
+def sync_feed(
+    years: List[int],
+    output_base_dir: Optional[str] = None,
+    client: Optional[BacenHttpClient] = None,
+    state: Optional[FeedSyncState] = None,
+    force: bool = False,
+    domains: Optional[List[str]] = None
+) -> List[Dict]:
+    """
+    Sincroniza os normativos relevantes publicados ou alterados desde a última execução.
+    
+    Args:
+        years: Anos do feed
+        output_base_dir: Diretório base do corpus (padrão: DATA_RAW_PATH)
+        client: Cliente HTTP (padrão: cliente compartilhado do processo)
+        state: Estado da sincronização (padrão: BACEN_HTTP_CACHE_PATH/feed_state.json)
+        force: Ignorar estado e validadores (ressincroniza tudo)
+        domains: Temas a sincronizar (padrão: pix e open_finance)
+    
+    Returns:
+        Resultados de process_normativo dos normativos baixados, com "entry"
+    """
+    settings = get_settings()
+    client = client or get_http_client()
+    output_base_dir = output_base_dir or settings.data_raw_path
+    if state is None:
+        state = FeedSyncState(Path(settings.bacen_http_cache_path) / "feed_state.json")
+    
+    failed = False
+    
+    def fetch(year: int):
+        nonlocal failed
+        try:
+            return fetch_feed(year, client, conditional=not force)
+        except (requests.RequestException, ET.ParseError) as e:
+            failed = True
+            logger.error("Erro ao ler feed de normativos", ano=year, error=str(e))
+            return None, None
+    
+    # 1. Feeds dos anos em paralelo (304 = ano sem novidades)
+    workers = max(1, min(client.max_concurrency, len(years) or 1))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bacen-feed") as executor:
+        feeds = list(executor.map(fetch, years))
+    
+    # 2. Delta: entradas relevantes novas ou com <updated> posterior ao estado
+    pending: List[Tuple[Dict, Tuple[str, str]]] = []
+    seen = set()
+    for year, (entries, _) in zip(years, feeds):
+        if entries is None:
+            continue
+        relevant = 0
+        for entry in entries:
+            domain = classify_entry(entry.get("title", ""), entry.get("content", ""))
+            if domain is None or (domains and domain not in domains):
+                continue
+            relevant += 1
+            if not force and not state.is_new_or_updated(entry):
+                continue
+            info = extract_norma_info(entry.get("title", ""), entry.get("url", ""))
+            if not info["tipo"] or not info["numero"]:
+                logger.warning("Entrada do feed sem tipo/número reconhecível", title=entry.get("title"))
+                continue
+            key = (info["tipo"], info["numero"])
+            if key not in seen:
+                seen.add(key)
+                pending.append((entry, key))
+        logger.info("Feed de normativos lido", ano=year, entradas=len(entries), relevantes=relevant)
+    
+    logger.info("Normativos novos ou alterados no feed", total=len(pending), force=force)
+    
+    # 3. Download estruturado pela API (concorrência limitada) direto no corpus
+    results = []
+    if pending:
+        results = download_normativos(
+            [key for _, key in pending],
+            output_base_dir,
+            conditional=not force,
+            client=client
+        )
+    
+    for (entry, _), result in zip(pending, results):
+        result["entry"] = entry
+        if result.get("success"):
+            state.mark_synced(entry)
+        else:
+            failed = True
+    state.save()
+    
+    # Validadores do feed só quando todas as entradas foram sincronizadas:
+    # com falhas, o próximo ciclo relê o feed e tenta de novo
+    if not failed:
+        for _, response in feeds:
+            if response is not None:
+                client.remember(response)
+    client.save()
+    
+    return results
+
+
+def default_years() -> List[int]:
+    return list(range(get_settings().bacen_feed_start_year, datetime.now().year + 1))
+
+
+def main():
+    """Entry point: python -m app.ingestion.bacen_feed [anos...] [--force]"""
+    setup_logger()
+    args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    years = [int(arg) for arg in args] or default_years()
+    results = sync_feed(years, force="--force" in sys.argv)
+    
+    successful = sum(1 for r in results if r.get("success"))
+    not_modified = sum(1 for r in results if r.get("not_modified"))
+    logger.info(
+        "Sincronização do feed concluída",
+        anos=years,
+        normativos=len(results),
+        sucesso=successful,
+        nao_modificados=not_modified,
+        falhas=len(results) - successful
+    )
+
+
+if __name__ == "__main__":
+    main()
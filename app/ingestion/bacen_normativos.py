@@ -11,9 +11,17 @@ import re
 from pathlib import Path
 from typing import Dict, List, Optional, Tuple
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 import requests
 from bs4 import BeautifulSoup
+from lxml import etree
+from app.ingestion.bacen_client import BacenHttpClient, get_http_client
+from app.ingestion.bacen_cache import NormativoNotCached, get_response_cache, response_version
+from app.ingestion.corpus import save_normativo_corpus
+from app.config import get_settings
+from app.ingestion.structure import parse_structure, article_number
 from app.utils.logger import get_logger
+from app.utils.metrics import record_cache
 
 logger = get_logger(__name__)
 
@@ -21,26 +29,110 @@ logger = get_logger(__name__)
 API_BASE_URL = "https://www.bcb.gov.br/api/conteudo/app/normativos/exibenormativo"
 
 
-def fetch_normativo(tipo: str, numero: int) -> Dict:
+def request_normativo(
+    tipo: str,
+    numero: int,
+    client: Optional[BacenHttpClient] = None,
+    conditional: bool = False
+) -> Optional[requests.Response]:
+    """
+    Faz a requisição do normativo na API oficial (sessão compartilhada, com retentativas).
+    
+    Returns:
+        requests.Response, ou None se conditional=True e o normativo não mudou (304)
+    """
+    client = client or get_http_client()
+    response = client.get(API_BASE_URL, params={"p1": tipo, "p2": numero}, conditional=conditional)
+    
+    if response.status_code == 304:
+        logger.info("Normativo não modificado desde o último download", tipo=tipo, numero=numero)
+        return None
+    
+    return response
+
+
+def load_normativo_data(
+    tipo: str,
+    numero: int,
+    client: Optional[BacenHttpClient] = None,
+    conditional: bool = False,
+    offline: Optional[bool] = None
+) -> Tuple[Optional[Dict], Optional[requests.Response]]:
+    """
+    Resposta JSON da API do normativo.
+    
+    Em modo offline vem do cache de respostas (NormativoNotCached se ausente);
+    caso contrário vem da rede e a resposta bruta é gravada no cache, chaveada
+    por (tipo, numero, VersaoNormativo).
+    
+    Returns:
+        (dados, response); (None, None) se conditional=True e não houve mudança
+    """
+    if offline is None:
+        offline = get_settings().bacen_offline
+    
+    if offline:
+        logger.debug("Normativo servido do cache (offline)", tipo=tipo, numero=numero)
+        try:
+            data = get_response_cache().load(tipo, numero)
+        except NormativoNotCached:
+            record_cache("bacen_response", False)
+            raise
+        record_cache("bacen_response", True)
+        return data, None
+    
+    response = request_normativo(tipo, numero, client, conditional)
+    if response is None:
+        return None, None
+    
+    data = response.json()
+    get_response_cache().store(tipo, numero, response.content, response_version(data))
+    return data, response
+
+
+def parse_normativo_response(data, tipo: str, numero: int) -> Dict:
+    """Valida a resposta JSON da API e retorna conteudo[0]"""
+    # Validar estrutura da resposta
+    if not isinstance(data, dict):
+        raise ValueError(f"Resposta da API em formato inesperado: {type(data)}")
+    
+    if "conteudo" not in data:
+        raise ValueError("Resposta da API não contém campo 'conteudo'")
+    
+    if not data["conteudo"] or len(data["conteudo"]) == 0:
+        raise ValueError(
+            f"Normativo não encontrado: {tipo} {numero}. "
+            "Verifique se o tipo e número estão corretos."
+        )
+    
+    return data["conteudo"][0]
+
+
+def fetch_normativo(
+    tipo: str,
+    numero: int,
+    client: Optional[BacenHttpClient] = None,
+    conditional: bool = False,
+    offline: Optional[bool] = None
+) -> Optional[Dict]:
     """
     Busca normativo na API oficial do Banco Central.
     
     Args:
         tipo: Tipo do normativo (ex: "Instrução Normativa BCB", "Resolução BCB")
         numero: Número do normativo (ex: 513)
+        client: Cliente HTTP (padrão: cliente compartilhado do processo)
+        conditional: Enviar ETag/Last-Modified do último download
+        offline: Servir apenas do cache de respostas (padrão: settings.bacen_offline)
     
     Returns:
-        dict: Conteúdo completo do normativo (conteudo[0])
+        dict: Conteúdo completo do normativo (conteudo[0]), ou None se
+        conditional=True e o normativo não mudou
     
     Raises:
         requests.HTTPError: Se a requisição falhar
         ValueError: Se o normativo não for encontrado
     """
-    params = {
-        "p1": tipo,
-        "p2": numero
-    }
-    
     logger.info(
         "Buscando normativo na API do Bacen",
         tipo=tipo,
@@ -48,25 +140,11 @@ def fetch_normativo(tipo: str, numero: int) -> Dict:
     )
     
     try:
-        response = requests.get(API_BASE_URL, params=params, timeout=30)
-        response.raise_for_status()
-        
-        data = response.json()
+        data, _ = load_normativo_data(tipo, numero, client, conditional, offline)
+        if data is None:
+            return None
         
-        # Validar estrutura da resposta
-        if not isinstance(data, dict):
-            raise ValueError(f"Resposta da API em formato inesperado: {type(data)}")
-        
-        if "conteudo" not in data:
-            raise ValueError("Resposta da API não contém campo 'conteudo'")
-        
-        if not data["conteudo"] or len(data["conteudo"]) == 0:
-            raise ValueError(
-                f"Normativo não encontrado: {tipo} {numero}. "
-                "Verifique se o tipo e número estão corretos."
-            )
-        
-        normativo = data["conteudo"][0]
+        normativo = parse_normativo_response(data, tipo, numero)
         
         logger.info(
             "Normativo encontrado",
@@ -95,12 +173,122 @@ def fetch_normativo(tipo: str, numero: int) -> Dict:
         raise ValueError(f"Erro ao processar normativo {tipo} {numero}: {e}")
 
 
+# Tags removidas com todo o conteúdo (texto revogado e não textual)
+REMOVED_TAGS = frozenset(("s", "script", "style", "noscript"))
+
+# Tags cujo texto não é extraído (strings especiais no BeautifulSoup)
+IGNORED_TEXT_TAGS = frozenset(("template", "rt", "rp"))
+
+# Tags de formatação: sem elementos filhos, viram um único trecho de texto
+FORMATTING_TAGS = frozenset(("span", "div", "font"))
+
+MULTIPLE_BLANK_LINES_PATTERN = re.compile(r"\n{3,}")
+MULTIPLE_SPACES_PATTERN = re.compile(r" +")
+
+
+class _TextCollector:
+    """
+    Alvo de parser lxml (eventos em streaming, sem montar árvore) que extrai
+    os trechos de texto do documento em uma única passada.
+    
+    Regras (as mesmas da normalização anterior com BeautifulSoup):
+    - <s>, <script>, <style>, <noscript> são descartados com o conteúdo
+    - span/div/font sem elementos filhos viram um trecho (partes unidas sem separador)
+    - <p> vira um trecho (partes unidas por espaço); <p> vazio é descartado
+    - demais nós de texto viram trechos próprios; comentários são ignorados
+    - cada trecho é aparado (strip) e trechos vazios são descartados
+    """
+    
+    def __init__(self):
+        self.pieces: List[str] = []
+        self.body_start = 0
+        self.body_end = -1
+        # Elementos abertos: (tag, trechos do elemento ou None, teve filho?)
+        self._open: List[list] = []
+        self._targets = [self.pieces]
+        self._buffer: List[str] = []
+        self._removed_depth = 0
+        self._ignored_depth = 0
+    
+    def _flush(self):
+        """Fecha o nó de texto corrente (dados consecutivos formam um nó)"""
+        if self._buffer:
+            text = "".join(self._buffer).strip()
+            self._buffer.clear()
+            if text and not self._ignored_depth:
+                self._targets[-1].append(text)
+    
+    def start(self, tag, attrib):
+        self._flush()
+        if self._removed_depth or tag in REMOVED_TAGS:
+            self._removed_depth += 1
+            return
+        
+        if self._open:
+            self._open[-1][2] = True
+        if tag in IGNORED_TEXT_TAGS:
+            self._ignored_depth += 1
+        if tag == "body":
+            self.body_start = len(self.pieces)
+        
+        # <p> e tags de formatação acumulam seus trechos até o fechamento
+        parts = [] if tag == "p" or tag in FORMATTING_TAGS else None
+        if parts is not None:
+            self._targets.append(parts)
+        self._open.append([tag, parts, False])
+    
+    def end(self, tag):
+        self._flush()
+        if self._removed_depth:
+            self._removed_depth -= 1
+            return
+        
+        tag, parts, has_children = self._open.pop()
+        if tag in IGNORED_TEXT_TAGS:
+            self._ignored_depth -= 1
+        
+        if parts is not None:
+            self._targets.pop()
+            target = self._targets[-1]
+            if tag == "p":
+                joined = " ".join(parts)
+                if joined:
+                    target.append(joined)
+            elif not has_children:
+                joined = "".join(parts)
+                if joined:
+                    target.append(joined)
+            else:
+                target.extend(parts)
+        
+        if tag == "body":
+            self.body_end = len(self.pieces)
+    
+    def data(self, data):
+        if not self._removed_depth:
+            self._buffer.append(data)
+    
+    def comment(self, text):
+        self._flush()
+    
+    def pi(self, target, data=None):
+        self._flush()
+    
+    def doctype(self, *args):
+        self._flush()
+    
+    def close(self):
+        self._flush()
+        return self
+
+
 def normalize_html(html: str) -> str:
     """
     Normaliza HTML preservando estrutura jurídica.
     
     Remove tags desnecessárias, texto revogado e normaliza formatação,
-    mantendo artigos, parágrafos e incisos.
+    mantendo artigos, parágrafos e incisos. O HTML é lido com lxml e o texto
+    extraído em uma única passada pelos eventos do parser (_TextCollector).
     
     Args:
         html: HTML bruto do normativo
@@ -113,72 +301,39 @@ def normalize_html(html: str) -> str:
         return ""
     
     try:
-        soup = BeautifulSoup(html, "lxml")
-        
-        # Remover completamente texto revogado (tag <s>)
-        for revoked in soup.find_all("s"):
-            revoked.decompose()
-        
-        # Remover tags que não contêm conteúdo útil
-        for tag in soup.find_all(["script", "style", "noscript"]):
-            tag.decompose()
-        
-        # Processar tags de formatação: substituir por texto, não remover
-        # Isso preserva o conteúdo dentro de span, div, font, etc.
-        for tag in soup.find_all(["span", "div", "font"]):
-            # Se a tag tem apenas texto (sem filhos), substituir pelo texto
-            if not tag.find_all():
-                text = tag.get_text(strip=True)
-                if text:
-                    tag.replace_with(text)
-                else:
-                    tag.decompose()
-            # Se tem filhos, manter estrutura mas remover atributos
-            else:
-                # Remover apenas atributos, manter conteúdo
-                tag.attrs = {}
-        
-        # Converter quebras de linha para \n
-        for br in soup.find_all("br"):
-            br.replace_with("\n")
-        
-        # Processar parágrafos: preservar conteúdo
-        for p in soup.find_all("p"):
-            text = p.get_text(separator=" ", strip=True)
-            if text:
-                # Adicionar quebra de linha após parágrafo
-                p.replace_with(f"{text}\n")
-            else:
-                p.decompose()
+        collector = _TextCollector()
+        parser = etree.HTMLParser(target=collector, recover=True)
+        parser.feed(html)
+        parser.close()
+        pieces, body_start, body_end = collector.pieces, collector.body_start, collector.body_end
         
         # Extrair texto preservando quebras de linha
-        # Usar get_text com separator para preservar estrutura
-        text = soup.get_text(separator="\n", strip=True)
+        text = "\n".join(pieces)
         
         # Se ainda estiver vazio, tentar método alternativo
         if not text or len(text.strip()) < 50:
             logger.warning("Texto extraído muito curto, tentando método alternativo")
-            # Tentar extrair diretamente do body ou html
-            body = soup.find("body") or soup
-            text = body.get_text(separator="\n", strip=True)
+            # Usar apenas o texto do body
+            if body_end >= 0:
+                text = "\n".join(pieces[body_start:body_end])
         
         # Normalizar múltiplas quebras de linha (máximo 2 consecutivas)
-        text = re.sub(r'\n{3,}', '\n\n', text)
+        text = MULTIPLE_BLANK_LINES_PATTERN.sub("\n\n", text)
         
         # Normalizar espaços múltiplos dentro de linhas
-        lines = text.split('\n')
         normalized_lines = []
-        for line in lines:
-            # Preservar espaços iniciais (para indentação de incisos)
-            leading_spaces = len(line) - len(line.lstrip())
-            # Normalizar espaços múltiplos no conteúdo
-            content = re.sub(r' +', ' ', line.strip())
+        for line in text.split("\n"):
+            content = line.strip()
             if content:
-                normalized_lines.append(' ' * leading_spaces + content)
+                # Preservar espaços iniciais (para indentação de incisos)
+                leading_spaces = len(line) - len(line.lstrip())
+                if "  " in content:
+                    content = MULTIPLE_SPACES_PATTERN.sub(" ", content)
+                normalized_lines.append(" " * leading_spaces + content if leading_spaces else content)
             else:
-                normalized_lines.append('')
+                normalized_lines.append("")
         
-        text = '\n'.join(normalized_lines)
+        text = "\n".join(normalized_lines)
         
         # Remover linhas vazias excessivas no início e fim
         text = text.strip()
@@ -234,33 +389,21 @@ def chunk_by_article(text: str) -> List[Tuple[str, str]]:
         logger.warning("Texto vazio recebido para chunking")
         return []
     
-    # Padrão para encontrar artigos
+    # Fronteiras de artigos via tokenizador estrutural (regex pré-compilado, uma varredura)
     # Aceita: Art. 1, Art. 1º, Artigo 1, ART. 1, etc.
-    article_pattern = r'(?i)(Art\.?\s*\d+[º°]?)\s*[–-]?\s*'
+    structure = parse_structure(text)
     
-    articles = []
-    matches = list(re.finditer(article_pattern, text))
-    
-    if not matches:
+    if not structure.articles:
         logger.warning("Nenhum artigo encontrado no texto")
         # Se não encontrar artigos, retornar texto inteiro como único chunk
         return [("", text)]
     
-    for i, match in enumerate(matches):
-        start = match.start()
-        
-        # Determinar fim do artigo (início do próximo ou fim do texto)
-        if i + 1 < len(matches):
-            end = matches[i + 1].start()
-        else:
-            end = len(text)
-        
-        article_text = text[start:end].strip()
+    articles = []
+    for article in structure.articles:
+        article_text = text[article.start:article.end].strip()
         
         # Extrair número do artigo
-        article_num = match.group(1)
-        article_num_clean = re.sub(r'(?i)art\.?\s*', '', article_num).strip()
-        article_num_clean = re.sub(r'[º°]', '', article_num_clean).strip()
+        article_num_clean = article_number(article.label, strip_ordinal=True)
         
         if article_text and len(article_text) > 10:
             articles.append((article_num_clean, article_text))
@@ -416,7 +559,15 @@ def save_chunks(chunks: List[Dict], output_dir: Path, normativo_info: Dict) -> i
     return saved
 
 
-def process_normativo(tipo: str, numero: int, output_dir: Path) -> Dict:
+def process_normativo(
+    tipo: str,
+    numero: int,
+    output_dir: Path,
+    client: Optional[BacenHttpClient] = None,
+    conditional: bool = False,
+    by_theme: bool = False,
+    offline: Optional[bool] = None
+) -> Dict:
     """
     Processa um normativo completo: download, normalização e chunking.
     
@@ -424,6 +575,10 @@ def process_normativo(tipo: str, numero: int, output_dir: Path) -> Dict:
         tipo: Tipo do normativo
         numero: Número do normativo
         output_dir: Diretório de saída
+        client: Cliente HTTP (padrão: cliente compartilhado do processo)
+        conditional: Pular o normativo se não mudou desde o último download (304)
+        by_theme: Salvar em output_dir/<tema> (tema inferido do normativo)
+        offline: Usar apenas o cache de respostas (padrão: settings.bacen_offline)
     
     Returns:
         dict: Estatísticas do processamento
@@ -434,9 +589,21 @@ def process_normativo(tipo: str, numero: int, output_dir: Path) -> Dict:
         numero=numero
     )
     
+    client = client or get_http_client()
+    
     try:
         # 1. Buscar normativo na API
-        normativo = fetch_normativo(tipo, numero)
+        data, response = load_normativo_data(tipo, numero, client, conditional, offline)
+        if data is None:
+            return {
+                "success": True,
+                "not_modified": True,
+                "tipo": tipo,
+                "numero": numero,
+                "artigos_encontrados": 0,
+                "chunks_salvos": 0
+            }
+        normativo = parse_normativo_response(data, tipo, numero)
         
         # 2. Extrair e normalizar HTML
         html_text = normativo.get("Texto", "")
@@ -463,14 +630,35 @@ def process_normativo(tipo: str, numero: int, output_dir: Path) -> Dict:
                 "metadata": metadata
             })
         
-        # 5. Salvar chunks
-        saved = save_chunks(chunks, output_dir, normativo)
+        # 5. Salvar chunks (corpus JSONL por normativo ou um JSON por artigo)
+        tema = chunks[0]["metadata"]["tema"]
+        target_dir = output_dir / tema if by_theme else output_dir
+        settings = get_settings()
+        corpus_path = None
+        if settings.bacen_corpus_format == "jsonl":
+            corpus_path = save_normativo_corpus(
+                chunks,
+                target_dir,
+                normativo,
+                chunks[0]["metadata"]["ano"],
+                compress=settings.bacen_corpus_compress
+            )
+            saved = len(chunks)
+        else:
+            saved = save_chunks(chunks, target_dir, normativo)
+        
+        # Só agora o normativo conta como baixado para requisições condicionais
+        if response is not None:
+            client.remember(response)
         
         return {
             "success": True,
             "tipo": tipo,
             "numero": numero,
             "titulo": normativo.get("Titulo", ""),
+            "tema": tema,
+            "versao": normativo.get("VersaoNormativo", ""),
+            "arquivo": str(corpus_path) if corpus_path else None,
             "artigos_encontrados": len(articles),
             "chunks_salvos": saved,
             "texto_tamanho": len(normalized_text)
@@ -491,13 +679,82 @@ def process_normativo(tipo: str, numero: int, output_dir: Path) -> Dict:
         }
 
 
-def main(normativos: List[Tuple[str, int]], output_base_dir: str = "data/raw"):
+def download_normativos(
+    normativos: List[Tuple[str, int]],
+    output_base_dir: str = "data/raw",
+    max_concurrency: Optional[int] = None,
+    conditional: bool = True,
+    client: Optional[BacenHttpClient] = None,
+    offline: Optional[bool] = None
+) -> List[Dict]:
+    """
+    Baixa e processa normativos em paralelo.
+    
+    Concorrência limitada, sessão HTTP compartilhada (keep-alive), limite de
+    requisições por host e requisições condicionais: normativos que não
+    mudaram desde o último download não são reprocessados. Em modo offline,
+    tudo é servido do cache de respostas (sem rede).
+    
+    Returns:
+        Lista de resultados de process_normativo, na ordem de entrada
+    """
+    client = client or get_http_client()
+    workers = max(1, min(max_concurrency or client.max_concurrency, len(normativos) or 1))
+    output_base = Path(output_base_dir)
+    
+    def run(item: Tuple[int, Tuple[str, int]]) -> Dict:
+        i, (tipo, numero) = item
+        logger.info(
+            "Processando normativo",
+            progress=f"{i}/{len(normativos)}",
+            tipo=tipo,
+            numero=numero
+        )
+        return process_normativo(
+            tipo,
+            numero,
+            output_base,
+            client=client,
+            conditional=conditional,
+            by_theme=True,
+            offline=offline
+        )
+    
+    try:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bacen-download") as executor:
+            results = list(executor.map(run, enumerate(normativos, 1)))
+    finally:
+        client.save()
+    
+    return results
+
+
+def reprocess_cached(output_base_dir: str = "data/raw") -> List[Dict]:
+    """
+    Renormaliza e rechunka todos os normativos do cache de respostas, sem rede.
+    
+    save_chunks não sobrescreve arquivos existentes: use um diretório de saída
+    novo para comparar com o corpus atual.
+    """
+    normativos = get_response_cache().list_normativos()
+    logger.info("Reprocessando normativos do cache", total_normativos=len(normativos), output_dir=output_base_dir)
+    return download_normativos(normativos, output_base_dir, conditional=False, offline=True)
+
+
+def main(
+    normativos: List[Tuple[str, int]],
+    output_base_dir: str = "data/raw",
+    offline: Optional[bool] = None
+):
     """
     Função principal que executa o pipeline completo.
     
+    Os normativos são baixados em paralelo e salvos em output_base_dir/<tema>.
+    
     Args:
         normativos: Lista de tuplas (tipo, numero) para processar
         output_base_dir: Diretório base de saída
+        offline: Usar apenas o cache de respostas (padrão: settings.bacen_offline)
     """
     logger.info(
         "Iniciando pipeline de download e normalização",
@@ -505,65 +762,18 @@ def main(normativos: List[Tuple[str, int]], output_base_dir: str = "data/raw"):
         output_dir=output_base_dir
     )
     
-    results = []
-    output_base = Path(output_base_dir)
-    
-    for i, (tipo, numero) in enumerate(normativos, 1):
-        logger.info(
-            "Processando normativo",
-            progress=f"{i}/{len(normativos)}",
-            tipo=tipo,
-            numero=numero
-        )
-        
-        # Determinar diretório de saída baseado no tema
-        # Será inferido durante o processamento
-        temp_output = output_base / "temp"
-        result = process_normativo(tipo, numero, temp_output)
-        
-        # Mover para diretório correto baseado no tema
-        if result["success"]:
-            # Inferir tema do primeiro chunk
-            chunks_files = list(temp_output.glob("*.json"))
-            if chunks_files:
-                try:
-                    with open(chunks_files[0], 'r', encoding='utf-8') as f:
-                        chunk_data = json.load(f)
-                        tema = chunk_data["metadata"].get("tema", "outros")
-                    
-                    final_output = output_base / tema
-                    final_output.mkdir(parents=True, exist_ok=True)
-                    
-                    # Mover arquivos
-                    for chunk_file in chunks_files:
-                        target = final_output / chunk_file.name
-                        if not target.exists():  # Idempotência
-                            chunk_file.rename(target)
-                        else:
-                            chunk_file.unlink()  # Remover duplicado
-                    
-                    # Limpar diretório temp se vazio
-                    try:
-                        if temp_output.exists() and not list(temp_output.iterdir()):
-                            temp_output.rmdir()
-                    except:
-                        pass
-                except Exception as e:
-                    logger.warning(
-                        "Erro ao mover arquivos para diretório final",
-                        error=str(e)
-                    )
-        
-        results.append(result)
+    results = download_normativos(normativos, output_base_dir, offline=offline)
     
     # Resumo final
     successful = sum(1 for r in results if r.get("success"))
+    not_modified = sum(1 for r in results if r.get("not_modified"))
     failed = len(results) - successful
     
     logger.info(
         "Pipeline concluído",
         total=len(results),
         sucesso=successful,
+        nao_modificados=not_modified,
         falhas=failed
     )
     
@@ -0,0 +1,232 @@
+"""
+Journal de checkpoint da ingestão.
+
+Persiste, chunk a chunk, os embeddings já gerados e quais deles já foram
+gravados no Qdrant. Se a ingestão morrer no meio de um arquivo (quota,
+timeout do Qdrant, restart de deploy), o modo --resume continua do último
+chunk em vez de gerar todos os embeddings novamente.
+
+Formato: um arquivo JSONL por arquivo de origem, com registros:
+    {"type": "header", "source": ..., "fingerprint": ..., "chunks": N}
+    {"type": "embedded", "index": i, "id": ..., "vector": [...], "payload": {...}}
+    {"type": "commit", "indices": [i, j, ...]}
+
+Reindexações completas (coleção sombra) também registram em
+<coleção>.rebuild os arquivos já indexados, um nome por linha: ao retomar,
+arquivos já arquivados em data/processed não são indexados de novo.
+"""
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Dict, List
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+def fingerprint_text(text: str, max_tokens: int, prechunked: bool = False) -> str:
+    """Identifica o conteúdo do arquivo + configuração de chunking."""
+    digest = hashlib.sha1(text.encode("utf-8")).hexdigest()
+    return f"{digest}:{max_tokens}" + (":pre" if prechunked else "")
+
+
+class IngestionJournal:
+    """Journal append-only de embeddings e commits de um arquivo"""
+    
+    def __init__(self, journal_dir: Path, source: Path, fingerprint: str, total_chunks: int):
+        self.source = source
+        self.fingerprint = fingerprint
+        self.total_chunks = total_chunks
+        
+        journal_dir.mkdir(parents=True, exist_ok=True)
+        self.path = journal_dir / f"{source.name}.journal.jsonl"
+        
+        self.embedded: Dict[int, dict] = {}
+        self.committed: set = set()
+        self._fh = None
+    
+    def load(self) -> bool:
+        """
+        Carrega journal existente.
+        
+        Returns:
+            bool: True se havia progresso reaproveitável para este arquivo
+        """
+        if not self.path.exists():
+            return False
+        
+        header = None
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        # Última linha pode ter ficado pela metade no crash
+                        logger.warning("Registro corrompido no journal ignorado", journal=str(self.path))
+                        continue
+                    
+                    kind = record.get("type")
+                    if kind == "header":
+                        header = record
+                    elif kind == "embedded":
+                        self.embedded[record["index"]] = record
+                    elif kind == "commit":
+                        self.committed.update(record.get("indices", []))
+        except OSError as e:
+            logger.warning("Erro ao ler journal", journal=str(self.path), error=str(e))
+            return False
+        
+        if (
+            not header
+            or header.get("fingerprint") != self.fingerprint
+            or header.get("chunks") != self.total_chunks
+        ):
+            logger.warning(
+                "Journal não corresponde ao arquivo atual, descartando",
+                journal=str(self.path),
+                source=str(self.source)
+            )
+            self.discard()
+            return False
+        
+        logger.info(
+            "Journal carregado para retomada",
+            source=str(self.source),
+            embedded=len(self.embedded),
+            committed=len(self.committed),
+            total_chunks=self.total_chunks
+        )
+        return bool(self.embedded)
+    
+    def _open(self):
+        if self._fh is None:
+            is_new = not self.path.exists() or self.path.stat().st_size == 0
+            self._fh = open(self.path, "a", encoding="utf-8")
+            if is_new:
+                self._write({
+                    "type": "header",
+                    "source": str(self.source),
+                    "fingerprint": self.fingerprint,
+                    "chunks": self.total_chunks,
+                })
+        return self._fh
+    
+    def _write(self, record: dict):
+        fh = self._fh
+        fh.write(json.dumps(record, ensure_ascii=False) + "\n")
+        fh.flush()
+        os.fsync(fh.fileno())
+    
+    def is_embedded(self, index: int) -> bool:
+        return index in self.embedded
+    
+    def uncommitted(self) -> List[dict]:
+        """Embeddings já gerados mas ainda não gravados no Qdrant"""
+        return [
+            record for index, record in sorted(self.embedded.items())
+            if index not in self.committed
+        ]
+    
+    def record_embedding(self, index: int, point_id: str, vector: List[float], payload: dict):
+        """Persiste um embedding antes do upsert"""
+        self._open()
+        record = {
+            "type": "embedded",
+            "index": index,
+            "id": point_id,
+            "vector": vector,
+            "payload": payload,
+        }
+        self._write(record)
+        self.embedded[index] = record
+    
+    def record_commit(self, indices: List[int]):
+        """Marca chunks como gravados no Qdrant"""
+        if not indices:
+            return
+        self._open()
+        self._write({"type": "commit", "indices": list(indices)})
+        self.committed.update(indices)
+    
+    def close(self):
+        if self._fh is not None:
+            self._fh.close()
+            self._fh = None
+    
+    def discard(self):
+        """Remove journal (arquivo concluído ou journal inválido)"""
+        self.close()
+        self.embedded.clear()
+        self.committed.clear()
+        try:
+            self.path.unlink()
+        except FileNotFoundError:
+            pass
+    
+    def complete(self):
+        """Arquivo totalmente indexado, journal não é mais necessário"""
+        logger.debug("Journal concluído", source=str(self.source))
+        self.discard()
+
+
+def open_journal(
+    journal_root: Path,
+    domain: str,
+    source: Path,
+    fingerprint: str,
+    total_chunks: int,
+    resume: bool
+) -> IngestionJournal:
+    """
+    Abre o journal de um arquivo.
+    
+    Com resume=True reaproveita o progresso salvo; caso contrário começa do zero.
+    """
+    journal = IngestionJournal(journal_root / domain, source, fingerprint, total_chunks)
+    if resume:
+        journal.load()
+    elif journal.path.exists():
+        logger.info("Journal anterior descartado (use --resume para retomar)", source=str(source))
+        journal.discard()
+    return journal
+
+
+def has_pending_journals(journal_root: Path, domain: str) -> bool:
+    """Indica se existem ingestões interrompidas para o domínio"""
+    domain_dir = journal_root / domain
+    return domain_dir.exists() and any(domain_dir.glob("*.journal.jsonl"))
+
+
+class RebuildManifest:
+    """Arquivos já indexados na coleção sombra de uma reindexação completa"""
+    
+    def __init__(self, journal_root: Path, domain: str, collection_name: str):
+        self.path = journal_root / domain / f"{collection_name}.rebuild"
+        self.done = set()
+        if self.path.exists():
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.done = {line.strip() for line in f if line.strip()}
+    
+    def __contains__(self, filename: str) -> bool:
+        return filename in self.done
+    
+    def add(self, filename: str):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(filename + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self.done.add(filename)
+
+
+def discard_rebuild_manifests(journal_root: Path, domain: str):
+    """Remove manifestos de reindexações anteriores (coleções sombra descartadas)"""
+    domain_dir = journal_root / domain
+    if domain_dir.exists():
+        for path in domain_dir.glob("*.rebuild"):
+            path.unlink()
@@ -1,11 +1,60 @@
 import re
-import tiktoken
-from typing import List, Optional
-from app.models.schemas import DocumentChunk, Metadata
+from typing import List, NamedTuple, Optional
+from app.models.records import ChunkMetadata, ChunkRecord
+from app.ingestion.structure import StructuralNode, parse_structure, article_number
+from app.ingestion.tokens import TokenOffsetMap
+from app.utils.tokenizer import get_encoding
 from app.utils.logger import get_logger
 
 logger = get_logger(__name__)
 
+# Padrões mais flexíveis para documentos normativos, combinados em um único regex
+NORMATIVE_REFERENCE_PATTERN = re.compile(
+    r"\b(?:"
+    r"(?:artigo|art\.?)\s+\d+"  # Artigo
+    r"|(?:inciso|inc\.?)\s+[IVX]+"  # Inciso
+    r"|(?:parágrafo|par\.?)\s+\d+"  # Parágrafo
+    r"|resolução|circular|comunicado|instrução"  # Tipos de norma
+    r"|norma|normativo|regulamenta"  # Termos normativos
+    r"|bacen|banco\s+central"  # Referência ao Bacen
+    r"|pix|open\s+finance"  # Temas específicos
+    r"|obrigação|dever|proibição|permissão"  # Termos jurídicos
+    r")",
+    re.IGNORECASE
+)
+
+
+# Separadores para dividir trechos sem estrutura, do mais forte para o mais fraco
+TEXT_SEPARATORS = ("\n", "; ", ". ", " ")
+
+# Chunks menores que isso são descartados na validação
+MIN_CHUNK_CHARS = 10
+
+
+class _Piece(NamedTuple):
+    """Span [start, end) de um pedaço estrutural com seu caminho de rótulos"""
+    start: int
+    end: int
+    labels: List[str]
+    tokens: int
+
+
+def _strip_bounds(text: str, start: int, end: int) -> tuple:
+    """Offsets de text[start:end].strip() no texto original"""
+    while start < end and text[start].isspace():
+        start += 1
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    return start, end
+
+
+def _node_label(node: StructuralNode) -> str:
+    if node.kind == "paragrafo":
+        return "Parágrafo único" if node.label == "único" else f"§ {node.label}"
+    if node.kind == "alinea":
+        return f"{node.label})"
+    return node.label
+
 
 class JuridicalChunker:
     """
@@ -15,159 +64,137 @@ class JuridicalChunker:
     
     def __init__(self, max_tokens: int = 600):
         self.max_tokens = max_tokens
-        self.encoding = tiktoken.encoding_for_model("gpt-4")
+    
+    @property
+    def encoding(self):
+        """Encoder compartilhado, carregado no primeiro uso"""
+        return get_encoding()
     
     def count_tokens(self, text: str) -> int:
         """Conta tokens usando tiktoken"""
         return len(self.encoding.encode(text))
     
+    def token_map(self, text: str) -> TokenOffsetMap:
+        """Codifica o texto uma vez para contagens de spans em O(1)"""
+        return TokenOffsetMap(self.encoding, text)
+    
     def split_by_article(self, text: str) -> List[tuple[str, Optional[str]]]:
         """
         Divide texto por artigos.
         Retorna lista de (texto, número_artigo).
         """
-        # Padrão para encontrar artigos
-        article_pattern = r'(?i)(Art\.?\s*\d+[º°]?)\s*[–-]?\s*'
+        structure = parse_structure(text)
+        articles = structure.articles
         
-        articles = []
-        matches = list(re.finditer(article_pattern, text))
-        
-        if not matches:
+        if not articles:
             # Se não encontrar artigos, retorna texto inteiro
             return [(text, None)]
         
-        for i, match in enumerate(matches):
-            start = match.start()
-            
-            # Determinar fim do artigo
-            if i + 1 < len(matches):
-                end = matches[i + 1].start()
-            else:
-                end = len(text)
-            
-            article_text = text[start:end].strip()
-            article_num = match.group(1)
-            # Limpar número do artigo
-            article_num_clean = re.sub(r'(?i)art\.?\s*', '', article_num).strip()
-            
-            articles.append((article_text, article_num_clean))
-        
-        return articles
+        return [
+            (text[article.start:article.end].strip(), article_number(article.label))
+            for article in articles
+        ]
     
     def split_article_by_inciso(self, article_text: str, article_num: str) -> List[tuple[str, str]]:
         """
         Divide artigo por incisos se necessário.
         Retorna lista de (texto, identificador_completo).
         """
-        # Padrão para incisos romanos
-        inciso_pattern = r'(?i)([IVX]+[º°]?)\s*[–-]?\s*'
+        structure = parse_structure(article_text)
+        return self._split_node_by_inciso(article_text, structure.root, article_num)
+    
+    def _split_node_by_inciso(self, text: str, node: StructuralNode, article_num: str) -> List[tuple[str, str]]:
+        """Divide o span de um artigo nos incisos da sua subárvore (sem nova varredura)"""
+        incisos = [child for child in node.walk() if child.kind == "inciso"]
         
-        incisos = []
-        matches = list(re.finditer(inciso_pattern, article_text))
+        if not incisos:
+            return [(text[node.start:node.end].strip(), f"Art. {article_num}")]
         
-        if not matches:
-            return [(article_text, f"Art. {article_num}")]
+        segments = []
+        for i, inciso in enumerate(incisos):
+            end = incisos[i + 1].start if i + 1 < len(incisos) else node.end
+            inciso_text = text[inciso.start:end].strip()
+            identifier = f"Art. {article_num}, {inciso.label}"
+            segments.append((inciso_text, identifier))
         
-        for i, match in enumerate(matches):
-            start = match.start()
-            
-            if i + 1 < len(matches):
-                end = matches[i + 1].start()
-            else:
-                end = len(article_text)
-            
-            inciso_text = article_text[start:end].strip()
-            inciso_num = match.group(1)
-            identifier = f"Art. {article_num}, {inciso_num}"
-            
-            incisos.append((inciso_text, identifier))
-        
-        return incisos
+        return segments
     
-    def chunk(self, text: str, base_metadata: dict) -> List[DocumentChunk]:
+    def chunk(self, text: str, base_metadata: dict, token_map: Optional[TokenOffsetMap] = None) -> List[ChunkRecord]:
         """
         Chunking jurídico principal.
-        Divide por artigo, e por inciso se necessário.
+        
+        Cada artigo que cabe em max_tokens vira um chunk. Artigos maiores são
+        divididos recursivamente pela estrutura (caput → § → inciso → alínea e,
+        em último caso, linhas/frases/palavras) e os pedaços vizinhos são
+        reagrupados até perto do orçamento. Nenhum trecho do texto é descartado:
+        o preâmbulo (antes do primeiro artigo) também vira chunk.
+        
+        O documento é codificado uma única vez (TokenOffsetMap, ou o
+        `token_map` já construído para o mesmo texto); todas as decisões de
+        tamanho usam contagens de spans e cada chunk sai com token_count
+        preenchido.
+        
+        Os metadados base são validados uma vez por documento; os chunks são
+        ChunkRecord (slots), convertidos para Pydantic só na fronteira da API.
         """
         chunks = []
-        articles = self.split_by_article(text)
+        structure = parse_structure(text)
+        token_map = token_map or self.token_map(text)
+        document_metadata = ChunkMetadata.validated(base_metadata)
+        
+        # Unidades: preâmbulo + artigos (ou documento inteiro se não houver artigos)
+        units = []
+        if structure.articles:
+            preamble_end = structure.preamble_end
+            if text[:preamble_end].strip():
+                units.append((0, preamble_end, [], None))
+            for article in structure.articles:
+                units.append((article.start, article.end, article.children, article_number(article.label)))
+        else:
+            units.append((0, len(text), structure.root.children, None))
         
-        for article_text, article_num in articles:
+        for start, end, children, article_num in units:
+            unit_text = text[start:end].strip()
+            
             # Validar que o texto não está vazio
-            article_text = article_text.strip() if article_text else ""
-            if not article_text or len(article_text) < 10:
+            if not unit_text or len(unit_text) < 10:
                 logger.warning(
                     "Artigo com texto vazio ignorado",
                     article_num=article_num,
-                    text_length=len(article_text) if article_text else 0
+                    text_length=len(unit_text)
                 )
                 continue
             
-            # Verificar se precisa dividir por inciso
-            tokens = self.count_tokens(article_text)
+            pieces = self._split_span(text, token_map, start, end, children, [], is_article=article_num is not None)
             
-            if tokens <= self.max_tokens:
+            if len(pieces) == 1:
                 # Artigo cabe em um chunk
-                metadata = Metadata(
-                    **base_metadata,
-                    artigo=article_num
-                )
-                chunks.append(DocumentChunk(
-                    text=article_text,
-                    metadata=metadata
-                ))
+                groups = [pieces]
             else:
-                # Dividir por inciso
-                incisos = self.split_article_by_inciso(article_text, article_num or "N/A")
+                groups = self._pack(text, pieces)
+                logger.debug(
+                    "Artigo dividido estruturalmente",
+                    article_num=article_num,
+                    pieces=len(pieces),
+                    chunks=len(groups)
+                )
+            
+            for group in groups:
+                chunk_start, chunk_end = _strip_bounds(text, group[0].start, group[-1].end)
+                if chunk_start == chunk_end:
+                    continue
+                chunk_text = text[chunk_start:chunk_end]
                 
-                for inciso_text, identifier in incisos:
-                    # Validar que o texto não está vazio
-                    inciso_text = inciso_text.strip() if inciso_text else ""
-                    if not inciso_text or len(inciso_text) < 10:
-                        logger.warning(
-                            "Inciso com texto vazio ignorado",
-                            identifier=identifier,
-                            text_length=len(inciso_text) if inciso_text else 0
-                        )
-                        continue
-                    
-                    inciso_tokens = self.count_tokens(inciso_text)
-                    
-                    if inciso_tokens <= self.max_tokens:
-                        metadata = Metadata(
-                            **base_metadata,
-                            artigo=identifier
-                        )
-                        chunks.append(DocumentChunk(
-                            text=inciso_text,
-                            metadata=metadata
-                        ))
-                    else:
-                        # Se ainda for muito grande, dividir por parágrafos ou truncar
-                        # Por segurança, truncar mantendo início
-                        truncated = inciso_text[:self.max_tokens * 4]  # Aproximação
-                        truncated = truncated.strip() if truncated else ""
-                        
-                        if not truncated or len(truncated) < 10:
-                            logger.warning(
-                                "Chunk truncado ficou vazio, ignorando",
-                                identifier=identifier
-                            )
-                            continue
-                        
-                        metadata = Metadata(
-                            **base_metadata,
-                            artigo=identifier
-                        )
-                        chunks.append(DocumentChunk(
-                            text=truncated,
-                            metadata=metadata
-                        ))
-                        logger.warning(
-                            "Chunk truncado por exceder limite",
-                            identifier=identifier,
-                            tokens=inciso_tokens
-                        )
+                if len(groups) == 1 and len(pieces) == 1:
+                    identifier = article_num
+                else:
+                    identifier = self._identifier(article_num, group)
+                
+                chunks.append(ChunkRecord(
+                    text=chunk_text,
+                    metadata=document_metadata.with_artigo(identifier),
+                    token_count=token_map.count(chunk_start, chunk_end)
+                ))
         
         # Validar chunks
         valid_chunks = []
@@ -209,22 +236,169 @@ class JuridicalChunker:
         logger.info("Chunking concluído", total_chunks=len(valid_chunks))
         return valid_chunks
     
+    def chunk_prechunked(self, articles: List[tuple[str, dict]]) -> List[ChunkRecord]:
+        """
+        Chunks de artigos que já vêm separados (JSON/JSONL do Bacen).
+        
+        Cada artigo que cabe em max_tokens vira um chunk direto, com o artigo
+        original dos metadados (sem varrer de novo artigos/incisos). Só
+        artigos maiores que o orçamento passam por chunk(), reaproveitando o
+        TokenOffsetMap da verificação de tamanho (cada artigo é codificado uma vez).
+        
+        Args:
+            articles: (texto, base_metadata com "artigo") de cada artigo
+        """
+        chunks = []
+        rechunked = 0
+        for text, base_metadata in articles:
+            text = text.strip() if text else ""
+            if len(text) < 10:
+                logger.warning("Artigo com texto vazio ignorado", artigo=base_metadata.get("artigo"), text_length=len(text))
+                continue
+            
+            token_map = self.token_map(text)
+            token_count = token_map.total_tokens
+            if token_count > self.max_tokens:
+                rechunked += 1
+                chunks.extend(self.chunk(text, base_metadata, token_map=token_map))
+                continue
+            
+            chunks.append(ChunkRecord(
+                text=text,
+                metadata=ChunkMetadata.validated(base_metadata),
+                token_count=token_count
+            ))
+        
+        logger.info("Chunks pré-separados carregados", total_chunks=len(chunks), artigos_rechunkados=rechunked)
+        return chunks
+    
+    def _split_span(
+        self,
+        text: str,
+        token_map: TokenOffsetMap,
+        start: int,
+        end: int,
+        children: List[StructuralNode],
+        labels: List[str],
+        is_article: bool = False
+    ) -> List["_Piece"]:
+        """
+        Divide [start, end) recursivamente até cada pedaço caber em max_tokens.
+        
+        Os pedaços retornados cobrem o span inteiro, em ordem e sem sobreposição.
+        """
+        tokens = token_map.count(start, end)
+        if tokens <= self.max_tokens:
+            return [_Piece(start, end, labels, tokens)]
+        
+        if not children:
+            return self._split_plain(text, token_map, start, end, labels, TEXT_SEPARATORS)
+        
+        pieces = []
+        body_end = children[0].start
+        if body_end > start:
+            # Caput (artigo) ou enunciado do próprio nó antes dos filhos
+            body_labels = labels + ["caput"] if is_article else labels
+            pieces.extend(self._split_span(text, token_map, start, body_end, [], body_labels))
+        
+        for child in children:
+            pieces.extend(self._split_span(
+                text,
+                token_map,
+                child.start,
+                child.end,
+                child.children,
+                labels + [_node_label(child)]
+            ))
+        
+        return pieces
+    
+    def _split_plain(
+        self,
+        text: str,
+        token_map: TokenOffsetMap,
+        start: int,
+        end: int,
+        labels: List[str],
+        separators: tuple
+    ) -> List["_Piece"]:
+        """Divide trecho sem estrutura por linhas, frases e palavras (sem perder texto)"""
+        tokens = token_map.count(start, end)
+        if tokens <= self.max_tokens or end - start <= 1:
+            return [_Piece(start, end, labels, tokens)]
+        
+        for i, separator in enumerate(separators):
+            cuts = []
+            position = text.find(separator, start, end)
+            while position != -1:
+                cut = position + len(separator)
+                if start < cut < end:
+                    cuts.append(cut)
+                position = text.find(separator, cut, end)
+            
+            if cuts:
+                pieces = []
+                bounds = [start] + cuts + [end]
+                for piece_start, piece_end in zip(bounds, bounds[1:]):
+                    pieces.extend(self._split_plain(text, token_map, piece_start, piece_end, labels, separators[i + 1:]))
+                return pieces
+        
+        # Sem separadores (ex: sequência enorme sem espaços): dividir ao meio
+        middle = (start + end) // 2
+        return (
+            self._split_plain(text, token_map, start, middle, labels, ()) +
+            self._split_plain(text, token_map, middle, end, labels, ())
+        )
+    
+    def _pack(self, text: str, pieces: List["_Piece"]) -> List[List["_Piece"]]:
+        """Reagrupa pedaços vizinhos em chunks próximos de max_tokens"""
+        groups = []
+        current: List[_Piece] = []
+        current_tokens = 0
+        
+        for piece in pieces:
+            # +1 por junção: contagens de spans podem diferir em ±1 na fronteira
+            if current and current_tokens + piece.tokens + 1 > self.max_tokens:
+                groups.append(current)
+                current, current_tokens = [], 0
+            current.append(piece)
+            current_tokens += piece.tokens + (1 if len(current) > 1 else 0)
+        
+        if current:
+            groups.append(current)
+        
+        # Fragmentos minúsculos (ex: só "Art. 61.") seriam descartados na validação;
+        # juntá-los ao vizinho, aceitando ultrapassar levemente o orçamento
+        merged: List[List[_Piece]] = []
+        pending: List[_Piece] = []
+        for group in groups:
+            group = pending + group
+            pending = []
+            if len(text[group[0].start:group[-1].end].strip()) < MIN_CHUNK_CHARS:
+                pending = group
+            else:
+                merged.append(group)
+        if pending:
+            if merged:
+                merged[-1] = merged[-1] + pending
+            else:
+                merged.append(pending)
+        
+        return merged
+    
+    def _identifier(self, article_num: Optional[str], group: List["_Piece"]) -> Optional[str]:
+        """Identificador do chunk: "Art. 5º, I" ou faixa "Art. 5º, caput a II" """
+        first = ", ".join(group[0].labels)
+        last = ", ".join(group[-1].labels)
+        label = first if first == last else f"{first} a {last}"
+        
+        if article_num is None:
+            return label or None
+        return f"Art. {article_num}, {label}" if label else f"Art. {article_num}"
+    
     def _has_normative_reference(self, text: str) -> bool:
         """Verifica se texto contém referência normativa"""
-        # Padrões mais flexíveis para documentos normativos
-        patterns = [
-            r'(?i)\b(artigo|art\.?)\s+\d+',  # Artigo
-            r'(?i)\b(inciso|inc\.?)\s+[IVX]+',  # Inciso
-            r'(?i)\b(parágrafo|par\.?)\s+\d+',  # Parágrafo
-            r'(?i)\b(resolução|circular|comunicado|instrução)',  # Tipos de norma
-            r'(?i)\b(norma|normativo|regulamenta)',  # Termos normativos
-            r'(?i)\b(bacen|banco\s+central)',  # Referência ao Bacen
-            r'(?i)\b(pix|open\s+finance)',  # Temas específicos
-            r'(?i)\b(obrigação|dever|proibição|permissão)',  # Termos jurídicos
-        ]
-        text_lower = text.lower()
         # Verificar se tem pelo menos 50 caracteres e algum padrão
         if len(text.strip()) < 50:
             return False
-        return any(re.search(pattern, text_lower) for pattern in patterns)
-
+        return NORMATIVE_REFERENCE_PATTERN.search(text) is not None
@@ -0,0 +1,213 @@
+"""
+Corpus consolidado de normativos: um arquivo JSONL por normativo.
+
+Cada linha é um chunk de artigo no mesmo formato dos arquivos JSON por artigo
+({"text": ..., "metadata": {...}}), sem indentação:
+
+    <dir>/Resolução_BCB_1_2020.jsonl        (ou .jsonl.zst, comprimido com zstd)
+    <dir>/corpus.index                       (índice JSON dos normativos do diretório)
+
+O índice acompanha os arquivos: ao arquivar (data/raw -> data/processed, pela
+ingestão ou pela sincronização), archive_file move a entrada junto.
+
+Um arquivo por normativo reduz a sobrecarga de sistema de arquivos (milhares
+de arquivos pequenos por tema) e permite que a ingestão processe todos os
+artigos de um normativo em lote.
+"""
+import io
+import json
+import re
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterator, List
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# zstd (opcional)
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+
+CORPUS_SUFFIX = ".jsonl"
+ZSTD_SUFFIX = ".jsonl.zst"
+CORPUS_INDEX_FILE = "corpus.index"
+
+# Escritas concorrentes (downloads em paralelo) no mesmo índice
+_index_lock = threading.Lock()
+
+
+def is_corpus_file(path: Path) -> bool:
+    """Arquivo no formato de corpus consolidado (.jsonl ou .jsonl.zst)"""
+    name = path.name.lower()
+    return name.endswith(CORPUS_SUFFIX) or name.endswith(ZSTD_SUFFIX)
+
+
+def is_retired(metadata: Dict) -> bool:
+    """Normativo revogado ou cancelado: fica fora do índice"""
+    return bool(metadata.get("revogado") or metadata.get("cancelado"))
+
+
+def list_corpus_files(directory: Path) -> List[Path]:
+    return sorted(path for path in Path(directory).iterdir() if path.is_file() and is_corpus_file(path))
+
+
+def corpus_filename(normativo_info: Dict, ano: int, compress: bool = False) -> str:
+    """Nome do arquivo do normativo: Tipo_Numero_Ano.jsonl[.zst]"""
+    tipo = normativo_info.get("Tipo", "Normativo").replace(" ", "_")
+    numero = normativo_info.get("Numero", "N/A")
+    filename = f"{tipo}_{numero}_{ano}" + (ZSTD_SUFFIX if compress else CORPUS_SUFFIX)
+    # Limpar caracteres inválidos do nome do arquivo
+    return re.sub(r'[<>:"/\\|?*]', '_', filename)
+
+
+def _encode_lines(chunks: List[Dict]) -> bytes:
+    return "".join(
+        json.dumps(chunk, ensure_ascii=False, separators=(",", ":")) + "\n"
+        for chunk in chunks
+    ).encode("utf-8")
+
+
+def write_corpus(path: Path, chunks: List[Dict]) -> int:
+    """
+    Grava os chunks de um normativo em um arquivo JSONL (substitui a versão anterior).
+    
+    Comprime com zstd se o nome terminar em .jsonl.zst.
+    
+    Returns:
+        int: Bytes gravados em disco
+    """
+    data = _encode_lines(chunks)
+    if path.name.lower().endswith(ZSTD_SUFFIX):
+        if not ZSTD_AVAILABLE:
+            raise RuntimeError("Compressão zstd indisponível - instale o pacote zstandard")
+        data = zstandard.ZstdCompressor(level=10).compress(data)
+    
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    tmp_path.replace(path)
+    return len(data)
+
+
+def iter_corpus(path: Path) -> Iterator[Dict]:
+    """Chunks ({"text", "metadata"}) de um arquivo de corpus, em streaming"""
+    with open(path, "rb") as raw:
+        if path.name.lower().endswith(ZSTD_SUFFIX):
+            if not ZSTD_AVAILABLE:
+                raise RuntimeError("Leitura de corpus .zst requer o pacote zstandard")
+            stream = zstandard.ZstdDecompressor().stream_reader(raw)
+        else:
+            stream = raw
+        for line in io.TextIOWrapper(stream, encoding="utf-8"):
+            if line.strip():
+                yield json.loads(line)
+
+
+def read_corpus(path: Path) -> List[Dict]:
+    return list(iter_corpus(path))
+
+
+def read_index(directory: Path) -> Dict[str, Dict]:
+    """Índice do diretório: nome do arquivo -> resumo do normativo"""
+    index_path = Path(directory) / CORPUS_INDEX_FILE
+    if not index_path.exists():
+        return {}
+    try:
+        with open(index_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        logger.warning("Índice do corpus ilegível, ignorando", path=str(index_path), error=str(e))
+        return {}
+
+
+def _write_index(directory: Path, index: Dict[str, Dict]):
+    directory.mkdir(parents=True, exist_ok=True)
+    tmp_path = directory / (CORPUS_INDEX_FILE + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(index, f, ensure_ascii=False, indent=2, sort_keys=True)
+    tmp_path.replace(directory / CORPUS_INDEX_FILE)
+
+
+def update_index(directory: Path, filename: str, entry: Dict):
+    """Registra (ou substitui) a entrada de um arquivo no índice do diretório"""
+    directory = Path(directory)
+    with _index_lock:
+        index = read_index(directory)
+        index[filename] = entry
+        _write_index(directory, index)
+
+
+def archive_file(path: Path, dest_dir: Path) -> Path:
+    """
+    Move o arquivo para dest_dir (substituindo um de mesmo nome) com a sua
+    entrada do corpus.index, que passa do índice de origem para o de destino.
+    
+    Returns:
+        Path: Novo caminho do arquivo
+    """
+    path, dest_dir = Path(path), Path(dest_dir)
+    dest_dir.mkdir(parents=True, exist_ok=True)
+    destination = dest_dir / path.name
+    with _index_lock:
+        path.replace(destination)
+        source_index = read_index(path.parent)
+        entry = source_index.pop(path.name, None)
+        if entry is not None:
+            # Destino primeiro: uma falha no meio deixa a entrada duplicada, não perdida
+            dest_index = read_index(dest_dir)
+            dest_index[path.name] = entry
+            _write_index(dest_dir, dest_index)
+            _write_index(path.parent, source_index)
+    return destination
+
+
+def save_normativo_corpus(
+    chunks: List[Dict],
+    output_dir: Path,
+    normativo_info: Dict,
+    ano: int,
+    compress: bool = False
+) -> Path:
+    """
+    Grava o normativo inteiro como um arquivo de corpus e atualiza o índice.
+    
+    Args:
+        chunks: Chunks de artigos ({"text": str, "metadata": dict})
+        output_dir: Diretório de saída
+        normativo_info: conteudo[0] da API (Tipo, Numero, VersaoNormativo, ...)
+        ano: Ano do normativo
+        compress: Gravar .jsonl.zst (requer zstandard)
+    
+    Returns:
+        Path: Arquivo gravado
+    """
+    filename = corpus_filename(normativo_info, ano, compress)
+    path = Path(output_dir) / filename
+    size = write_corpus(path, chunks)
+    
+    metadata = chunks[0]["metadata"] if chunks else {}
+    update_index(output_dir, filename, {
+        "tipo": normativo_info.get("Tipo", ""),
+        "numero": str(normativo_info.get("Numero", "")),
+        "ano": ano,
+        "versao": str(normativo_info.get("VersaoNormativo", "") or ""),
+        "titulo": normativo_info.get("Titulo", ""),
+        "tema": metadata.get("tema", ""),
+        "chunks": len(chunks),
+        "artigos": [chunk["metadata"].get("artigo") or "" for chunk in chunks],
+        "bytes": size,
+        "atualizado_em": datetime.now().isoformat(timespec="seconds"),
+    })
+    
+    logger.info(
+        "Corpus do normativo salvo",
+        file=str(path),
+        chunks=len(chunks),
+        bytes=size
+    )
+    return path
@@ -5,7 +5,9 @@ import pypdf
 from bs4 import BeautifulSoup
 import html2text
 from app.models.schemas import Metadata, DocumentChunk
+from app.ingestion.corpus import is_corpus_file, iter_corpus
 from app.utils.logger import get_logger
+from app.utils.tracing import span
 
 logger = get_logger(__name__)
 
@@ -45,7 +47,8 @@ class DocumentParser:
             for page_num, image in enumerate(images, 1):
                 try:
                     # Extrair texto da imagem usando Tesseract
-                    page_text = pytesseract.image_to_string(image, lang='por')
+                    with span("ingestion.ocr_page", file=file_path.name, page=page_num):
+                        page_text = pytesseract.image_to_string(image, lang='por')
                     
                     if page_text and len(page_text.strip().replace('\n', '').replace(' ', '')) > 10:
                         text += page_text + "\n"
@@ -234,18 +237,9 @@ class DocumentParser:
             
             text = data.get("text", "")
             metadata = data.get("metadata", {})
+            base_metadata = self._normativo_base_metadata(metadata, file_path)
             
-            # Construir base_metadata no formato esperado
-            base_metadata = {
-                "fonte": metadata.get("fonte", file_path.name),
-                "tema": metadata.get("tema", "pix"),
-                "norma": metadata.get("tipo", "Normativo"),
-                "numero_norma": metadata.get("numero", ""),
-                "ano": metadata.get("ano", 2023),
-                "url": metadata.get("url"),
-            }
-            
-            # Artigo já está no metadata, será usado pelo chunker
+            # Artigo original preservado em base_metadata (chunk_prechunked)
             
             logger.info(
                 "JSON normativo parseado",
@@ -261,6 +255,54 @@ class DocumentParser:
             logger.error("Erro ao parsear JSON normativo", file=str(file_path), error=str(e))
             raise
     
+    def parse_corpus(self, file_path: Path) -> List[tuple[str, Dict]]:
+        """
+        Parse arquivo de corpus consolidado (.jsonl / .jsonl.zst) do Bacen.
+        
+        Args:
+            file_path: Caminho do arquivo (um normativo, um artigo por linha)
+        
+        Returns:
+            list: (texto, metadados) de cada artigo, na ordem do arquivo
+        """
+        try:
+            articles = [
+                (chunk.get("text", ""), self._normativo_base_metadata(chunk.get("metadata", {}), file_path))
+                for chunk in iter_corpus(file_path)
+            ]
+            
+            logger.info(
+                "Corpus de normativo parseado",
+                file=str(file_path),
+                norma=articles[0][1]["norma"] if articles else None,
+                numero=articles[0][1]["numero_norma"] if articles else None,
+                artigos=len(articles)
+            )
+            
+            return articles
+            
+        except Exception as e:
+            logger.error("Erro ao parsear corpus de normativo", file=str(file_path), error=str(e))
+            raise
+    
+    @staticmethod
+    def _normativo_base_metadata(metadata: Dict, file_path: Path) -> Dict:
+        """base_metadata no formato esperado a partir dos metadados do Bacen"""
+        return {
+            "fonte": metadata.get("fonte", file_path.name),
+            "tema": metadata.get("tema", "pix"),
+            "norma": metadata.get("tipo", "Normativo"),
+            "numero_norma": metadata.get("numero", ""),
+            "ano": metadata.get("ano", 2023),
+            "url": metadata.get("url"),
+            "artigo": metadata.get("artigo") or None,
+        }
+    
+    @staticmethod
+    def is_prechunked(file_path: Path) -> bool:
+        """JSON/JSONL do Bacen: um artigo por registro, já separados por save_chunks"""
+        return file_path.suffix.lower() == ".json" or is_corpus_file(file_path)
+    
     def extract_metadata_from_filename(self, filename: str) -> Dict[str, Optional[str]]:
         """
         Extrai metadados básicos do nome do arquivo.
@@ -315,10 +357,13 @@ class DocumentParser:
         """
         Parse documento e retorna texto + metadados base.
         Suporta PDF, HTML e JSON (normativos normalizados do Bacen).
+        Corpus consolidado (.jsonl) tem vários artigos: use parse_corpus.
         """
         suffix = file_path.suffix.lower()
         
-        if suffix == ".pdf":
+        if is_corpus_file(file_path):
+            raise ValueError(f"Corpus consolidado deve ser lido com parse_corpus: {file_path.name}")
+        elif suffix == ".pdf":
             text = self.parse_pdf(file_path)
         elif suffix in [".html", ".htm"]:
             text = self.parse_html(file_path)
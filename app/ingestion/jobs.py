@@ -0,0 +1,434 @@
+"""
+Fila de jobs de reindexação em background, compartilhada entre processos.
+
+POST /reindex apenas enfileira um job e retorna seu ID. O registro fica em
+SQLite (REINDEX_JOBS_DB_PATH), então qualquer worker do gunicorn consulta e
+cancela qualquer job, e a deduplicação por domínio vale para todos. Cada
+processo da API roda um worker em thread dedicada (iniciado no startup) que
+reivindica os jobs da fila - inclusive os enfileirados por outro processo
+- e executa `ingest_documents` fora do event loop, um job por vez, para que
+/chat continue sendo atendido durante a reindexação.
+
+- progresso: o processo que executa o job grava o snapshot a cada
+  HEARTBEAT_SECONDS e, no mesmo ciclo, lê pedidos de cancelamento feitos em
+  outros processos
+- job "running" sem heartbeat há STALE_SECONDS (processo encerrado, deploy)
+  é marcado como failed; o journal permite retomar com resume=true
+- job "queued" há mais de STALE_SECONDS sem nenhum worker vivo (cada worker
+  se registra em reindex_workers a cada ciclo) também vira failed, em vez de
+  bloquear o domínio para sempre
+- ingest_documents segura o lock do domínio (app.ingestion.locks): nem dois
+  jobs, nem job e sincronização escrevem no mesmo domínio ao mesmo tempo
+"""
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+from app.config import get_settings
+from app.ingestion.progress import IngestionProgress, IngestionCancelled
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Quantidade de jobs finalizados mantidos para consulta
+MAX_FINISHED_JOBS = 50
+
+ACTIVE_STATUSES = ("queued", "running")
+
+# Gravação do progresso (e leitura de cancelamento) do job em execução
+HEARTBEAT_SECONDS = 2.0
+# Sem heartbeat há mais que isso, o processo do job morreu
+STALE_SECONDS = 60.0
+# Espera do worker por jobs enfileirados em outros processos
+POLL_SECONDS = 5.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS reindex_jobs (
+    job_id TEXT PRIMARY KEY,
+    domain TEXT NOT NULL,
+    force INTEGER NOT NULL,
+    resume INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    message TEXT NOT NULL,
+    error TEXT,
+    progress TEXT NOT NULL DEFAULT '{}',
+    cancel_requested INTEGER NOT NULL DEFAULT 0,
+    worker TEXT,
+    heartbeat_at REAL,
+    created_at TEXT NOT NULL,
+    started_at TEXT,
+    finished_at TEXT
+);
+CREATE TABLE IF NOT EXISTS reindex_workers (
+    worker TEXT PRIMARY KEY,
+    seen_at REAL NOT NULL
+);
+"""
+
+
+def _parse_datetime(value: Optional[str]) -> Optional[datetime]:
+    return datetime.fromisoformat(value) if value else None
+
+
+class ReindexJob:
+    """Job de reindexação de um domínio (linha do registro)"""
+    
+    def __init__(self, row: sqlite3.Row):
+        self.job_id = row["job_id"]
+        self.domain = row["domain"]
+        self.force = bool(row["force"])
+        self.resume = bool(row["resume"])
+        self.status = row["status"]
+        self.message = row["message"]
+        self.error: Optional[str] = row["error"]
+        self.progress: Dict = json.loads(row["progress"] or "{}")
+        self.worker: Optional[str] = row["worker"]
+        self.created_at = _parse_datetime(row["created_at"])
+        self.started_at = _parse_datetime(row["started_at"])
+        self.finished_at = _parse_datetime(row["finished_at"])
+    
+    @property
+    def is_active(self) -> bool:
+        return self.status in ACTIVE_STATUSES
+    
+    def snapshot(self) -> dict:
+        data = {
+            "job_id": self.job_id,
+            "domain": self.domain,
+            "force": self.force,
+            "resume": self.resume,
+            "status": self.status,
+            "message": self.message,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+        data.update(self.progress)
+        return data
+
+
+class ReindexJobStore:
+    """Registro dos jobs em SQLite (WAL), compartilhado pelos processos"""
+    
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+    
+    @contextmanager
+    def _connect(self, write: bool = False) -> Iterator[sqlite3.Connection]:
+        """Conexão curta; write=True abre transação com lock de escrita (BEGIN IMMEDIATE)"""
+        conn = sqlite3.connect(str(self.path), timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            if write:
+                conn.execute("BEGIN IMMEDIATE")
+            yield conn
+            if write:
+                conn.execute("COMMIT")
+        except BaseException:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+    
+    def _get(self, conn: sqlite3.Connection, job_id: str) -> Optional[ReindexJob]:
+        row = conn.execute("SELECT * FROM reindex_jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return ReindexJob(row) if row else None
+    
+    def submit(self, domain: str, force: bool, resume: bool) -> Tuple[ReindexJob, bool]:
+        """Job ativo do domínio, ou um novo na fila. Returns: (job, criado)"""
+        with self._connect(write=True) as conn:
+            row = conn.execute(
+                "SELECT * FROM reindex_jobs WHERE domain = ? AND status IN (?, ?) ORDER BY created_at LIMIT 1",
+                (domain, *ACTIVE_STATUSES)
+            ).fetchone()
+            if row:
+                return ReindexJob(row), False
+            
+            job_id = uuid.uuid4().hex
+            # heartbeat_at na fila = instante do enfileiramento
+            conn.execute(
+                "INSERT INTO reindex_jobs (job_id, domain, force, resume, status, message, heartbeat_at, created_at) "
+                "VALUES (?, ?, ?, ?, 'queued', 'Aguardando execução', ?, ?)",
+                (job_id, domain, int(force), int(resume), time.time(), datetime.now().isoformat())
+            )
+            self._prune(conn)
+            return self._get(conn, job_id), True
+    
+    def get(self, job_id: str) -> Optional[ReindexJob]:
+        with self._connect() as conn:
+            return self._get(conn, job_id)
+    
+    def list_jobs(self) -> List[ReindexJob]:
+        with self._connect() as conn:
+            rows = conn.execute("SELECT * FROM reindex_jobs ORDER BY created_at DESC").fetchall()
+        return [ReindexJob(row) for row in rows]
+    
+    def claim_next(self, worker: str) -> Optional[ReindexJob]:
+        """Reivindica o job mais antigo da fila (só um processo consegue)"""
+        with self._connect(write=True) as conn:
+            row = conn.execute(
+                "SELECT job_id FROM reindex_jobs WHERE status = 'queued' ORDER BY created_at LIMIT 1"
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE reindex_jobs SET status = 'running', message = 'Reindexação em andamento', "
+                "worker = ?, heartbeat_at = ?, started_at = ? WHERE job_id = ?",
+                (worker, time.time(), datetime.now().isoformat(), row["job_id"])
+            )
+            return self._get(conn, row["job_id"])
+    
+    def touch_worker(self, worker: str):
+        """Registra que o worker deste processo está vivo (lê a fila)"""
+        now = time.time()
+        with self._connect(write=True) as conn:
+            conn.execute(
+                "INSERT INTO reindex_workers (worker, seen_at) VALUES (?, ?) "
+                "ON CONFLICT(worker) DO UPDATE SET seen_at = excluded.seen_at",
+                (worker, now)
+            )
+            # Processos encerrados há muito tempo
+            conn.execute("DELETE FROM reindex_workers WHERE seen_at < ?", (now - 24 * 3600,))
+    
+    def heartbeat(self, job_id: str, progress: Dict) -> bool:
+        """Grava o progresso do job em execução. Returns: cancelamento solicitado"""
+        with self._connect(write=True) as conn:
+            conn.execute(
+                "UPDATE reindex_jobs SET progress = ?, heartbeat_at = ? WHERE job_id = ? AND status = 'running'",
+                (json.dumps(progress), time.time(), job_id)
+            )
+            row = conn.execute("SELECT cancel_requested FROM reindex_jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return bool(row and row["cancel_requested"])
+    
+    def finish(self, job_id: str, status: str, message: str, error: Optional[str], progress: Dict):
+        with self._connect(write=True) as conn:
+            conn.execute(
+                "UPDATE reindex_jobs SET status = ?, message = ?, error = ?, progress = ?, finished_at = ? "
+                "WHERE job_id = ?",
+                (status, message, error, json.dumps(progress), datetime.now().isoformat(), job_id)
+            )
+    
+    def request_cancel(self, job_id: str) -> Optional[ReindexJob]:
+        """Job na fila é cancelado na hora; em execução, o processo dele para no próximo heartbeat"""
+        with self._connect(write=True) as conn:
+            job = self._get(conn, job_id)
+            if job is None or not job.is_active:
+                return job
+            if job.status == "queued":
+                conn.execute(
+                    "UPDATE reindex_jobs SET status = 'cancelled', message = 'Cancelado antes de iniciar', "
+                    "cancel_requested = 1, finished_at = ? WHERE job_id = ?",
+                    (datetime.now().isoformat(), job_id)
+                )
+            else:
+                conn.execute(
+                    "UPDATE reindex_jobs SET message = 'Cancelamento solicitado', cancel_requested = 1 WHERE job_id = ?",
+                    (job_id,)
+                )
+            return self._get(conn, job_id)
+    
+    def expire_stale(self) -> int:
+        """
+        Marca como failed os jobs em execução cujo processo parou de dar sinal
+        e os jobs na fila que nenhum worker vivo vai reivindicar.
+        """
+        now, cutoff = datetime.now().isoformat(), time.time() - STALE_SECONDS
+        with self._connect(write=True) as conn:
+            running = conn.execute(
+                "UPDATE reindex_jobs SET status = 'failed', "
+                "message = 'Processo do job encerrado sem concluir (use resume=true para retomar)', "
+                "error = 'Sem heartbeat do worker ' || COALESCE(worker, '?'), finished_at = ? "
+                "WHERE status = 'running' AND COALESCE(heartbeat_at, 0) < ?",
+                (now, cutoff)
+            ).rowcount
+            queued = conn.execute(
+                "UPDATE reindex_jobs SET status = 'failed', "
+                "message = 'Nenhum worker ativo reivindicou o job (envie o POST /reindex novamente)', "
+                "error = 'Job na fila sem worker vivo', finished_at = ? "
+                "WHERE status = 'queued' AND COALESCE(heartbeat_at, 0) < ? "
+                "AND NOT EXISTS (SELECT 1 FROM reindex_workers WHERE seen_at >= ?)",
+                (now, cutoff, cutoff)
+            ).rowcount
+            return running + queued
+    
+    def _prune(self, conn: sqlite3.Connection):
+        conn.execute(
+            "DELETE FROM reindex_jobs WHERE job_id IN ("
+            "SELECT job_id FROM reindex_jobs WHERE status NOT IN (?, ?) ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+            (*ACTIVE_STATUSES, MAX_FINISHED_JOBS)
+        )
+
+
+class ReindexJobManager:
+    """Registro compartilhado (ReindexJobStore) + worker em background neste processo"""
+    
+    def __init__(self, store: Optional[ReindexJobStore] = None):
+        self.store = store or ReindexJobStore(get_settings().reindex_jobs_db_path)
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._worker: Optional[threading.Thread] = None
+        # Jobs em execução neste processo
+        self._running: Dict[str, IngestionProgress] = {}
+    
+    def start(self):
+        """Inicia o worker deste processo (startup da API, em cada worker do gunicorn)"""
+        with self._lock:
+            self._ensure_worker()
+    
+    def submit(self, domain: str, force: bool = True, resume: bool = False) -> ReindexJob:
+        """
+        Enfileira reindexação do domínio.
+        
+        Se já existir job ativo para o domínio (em qualquer processo), retorna o job existente.
+        """
+        self._expire_stale()
+        job, created = self.store.submit(domain, force, resume)
+        # Também no job existente: um job na fila de um processo que morreu é
+        # reivindicado pelo worker deste
+        self.start()
+        self._wakeup.set()
+        if not created:
+            logger.info("Reindexação já em andamento", domain=domain, job_id=job.job_id, worker=job.worker)
+            return job
+        
+        logger.info("Job de reindexação enfileirado", job_id=job.job_id, domain=domain, force=force, resume=resume)
+        return job
+    
+    def get(self, job_id: str) -> Optional[ReindexJob]:
+        self._expire_stale()
+        return self.store.get(job_id)
+    
+    def list_jobs(self) -> List[ReindexJob]:
+        self._expire_stale()
+        return self.store.list_jobs()
+    
+    def cancel(self, job_id: str) -> Optional[ReindexJob]:
+        """Solicita cancelamento; jobs em execução param no próximo embedding"""
+        job = self.store.request_cancel(job_id)
+        if job is None or job.status not in ("running", "cancelled"):
+            return job
+        
+        with self._lock:
+            progress = self._running.get(job_id)
+        if progress is not None:
+            # Job deste processo: não precisa esperar o heartbeat
+            progress.cancel()
+        logger.info("Cancelamento de reindexação solicitado", job_id=job_id)
+        return job
+    
+    def shutdown(self):
+        """Cancela os jobs em execução neste processo e encerra o worker"""
+        with self._lock:
+            running = list(self._running)
+        for job_id in running:
+            self.cancel(job_id)
+        self._stop.set()
+        self._wakeup.set()
+    
+    def _expire_stale(self):
+        expired = self.store.expire_stale()
+        if expired:
+            logger.warning("Jobs de reindexação sem heartbeat marcados como falhos", jobs=expired)
+    
+    def _ensure_worker(self):
+        if self._worker is None or not self._worker.is_alive():
+            self._stop.clear()
+            self._worker = threading.Thread(
+                target=self._worker_loop,
+                name="reindex-worker",
+                daemon=True
+            )
+            self._worker.start()
+    
+    def _worker_loop(self):
+        while not self._stop.is_set():
+            try:
+                self.store.touch_worker(self.worker_id)
+                job = self.store.claim_next(self.worker_id)
+            except sqlite3.Error as e:
+                logger.error("Erro ao ler a fila de reindexação", error=str(e))
+                job = None
+            if job is None:
+                self._wakeup.wait(POLL_SECONDS)
+                self._wakeup.clear()
+                continue
+            self._run(job)
+    
+    def _heartbeat_loop(self, job_id: str, progress: IngestionProgress, done: threading.Event):
+        while not done.wait(HEARTBEAT_SECONDS):
+            try:
+                self.store.touch_worker(self.worker_id)
+                if self.store.heartbeat(job_id, progress.snapshot()):
+                    progress.cancel()
+            except sqlite3.Error as e:
+                logger.warning("Erro ao gravar progresso da reindexação", job_id=job_id, error=str(e))
+    
+    def _run(self, job: ReindexJob):
+        progress = IngestionProgress()
+        with self._lock:
+            self._running[job.job_id] = progress
+        done = threading.Event()
+        heartbeat = threading.Thread(
+            target=self._heartbeat_loop,
+            args=(job.job_id, progress, done),
+            name="reindex-heartbeat",
+            daemon=True
+        )
+        heartbeat.start()
+        
+        logger.info("Iniciando reindexação em background", job_id=job.job_id, domain=job.domain, force=job.force)
+        
+        try:
+            # Import tardio: o pipeline de ingestão só é carregado quando há job
+            from app.ingestion.main import ingest_documents
+            
+            ingest_documents(job.domain, force_reindex=job.force, resume=job.resume, progress=progress)
+            status, message, error = "succeeded", f"Reindexação concluída para domínio {job.domain}", None
+        except IngestionCancelled:
+            status, message, error = "cancelled", "Reindexação cancelada (use resume=true para retomar)", None
+        except Exception as e:
+            logger.error("Erro na reindexação", job_id=job.job_id, domain=job.domain, error=str(e), exc_info=True)
+            status, message, error = "failed", "Erro na reindexação", str(e)
+        finally:
+            done.set()
+            heartbeat.join()
+            with self._lock:
+                self._running.pop(job.job_id, None)
+        
+        self.store.finish(job.job_id, status, message, error, progress.snapshot())
+        
+        logger.info(
+            "Reindexação em background finalizada",
+            job_id=job.job_id,
+            domain=job.domain,
+            status=status,
+            **progress.snapshot()
+        )
+
+
+_manager_instance: Optional[ReindexJobManager] = None
+_manager_lock = threading.Lock()
+
+
+def get_job_manager() -> ReindexJobManager:
+    global _manager_instance
+    if _manager_instance is None:
+        with _manager_lock:
+            if _manager_instance is None:
+                _manager_instance = ReindexJobManager()
+    return _manager_instance
@@ -0,0 +1,70 @@
+"""
+Lock por domínio entre processos: quem escreve no índice de um domínio.
+
+Ingestão (inclusive reindexação completa em coleção sombra) e sincronização
+regulatória alteram o mesmo índice e movem os mesmos arquivos de data/raw
+para data/processed. Com o lock, só um deles roda por domínio de cada vez,
+mesmo em processos diferentes (workers do gunicorn, serviço de
+sincronização, CLI):
+
+    data/locks/<domínio>.lock     (flock exclusivo, liberado pelo SO se o processo morrer)
+
+Sem fcntl (Windows), o lock vale só dentro do processo.
+"""
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, Optional
+from app.config import get_settings
+
+# flock (opcional: indisponível no Windows)
+try:
+    import fcntl
+    FCNTL_AVAILABLE = True
+except ImportError:
+    FCNTL_AVAILABLE = False
+
+_thread_locks: Dict[str, threading.Lock] = {}
+_thread_locks_guard = threading.Lock()
+
+
+class DomainLocked(RuntimeError):
+    """Outra ingestão ou sincronização está escrevendo no índice do domínio"""
+
+
+def lock_path(domain: str, lock_dir: Optional[Path] = None) -> Path:
+    return Path(lock_dir or get_settings().ingestion_lock_path) / f"{domain}.lock"
+
+
+@contextmanager
+def domain_lock(domain: str, blocking: bool = False, lock_dir: Optional[Path] = None) -> Iterator[None]:
+    """
+    Lock exclusivo do domínio durante o bloco.
+    
+    Raises:
+        DomainLocked: lock ocupado e blocking=False
+    """
+    if not FCNTL_AVAILABLE:
+        with _thread_locks_guard:
+            lock = _thread_locks.setdefault(domain, threading.Lock())
+        if not lock.acquire(blocking=blocking):
+            raise DomainLocked(f"Domínio {domain} ocupado por outra ingestão ou sincronização")
+        try:
+            yield
+        finally:
+            lock.release()
+        return
+    
+    path = lock_path(domain, lock_dir)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Um descritor por aquisição: flock conflita também entre threads do processo
+    with open(path, "a") as f:
+        try:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+        except BlockingIOError:
+            raise DomainLocked(f"Domínio {domain} ocupado por outra ingestão ou sincronização") from None
+        try:
+            yield
+        finally:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
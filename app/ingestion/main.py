@@ -1,11 +1,22 @@
 import sys
 from pathlib import Path
-from typing import List
+from typing import List, Optional
 from app.ingestion.document_parser import DocumentParser
 from app.ingestion.chunker import JuridicalChunker
+from app.ingestion.corpus import archive_file, is_corpus_file, is_retired, iter_corpus
+from app.ingestion.checkpoint import (
+    RebuildManifest,
+    discard_rebuild_manifests,
+    fingerprint_text,
+    has_pending_journals,
+    open_journal,
+)
+from app.ingestion.locks import DomainLocked, domain_lock
+from app.ingestion.progress import IngestionProgress, IngestionCancelled
 from app.rag.vector_store import VectorStore
 from app.config import get_settings
 from app.utils.logger import setup_logger, get_logger
+from app.utils.tracing import setup_tracing, shutdown_tracing, span, traced
 
 # Garantir que logger está configurado
 setup_logger()
@@ -13,14 +24,67 @@ setup_logger()
 logger = get_logger(__name__)
 
 
-def ingest_documents(domain: str, force_reindex: bool = False):
+class RebuildNotPublished(RuntimeError):
+    """Reindexação completa não publicada: a versão atual continua servindo e a coleção sombra fica para resume"""
+
+
+def list_ingestion_files(directory: Path) -> List[Path]:
+    """Arquivos ingeríveis do diretório (incluindo JSON de normativos normalizados)"""
+    return (
+        list(directory.glob("*.pdf")) + 
+        list(directory.glob("*.html")) + 
+        list(directory.glob("*.htm")) +
+        list(directory.glob("*.json")) +  # Arquivos JSON de normativos normalizados
+        list(directory.glob("*.jsonl")) +  # Corpus consolidado (um arquivo por normativo)
+        list(directory.glob("*.jsonl.zst"))
+    )
+
+
+def list_rebuild_files(raw_path: Path, processed_path: Path) -> List[Path]:
+    """
+    Corpus inteiro do domínio para reindexação completa: data/raw (novos) e
+    data/processed (já ingeridos ou sincronizados). Com o mesmo nome nos dois,
+    vale o de data/raw (versão mais nova).
+    """
+    files = {path.name: path for path in list_ingestion_files(processed_path)} if processed_path.exists() else {}
+    files.update({path.name: path for path in list_ingestion_files(raw_path)})
+    return [files[name] for name in sorted(files)]
+
+
+@traced("ingestion.run")
+def ingest_documents(
+    domain: str,
+    force_reindex: bool = False,
+    resume: bool = False,
+    progress: Optional[IngestionProgress] = None
+):
     """
     Pipeline completo de ingestão.
     
     Args:
         domain: pix ou open_finance
-        force_reindex: Se True, recria a coleção
+        force_reindex: Se True, reconstrói o índice inteiro (data/raw + data/processed)
+            em uma coleção sombra e só a publica se nenhum arquivo falhar
+        resume: Se True, retoma arquivos interrompidos a partir do journal de checkpoint
+        progress: Contadores de progresso/cancelamento (jobs em background)
+    
+    Raises:
+        DomainLocked: outra ingestão ou sincronização no domínio (qualquer
+            processo), ou ingestão incremental com reindexação não publicada
+        RebuildNotPublished: reindexação completa não publicada
     """
+    # Ingestão e sincronização nunca escrevem no mesmo domínio ao mesmo tempo:
+    # o lock vale antes de listar arquivos e de descartar/criar versões
+    with domain_lock(domain):
+        _ingest_documents(domain, force_reindex, resume, progress)
+
+
+def _ingest_documents(
+    domain: str,
+    force_reindex: bool,
+    resume: bool,
+    progress: Optional[IngestionProgress]
+):
     settings = get_settings()
     parser = DocumentParser()
     chunker = JuridicalChunker(max_tokens=600)
@@ -29,37 +93,74 @@ def ingest_documents(domain: str, force_reindex: bool = False):
     # Caminhos
     raw_path = Path(settings.data_raw_path) / domain
     processed_path = Path(settings.data_processed_path) / domain
+    journal_root = Path(settings.ingestion_journal_path)
     
-    if not raw_path.exists():
+    if not raw_path.exists() and not (force_reindex and processed_path.exists()):
         logger.error("Diretório não encontrado", path=str(raw_path))
         return
     
     raw_path.mkdir(parents=True, exist_ok=True)
     processed_path.mkdir(parents=True, exist_ok=True)
     
-    # Listar arquivos (incluindo JSON de normativos normalizados)
-    files = (
-        list(raw_path.glob("*.pdf")) + 
-        list(raw_path.glob("*.html")) + 
-        list(raw_path.glob("*.htm")) +
-        list(raw_path.glob("*.json"))  # Arquivos JSON de normativos normalizados
-    )
+    # A reindexação completa substitui o índice inteiro: precisa de todo o
+    # corpus, não só dos arquivos ainda não ingeridos
+    files = list_rebuild_files(raw_path, processed_path) if force_reindex else list_ingestion_files(raw_path)
     
     if not files:
         logger.warning("Nenhum arquivo encontrado", domain=domain, path=str(raw_path))
         return
     
-    logger.info("Iniciando ingestão", domain=domain, files_count=len(files))
+    logger.info("Iniciando ingestão", domain=domain, files_count=len(files), resume=resume)
     
-    # Criar/limpar coleção se necessário
-    if force_reindex:
-        vector_store.delete_collection(domain)
+    if progress is not None:
+        progress.start(len(files))
     
-    vector_store.ensure_collection(domain)
+    if not resume and has_pending_journals(journal_root, domain):
+        logger.warning(
+            "Existem ingestões interrompidas para o domínio - use --resume para reaproveitar os embeddings",
+            domain=domain
+        )
+    
+    # Reindexação completa é construída em uma coleção versionada (blue/green):
+    # o alias do domínio continua servindo a versão atual até a troca no final.
+    # Ao retomar, reaproveita a coleção sombra da execução interrompida.
+    manifest: Optional[RebuildManifest] = None
+    if force_reindex:
+        target_collection = vector_store.find_unpublished_version(domain) if resume else None
+        if target_collection:
+            logger.info("Retomando reindexação na coleção sombra", domain=domain, collection=target_collection)
+        else:
+            vector_store.discard_unpublished_versions(domain)
+            discard_rebuild_manifests(journal_root, domain)
+            target_collection = vector_store.create_versioned_collection(domain)
+            # Coleção nova: checkpoints antigos apontam para outra coleção
+            resume = False
+            logger.info("Reindexação em coleção sombra", domain=domain, collection=target_collection)
+        manifest = RebuildManifest(journal_root, domain, target_collection)
+    else:
+        pending = vector_store.find_unpublished_version(domain)
+        if pending:
+            # Arquivos gravados no alias atual ficariam fora da versão retomada
+            raise DomainLocked(
+                f"Reindexação completa de {domain} não publicada ({pending}) - "
+                f"conclua com force + resume antes de ingerir novos arquivos"
+            )
+        target_collection = domain
+        vector_store.ensure_collection(domain)
     
     total_chunks = 0
+    failed_files: List[str] = []
     
     for i, file_path in enumerate(files, 1):
+        if progress is not None:
+            progress.check_cancelled()
+        
+        if manifest is not None and file_path.name in manifest:
+            # Já está na coleção sombra (execução interrompida)
+            if progress is not None:
+                progress.file_done()
+            continue
+        
         try:
             logger.info(
                 "Processando arquivo",
@@ -68,8 +169,30 @@ def ingest_documents(domain: str, force_reindex: bool = False):
                 total_files=len(files)
             )
             
-            # Parse
-            text, base_metadata = parser.parse(file_path, tema=domain)
+            if is_corpus_file(file_path):
+                first = next(iter_corpus(file_path), None)
+                metadata = (first or {}).get("metadata", {})
+                if is_retired(metadata):
+                    # Revogado/cancelado: fora do índice, como na sincronização
+                    logger.info("Normativo revogado/cancelado ignorado", file=str(file_path))
+                    if not force_reindex:
+                        vector_store.delete_normativo(target_collection, metadata.get("tipo", ""), str(metadata.get("numero", "")))
+                    if file_path.parent != processed_path:
+                        archive_file(file_path, processed_path)
+                    if manifest is not None:
+                        manifest.add(file_path.name)
+                    if progress is not None:
+                        progress.file_done()
+                    continue
+            
+            # Parse (corpus consolidado: todos os artigos do normativo em lote)
+            with span("ingestion.parse", domain=domain, file=file_path.name):
+                if is_corpus_file(file_path):
+                    articles = parser.parse_corpus(file_path)
+                    text = "\n\n".join(article_text for article_text, _ in articles)
+                else:
+                    text, base_metadata = parser.parse(file_path, tema=domain)
+                    articles = [(text, base_metadata)]
             
             # Validar que o texto extraído não está vazio
             if not text or len(text.strip().replace('\n', '').replace(' ', '')) < 50:
@@ -80,12 +203,24 @@ def ingest_documents(domain: str, force_reindex: bool = False):
                     text_preview=text[:200] if text else ""
                 )
                 # Mover arquivo para processed mesmo assim para não reprocessar
-                processed_file = processed_path / file_path.name
-                file_path.rename(processed_file)
+                if file_path.parent != processed_path:
+                    archive_file(file_path, processed_path)
+                if manifest is not None:
+                    manifest.add(file_path.name)
+                if progress is not None:
+                    progress.file_done()
                 continue
             
-            # Chunking
-            chunks = chunker.chunk(text, base_metadata)
+            # Chunking (artigos do Bacen já vêm separados: só os grandes demais são divididos)
+            prechunked = parser.is_prechunked(file_path)
+            with span("ingestion.chunk", file=file_path.name, prechunked=prechunked):
+                if prechunked:
+                    chunks = chunker.chunk_prechunked(articles)
+                else:
+                    chunks = chunker.chunk(text, base_metadata)
+            
+            if progress is not None:
+                progress.add_chunks(len(chunks))
             
             logger.info(
                 "Chunks criados, iniciando indexação",
@@ -96,17 +231,35 @@ def ingest_documents(domain: str, force_reindex: bool = False):
             
             # Só indexar e mover se tiver chunks válidos
             if chunks:
+                journal = open_journal(
+                    journal_root,
+                    domain,
+                    file_path,
+                    fingerprint_text(text, chunker.max_tokens, prechunked),
+                    len(chunks),
+                    resume=resume
+                )
                 try:
                     # Indexar (pode demorar devido a rate limits)
-                    vector_store.index_chunks(domain, chunks)
+                    with span("ingestion.index", collection=target_collection, file=file_path.name, chunks=len(chunks)):
+                        vector_store.index_chunks(target_collection, chunks, journal=journal, progress=progress)
+                    journal.complete()
+                    if manifest is not None:
+                        manifest.add(file_path.name)
                     
                     total_chunks += len(chunks)
                     
                     # Mover para processados apenas se indexou com sucesso
                     processed_file = processed_path / file_path.name
-                    if not processed_file.exists():
-                        file_path.rename(processed_file)
+                    if file_path.parent != processed_path and not processed_file.exists():
+                        archive_file(file_path, processed_path)
+                except IngestionCancelled:
+                    journal.close()
+                    raise
                 except Exception as index_error:
+                    # Journal é mantido em disco para retomada com --resume
+                    journal.close()
+                    failed_files.append(file_path.name)
                     # Se erro de quota/rate limit, não mover arquivo para permitir retry
                     error_msg = str(index_error)
                     if "quota" in error_msg.lower() or "insufficient_quota" in error_msg.lower():
@@ -129,6 +282,9 @@ def ingest_documents(domain: str, force_reindex: bool = False):
                     file=str(file_path)
                 )
             
+            if progress is not None:
+                progress.file_done()
+            
             logger.info(
                 "Arquivo processado com sucesso",
                 file=str(file_path),
@@ -138,6 +294,9 @@ def ingest_documents(domain: str, force_reindex: bool = False):
                 remaining=len(files) - i
             )
             
+        except IngestionCancelled:
+            logger.warning("Ingestão cancelada", domain=domain, file=str(file_path), progress=f"{i}/{len(files)}")
+            raise
         except Exception as e:
             logger.error(
                 "Erro ao processar arquivo",
@@ -145,8 +304,12 @@ def ingest_documents(domain: str, force_reindex: bool = False):
                 error=str(e),
                 exc_info=True
             )
+            failed_files.append(file_path.name)
             continue
     
+    if force_reindex:
+        _publish_rebuild(vector_store, domain, target_collection, failed_files)
+    
     logger.info(
         "Ingestão concluída",
         domain=domain,
@@ -155,12 +318,53 @@ def ingest_documents(domain: str, force_reindex: bool = False):
     )
 
 
+def _publish_rebuild(vector_store: VectorStore, domain: str, collection_name: str, failed_files: List[str]):
+    """
+    Troca o alias para a nova versão e remove versões antigas.
+    
+    Não publica (RebuildNotPublished) se algum arquivo falhou ou se a nova
+    versão tem bem menos pontos que a publicada: a coleção sombra é mantida e
+    a reindexação pode ser retomada com resume.
+    """
+    settings = get_settings()
+    if failed_files:
+        raise RebuildNotPublished(
+            f"{len(failed_files)} arquivo(s) falharam na reindexação de {domain} "
+            f"({', '.join(failed_files[:5])}); alias mantido na versão atual - use resume para retomar"
+        )
+    
+    info = vector_store.get_collection_info(collection_name)
+    new_points = (info or {}).get("points_count") or 0
+    if not new_points:
+        # Nunca publicar uma versão vazia: a versão atual continua servindo
+        raise RebuildNotPublished(f"Reindexação de {domain} não gerou chunks - alias mantido na versão atual")
+    
+    current = vector_store.get_alias_target(domain) or domain
+    current_info = vector_store.get_collection_info(current) if current != collection_name else None
+    current_points = (current_info or {}).get("points_count") or 0
+    if current_points and new_points < current_points * settings.reindex_min_points_ratio:
+        raise RebuildNotPublished(
+            f"Nova versão de {domain} tem {new_points} pontos contra {current_points} da publicada "
+            f"(mínimo {settings.reindex_min_points_ratio:.0%}); alias mantido - revise o corpus ou "
+            f"ajuste REINDEX_MIN_POINTS_RATIO e use resume para publicar"
+        )
+    
+    vector_store.publish_version(domain, collection_name)
+    vector_store.gc_versions(domain)
+
+
 def main():
     """Entry point para ingestão"""
     setup_logger()
     settings = get_settings()
     
-    if len(sys.argv) > 1:
+    if "--profile" in sys.argv:
+        # Benchmark das etapas sobre um corpus de fixtures (sem OpenAI nem Qdrant reais)
+        from app.ingestion.profiling import main as profile_main
+        profile_main([arg for arg in sys.argv[1:] if arg != "--profile"])
+        return
+    
+    if len(sys.argv) > 1 and not sys.argv[1].startswith("--"):
         domain = sys.argv[1]
         if domain not in settings.domain_list:
             logger.error("Domínio inválido", domain=domain, valid=settings.domain_list)
@@ -170,12 +374,25 @@ def main():
         domain = None
     
     force_reindex = "--force" in sys.argv
+    resume = "--resume" in sys.argv
+    setup_tracing("rag-regulatorio-ingestion")
     
-    if domain:
-        ingest_documents(domain, force_reindex)
-    else:
-        for d in settings.domain_list:
-            ingest_documents(d, force_reindex)
+    not_published = False
+    try:
+        for d in ([domain] if domain else settings.domain_list):
+            try:
+                ingest_documents(d, force_reindex, resume=resume)
+            except RebuildNotPublished as e:
+                logger.error("Reindexação não publicada", domain=d, error=str(e))
+                not_published = True
+            except DomainLocked as e:
+                logger.error("Domínio ocupado, ingestão não executada", domain=d, error=str(e))
+                not_published = True
+    finally:
+        shutdown_tracing()
+    
+    if not_published:
+        sys.exit(1)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,422 @@
+"""
+Profiling da ingestão: throughput e memória de cada etapa.
+
+Roda as etapas de ingest_documents sobre um corpus de fixtures, uma etapa
+de cada vez sobre o corpus inteiro, para medir o que cada uma sustenta:
+
+- parse: PDF (pypdf), HTML, JSON por artigo e corpus JSONL do Bacen
+- ocr: PDFs escaneados (*_scan.pdf; requer pytesseract e pdf2image)
+- chunk: JuridicalChunker (chunk / chunk_prechunked)
+- embed: VectorStore._get_embeddings_with_retry (lotes de INDEX_BATCH_SIZE)
+  com embedder falso (latência por requisição: --embed-latency-ms)
+- upsert: lotes de INDEX_BATCH_SIZE em um Qdrant embutido (":memory:")
+
+Para cada etapa: tempo, itens/s, MB/s (parse) e pico de memória (RSS do
+processo; heap Python com --tracemalloc). Opcionalmente grava o perfil de
+CPU com cProfile (--cprofile) ou pyinstrument (--pyinstrument).
+
+Uso:
+    python -m app.ingestion.main --profile
+    python -m app.ingestion.main --profile --scale 5 --embed-latency-ms 150
+    python -m app.ingestion.main --profile --fixtures data/raw/pix --cprofile ingest.prof
+"""
+import argparse
+import cProfile
+import json
+import logging
+import pstats
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+import uuid
+import zlib
+from contextlib import contextmanager
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Dict, List, Optional
+from app.bench import FRASES
+from app.config import get_settings
+from app.ingestion.chunker import JuridicalChunker
+from app.ingestion.corpus import CORPUS_SUFFIX, is_corpus_file, write_corpus
+from app.ingestion.document_parser import DocumentParser, OCR_AVAILABLE
+from app.ingestion.main import list_ingestion_files
+from app.rag.vector_store import VectorStore
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Memória do processo (indisponível no Windows)
+try:
+    import resource
+    RESOURCE_AVAILABLE = True
+except ImportError:
+    RESOURCE_AVAILABLE = False
+
+# pyinstrument (opcional)
+try:
+    from pyinstrument import Profiler
+    PYINSTRUMENT_AVAILABLE = True
+except ImportError:
+    PYINSTRUMENT_AVAILABLE = False
+
+SCAN_SUFFIX = "_scan.pdf"
+EMBEDDING_DIM = 3072  # Dimensão da coleção (text-embedding-3-large)
+
+
+# Fixtures
+
+def _article_text(rng: random.Random, numero: int) -> str:
+    ordinal = f"{numero}º" if numero < 10 else f"{numero}."
+    return f"Art. {ordinal} " + ". ".join(
+        frase.capitalize() for frase in rng.sample(FRASES, rng.randint(2, 5))
+    ) + "."
+
+
+def _pdf_escape(line: str) -> bytes:
+    return line.encode("cp1252", errors="replace").replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)")
+
+
+def write_text_pdf(path: Path, pages: List[List[str]]):
+    """PDF mínimo com texto extraível (Helvetica, WinAnsiEncoding)"""
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # Pages (preenchido depois dos filhos)
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>",
+    ]
+    page_ids = []
+    for lines in pages:
+        stream = b"BT /F1 10 Tf 12 TL 50 800 Td\n" + b"".join(b"(" + _pdf_escape(line) + b") Tj T*\n" for line in lines) + b"ET"
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        content_id = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_id
+        )
+        page_ids.append(len(objects))
+    kids = b" ".join(b"%d 0 R" % page_id for page_id in page_ids)
+    objects[1] = b"<< /Type /Pages /Kids [" + kids + b"] /Count %d >>" % len(page_ids)
+    
+    data = b"%PDF-1.4\n"
+    offsets = []
+    for number, obj in enumerate(objects, 1):
+        offsets.append(len(data))
+        data += b"%d 0 obj\n" % number + obj + b"\nendobj\n"
+    xref = len(data)
+    data += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    data += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    data += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    path.write_bytes(data)
+
+
+def write_scanned_pdf(path: Path, pages: List[List[str]]):
+    """PDF só com imagens das páginas (força OCR)"""
+    from PIL import Image, ImageDraw
+    
+    images = []
+    for lines in pages:
+        image = Image.new("L", (1240, 1754), 255)
+        draw = ImageDraw.Draw(image)
+        for i, line in enumerate(lines):
+            draw.text((80, 80 + i * 28), line, fill=0)
+        images.append(image)
+    images[0].save(path, save_all=True, append_images=images[1:], resolution=150)
+
+
+def build_fixture_corpus(directory: Path, scale: int = 1, seed: int = 0) -> Dict[str, int]:
+    """
+    Gera o corpus de fixtures: PDFs com texto, PDFs escaneados (se houver OCR),
+    HTML, JSON por artigo e corpus JSONL do Bacen.
+    
+    Returns:
+        dict: arquivos gerados por formato
+    """
+    rng = random.Random(seed)
+    directory.mkdir(parents=True, exist_ok=True)
+    counts = {"pdf": 0, "scan": 0, "html": 0, "json": 0, "jsonl": 0}
+    
+    def artigos(count: int) -> List[str]:
+        return [_article_text(rng, n) for n in range(1, count + 1)]
+    
+    for i in range(4 * scale):
+        lines = [f"Resolução BCB nº {100 + i} de 2022"] + [
+            line for artigo in artigos(80) for line in (artigo[j:j + 95] for j in range(0, len(artigo), 95))
+        ]
+        write_text_pdf(directory / f"pix_resolucao_{100 + i}_2022.pdf", [lines[j:j + 60] for j in range(0, len(lines), 60)])
+        counts["pdf"] += 1
+    
+    if OCR_AVAILABLE:
+        for i in range(scale):
+            lines = [f"Circular nº {200 + i} de 2021"] + [artigo[:90] for artigo in artigos(60)]
+            write_scanned_pdf(directory / f"pix_circular_{200 + i}_2021{SCAN_SUFFIX}", [lines[j:j + 50] for j in range(0, len(lines), 50)])
+            counts["scan"] += 1
+    
+    for i in range(4 * scale):
+        body = "".join(f"<p>{artigo}</p>\n" for artigo in artigos(60))
+        html = (
+            f"<html><head><title>Resolução BCB nº {300 + i}</title><style>p {{ margin: 0 }}</style></head>"
+            f"<body><h1>Resolução BCB nº {300 + i} de 2023</h1>\n{body}</body></html>"
+        )
+        (directory / f"pix_resolucao_{300 + i}_2023.html").write_text(html, encoding="utf-8")
+        counts["html"] += 1
+    
+    def bacen_chunks(numero: int, count: int) -> List[Dict]:
+        return [
+            {
+                "text": text,
+                "metadata": {
+                    "tipo": "Resolução BCB",
+                    "numero": str(numero),
+                    "ano": 2024,
+                    "artigo": str(n),
+                    "tema": "pix",
+                    "fonte": "fixture",
+                    "url": None,
+                },
+            }
+            for n, text in enumerate(artigos(count), 1)
+        ]
+    
+    for i in range(2 * scale):
+        for chunk in bacen_chunks(400 + i, 60):
+            path = directory / f"Resolução_BCB_{400 + i}_2024_Art_{chunk['metadata']['artigo']}.json"
+            path.write_text(json.dumps(chunk, ensure_ascii=False, indent=2), encoding="utf-8")
+            counts["json"] += 1
+    
+    for i in range(4 * scale):
+        write_corpus(directory / f"Resolução_BCB_{500 + i}_2024{CORPUS_SUFFIX}", bacen_chunks(500 + i, 60))
+        counts["jsonl"] += 1
+    
+    return counts
+
+
+# Embedder falso
+
+class StubEmbeddings:
+    """Interface de client.embeddings da OpenAI com vetores fixos e latência simulada"""
+    
+    def __init__(self, latency_ms: float = 0.0, dim: int = EMBEDDING_DIM, pool: int = 16):
+        self.latency_ms = latency_ms
+        rng = random.Random(0)
+        self._vectors = []
+        for _ in range(pool):
+            vector = [rng.gauss(0, 1) for _ in range(dim)]
+            norm = sum(value * value for value in vector) ** 0.5
+            self._vectors.append([value / norm for value in vector])
+    
+    def create(self, model: str, input):
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+        texts = input if isinstance(input, list) else [input]
+        data = [
+            SimpleNamespace(index=index, embedding=self._vectors[zlib.crc32(text.encode("utf-8")) % len(self._vectors)])
+            for index, text in enumerate(texts)
+        ]
+        tokens = sum(len(text) for text in texts) // 4
+        return SimpleNamespace(
+            data=data,
+            usage=SimpleNamespace(prompt_tokens=tokens, total_tokens=tokens)
+        )
+
+
+# Medição
+
+def _max_rss_mb() -> Optional[float]:
+    if not RESOURCE_AVAILABLE:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux: KB; macOS: bytes
+    return round(rss / (1_048_576 if sys.platform == "darwin" else 1024), 1)
+
+
+class StageProfiler:
+    """Tempo, itens/s e memória de cada etapa"""
+    
+    def __init__(self, trace_memory: bool = False):
+        self.trace_memory = trace_memory
+        self.stages: Dict[str, Dict] = {}
+    
+    @contextmanager
+    def stage(self, name: str):
+        """Acumula na etapa `name`; o bloco informa os itens via stats["items"]"""
+        stats = self.stages.setdefault(name, {"seconds": 0.0, "items": 0, "bytes": 0})
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+        start = time.perf_counter()
+        try:
+            yield stats
+        finally:
+            stats["seconds"] += time.perf_counter() - start
+            stats["max_rss_mb"] = _max_rss_mb()
+            if self.trace_memory:
+                peak_mb = tracemalloc.get_traced_memory()[1] / 1_048_576
+                stats["heap_peak_mb"] = round(max(stats.get("heap_peak_mb", 0.0), peak_mb), 1)
+    
+    def report(self) -> Dict[str, Dict]:
+        report = {}
+        for name, stats in self.stages.items():
+            seconds = stats["seconds"]
+            entry = {
+                "seconds": round(seconds, 4),
+                "items": stats["items"],
+                "items_per_s": round(stats["items"] / seconds, 2) if seconds else None,
+                "max_rss_mb": stats.get("max_rss_mb"),
+            }
+            if stats["bytes"]:
+                entry["mb_per_s"] = round(stats["bytes"] / 1_048_576 / seconds, 2) if seconds else None
+            if "heap_peak_mb" in stats:
+                entry["heap_peak_mb"] = stats["heap_peak_mb"]
+            report[name] = entry
+        return report
+
+
+def profile_ingestion(
+    files: List[Path],
+    domain: str = "pix",
+    embed_latency_ms: float = 0.0,
+    trace_memory: bool = False
+) -> Dict:
+    """
+    Executa parse → chunk → embed → upsert sobre os arquivos, etapa por etapa.
+    
+    Nada é movido nem gravado fora do Qdrant embutido.
+    """
+    from qdrant_client import QdrantClient
+    from qdrant_client.models import PointStruct
+    
+    settings = get_settings()
+    parser = DocumentParser()
+    chunker = JuridicalChunker(max_tokens=600)
+    vector_store = VectorStore(
+        client=QdrantClient(":memory:"),
+        openai_client=SimpleNamespace(embeddings=StubEmbeddings(embed_latency_ms))
+    )
+    profiler = StageProfiler(trace_memory)
+    
+    # 1. Parse / OCR
+    documents = []
+    for file_path in files:
+        stage_name = "ocr" if file_path.name.endswith(SCAN_SUFFIX) else "parse"
+        with profiler.stage(stage_name) as stats:
+            if is_corpus_file(file_path):
+                articles = parser.parse_corpus(file_path)
+            else:
+                text, base_metadata = parser.parse(file_path, tema=domain)
+                articles = [(text, base_metadata)]
+            stats["items"] += 1
+            stats["bytes"] += file_path.stat().st_size
+        documents.append((file_path, articles))
+    
+    # 2. Chunking
+    chunks = []
+    with profiler.stage("chunk") as stats:
+        for file_path, articles in documents:
+            if parser.is_prechunked(file_path):
+                chunks.extend(chunker.chunk_prechunked(articles))
+            else:
+                text, base_metadata = articles[0]
+                if text and text.strip():
+                    chunks.extend(chunker.chunk(text, base_metadata))
+        stats["items"] = len(chunks)
+    
+    # 3. Embeddings em lotes de INDEX_BATCH_SIZE (mesmo caminho da indexação: gateway + métricas)
+    batch_size = max(1, settings.index_batch_size)
+    vectors = []
+    with profiler.stage("embed") as stats:
+        for start in range(0, len(chunks), batch_size):
+            texts = [chunk.text for chunk in chunks[start:start + batch_size]]
+            vectors.extend(vector_store._get_embeddings_with_retry(texts))
+        stats["items"] = len(vectors)
+    
+    # 4. Upsert em lotes de INDEX_BATCH_SIZE
+    vector_store.ensure_collection(domain)
+    with profiler.stage("upsert") as stats:
+        for start in range(0, len(chunks), batch_size):
+            batch = []
+            for i in range(start, min(start + batch_size, len(chunks))):
+                payload = chunks[i].payload()
+                payload["text"] = chunks[i].text
+                batch.append((i, PointStruct(id=str(uuid.uuid4()), vector=vectors[i], payload=payload)))
+            stats["items"] += vector_store._upsert_batch(domain, batch)
+    
+    return {
+        "files": len(files),
+        "chunks": len(chunks),
+        "embed_latency_ms": embed_latency_ms,
+        "stages": profiler.report(),
+    }
+
+
+def print_report(result: Dict):
+    print(f"\n{result['files']} arquivos, {result['chunks']} chunks (embedder falso: {result['embed_latency_ms']:.0f} ms)\n")
+    print(f"  {'etapa':<8} {'tempo (s)':>10} {'itens':>8} {'itens/s':>10} {'MB/s':>8} {'RSS máx (MB)':>13} {'heap pico (MB)':>15}")
+    for name, stats in result["stages"].items():
+        print(
+            f"  {name:<8} {stats['seconds']:>10.3f} {stats['items']:>8} {stats['items_per_s'] or 0:>10.1f} "
+            f"{stats.get('mb_per_s') or 0:>8.2f} {stats['max_rss_mb'] or 0:>13.1f} {stats.get('heap_peak_mb', 0):>15.1f}"
+        )
+    print()
+
+
+def main(argv: Optional[List[str]] = None):
+    """python -m app.ingestion.main --profile [opções]"""
+    parser = argparse.ArgumentParser(prog="python -m app.ingestion.main --profile", description="Profiling das etapas da ingestão")
+    parser.add_argument("--fixtures", help="Diretório do corpus (usado se tiver arquivos; senão as fixtures são geradas nele)")
+    parser.add_argument("--scale", type=int, default=1, help="Multiplicador do corpus de fixtures")
+    parser.add_argument("--domain", default="pix")
+    parser.add_argument("--embed-latency-ms", type=float, default=0.0, help="Latência simulada por embedding")
+    parser.add_argument("--tracemalloc", action="store_true", help="Pico do heap Python por etapa (mais lento)")
+    parser.add_argument("--cprofile", help="Grava o perfil cProfile neste arquivo (.prof)")
+    parser.add_argument("--pyinstrument", help="Grava o perfil do pyinstrument neste arquivo (.html)")
+    parser.add_argument("--output", help="Grava o resultado em JSON")
+    parser.add_argument("--verbose", action="store_true", help="Manter logs INFO por arquivo (entram na medição)")
+    args = parser.parse_args(argv)
+    
+    if not args.verbose:
+        logging.getLogger().setLevel(logging.WARNING)
+    
+    if args.pyinstrument and not PYINSTRUMENT_AVAILABLE:
+        parser.error("pyinstrument não instalado (pip install pyinstrument)")
+    
+    with tempfile.TemporaryDirectory(prefix="ingestion-profile-") as tmp:
+        directory = Path(args.fixtures) if args.fixtures else Path(tmp)
+        files = list_ingestion_files(directory) if directory.exists() else []
+        if not files:
+            counts = build_fixture_corpus(directory, scale=args.scale)
+            logger.info("Corpus de fixtures gerado", directory=str(directory), **counts)
+            if not OCR_AVAILABLE:
+                print("OCR indisponível (pytesseract/pdf2image): etapa ocr não medida")
+            files = list_ingestion_files(directory)
+        
+        if args.tracemalloc:
+            tracemalloc.start()
+        cpu_profiler = cProfile.Profile() if args.cprofile else None
+        instrument = Profiler() if args.pyinstrument else None
+        if cpu_profiler:
+            cpu_profiler.enable()
+        if instrument:
+            instrument.start()
+        try:
+            result = profile_ingestion(files, args.domain, args.embed_latency_ms, args.tracemalloc)
+        finally:
+            if cpu_profiler:
+                cpu_profiler.disable()
+            if instrument:
+                instrument.stop()
+            if args.tracemalloc:
+                tracemalloc.stop()
+    
+    print_report(result)
+    
+    if cpu_profiler:
+        cpu_profiler.dump_stats(args.cprofile)
+        print(f"Perfil cProfile: {args.cprofile} (20 funções com maior tempo acumulado)\n")
+        pstats.Stats(cpu_profiler).sort_stats("cumulative").print_stats(20)
+    if instrument:
+        Path(args.pyinstrument).write_text(instrument.output_html(), encoding="utf-8")
+        print(f"Perfil pyinstrument: {args.pyinstrument}")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        print(f"Resultado: {args.output}")
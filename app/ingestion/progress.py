@@ -0,0 +1,101 @@
+"""
+Acompanhamento de progresso e cancelamento da ingestão.
+
+Usado pelos jobs de reindexação em background para expor arquivos, chunks,
+embeddings/s e ETA, e para interromper a ingestão de forma cooperativa.
+"""
+import threading
+import time
+from typing import Optional
+
+
+class IngestionCancelled(Exception):
+    """Ingestão interrompida por pedido de cancelamento"""
+
+
+class IngestionProgress:
+    """Contadores thread-safe de uma execução de ingestão"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._cancel_event = threading.Event()
+        self.files_total = 0
+        self.files_processed = 0
+        self.files_chunked = 0
+        self.chunks_total = 0
+        self.embeddings_done = 0
+        # Chunks reaproveitados do journal (resume): prontos, mas fora da taxa
+        self.embeddings_resumed = 0
+        self.started_at: Optional[float] = None
+        self._embedding_started_at: Optional[float] = None
+    
+    def start(self, files_total: int):
+        with self._lock:
+            self.files_total = files_total
+            self.started_at = time.time()
+    
+    def add_chunks(self, count: int):
+        with self._lock:
+            self.files_chunked += 1
+            self.chunks_total += count
+    
+    def add_embeddings(self, count: int = 1):
+        """Registra embeddings gerados e verifica cancelamento"""
+        with self._lock:
+            if self._embedding_started_at is None:
+                self._embedding_started_at = time.time()
+            self.embeddings_done += count
+        self.check_cancelled()
+    
+    def add_resumed(self, count: int):
+        """Registra chunks cujo embedding veio do journal de checkpoint"""
+        with self._lock:
+            self.embeddings_resumed += count
+    
+    def file_done(self):
+        with self._lock:
+            self.files_processed += 1
+    
+    def cancel(self):
+        self._cancel_event.set()
+    
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel_event.is_set()
+    
+    def check_cancelled(self):
+        """Levanta IngestionCancelled se o cancelamento foi solicitado"""
+        if self._cancel_event.is_set():
+            raise IngestionCancelled("Ingestão cancelada")
+    
+    def snapshot(self) -> dict:
+        """
+        Estado atual com taxa de embeddings e ETA estimado.
+        
+        A taxa considera só embeddings gerados nesta execução; os reaproveitados
+        do journal contam como prontos para o ETA, mas não aceleram a taxa.
+        """
+        with self._lock:
+            now = time.time()
+            rate = 0.0
+            if self._embedding_started_at is not None and self.embeddings_done:
+                elapsed = max(now - self._embedding_started_at, 1e-6)
+                rate = self.embeddings_done / elapsed
+            
+            eta = None
+            if rate > 0 and self.files_chunked:
+                # Estimar total de chunks pela média dos arquivos já chunkados
+                avg_chunks = self.chunks_total / self.files_chunked
+                remaining_files = max(self.files_total - self.files_chunked, 0)
+                estimated_total = self.chunks_total + avg_chunks * remaining_files
+                eta = max(estimated_total - self.embeddings_done - self.embeddings_resumed, 0) / rate
+            
+            return {
+                "files_total": self.files_total,
+                "files_processed": self.files_processed,
+                "chunks_total": self.chunks_total,
+                "embeddings_done": self.embeddings_done,
+                "embeddings_resumed": self.embeddings_resumed,
+                "embeddings_per_second": round(rate, 3),
+                "eta_seconds": round(eta, 1) if eta is not None else None,
+            }
@@ -0,0 +1,147 @@
+"""
+Tokenizador estrutural de textos normativos.
+
+Encontra, em uma única varredura com um regex pré-compilado, as fronteiras de
+artigos, parágrafos (§ / Parágrafo único), incisos e alíneas, e monta uma
+árvore de spans (offsets no texto original, sem copiar strings).
+
+Regras de fronteira:
+- Artigo: "Art. 1º", "Art 12", "ART. 3°" em qualquer posição (mesma regra
+  histórica do JuridicalChunker e de bacen_normativos.chunk_by_article)
+- Parágrafo: "§ 1º" ou "Parágrafo único" no início de linha
+- Inciso: numeral romano maiúsculo seguido de "-" ou "–" no início de linha
+- Alínea: letra minúscula seguida de ")" no início de linha
+"""
+import re
+from typing import Iterator, List, Optional
+
+# Níveis hierárquicos (quanto maior, mais interno)
+LEVELS = {
+    "documento": 0,
+    "artigo": 1,
+    "paragrafo": 2,
+    "inciso": 3,
+    "alinea": 4,
+}
+
+# Uma única alternância; fronteiras de linha são casadas pelo "\n" (o texto é
+# varrido com um "\n" prefixado) e o lookahead inicial descarta rapidamente
+# posições que não podem iniciar nenhum marcador.
+STRUCTURE_PATTERN = re.compile(
+    r"(?=[Aa\n])(?:"
+    r"(?P<artigo>Art\.?\s*(?P<artigo_num>\d+[º°]?))"
+    r"|\n[ \t]*(?:"
+    r"(?P<paragrafo>§\s*(?P<paragrafo_num>\d+[º°]?)|Parágrafo\s+único)"
+    r"|(?-i:(?P<inciso>(?P<inciso_num>[IVXLC]+)[º°]?))[ \t]*[–-]"
+    r"|(?-i:(?P<alinea>(?P<alinea_num>[a-z])\)))"
+    r"))",
+    re.IGNORECASE
+)
+
+LABEL_GROUPS = {
+    "artigo": "artigo_num",
+    "paragrafo": "paragrafo_num",
+    "inciso": "inciso_num",
+    "alinea": "alinea_num",
+}
+
+# Limpeza do rótulo do artigo ("Art. 5º" -> "5º")
+ARTICLE_PREFIX_PATTERN = re.compile(r"(?i)art\.?\s*")
+ORDINAL_PATTERN = re.compile(r"[º°]")
+
+
+class StructuralNode:
+    """Span de um elemento estrutural: [start, end) no texto original"""
+    
+    __slots__ = ("kind", "level", "label", "start", "end", "children", "parent")
+    
+    def __init__(self, kind: str, label: Optional[str], start: int, end: int, parent: Optional["StructuralNode"] = None):
+        self.kind = kind
+        self.level = LEVELS[kind]
+        self.label = label
+        self.start = start
+        self.end = end
+        self.children: List["StructuralNode"] = []
+        self.parent = parent
+    
+    @property
+    def body_end(self) -> int:
+        """Fim do trecho próprio do nó (antes do primeiro filho)"""
+        return self.children[0].start if self.children else self.end
+    
+    def text(self, source: str) -> str:
+        return source[self.start:self.end]
+    
+    def walk(self) -> Iterator["StructuralNode"]:
+        """Percorre a subárvore em pré-ordem"""
+        yield self
+        for child in self.children:
+            yield from child.walk()
+    
+    def __repr__(self) -> str:
+        return f"StructuralNode({self.kind}, {self.label!r}, {self.start}, {self.end}, children={len(self.children)})"
+
+
+class DocumentStructure:
+    """Árvore estrutural de um texto normativo"""
+    
+    __slots__ = ("text", "root")
+    
+    def __init__(self, text: str, root: StructuralNode):
+        self.text = text
+        self.root = root
+    
+    @property
+    def articles(self) -> List[StructuralNode]:
+        return [node for node in self.root.children if node.kind == "artigo"]
+    
+    @property
+    def preamble_end(self) -> int:
+        """Fim do trecho antes do primeiro artigo"""
+        articles = self.articles
+        return articles[0].start if articles else len(self.text)
+    
+    def iter_kind(self, kind: str) -> Iterator[StructuralNode]:
+        return (node for node in self.root.walk() if node.kind == kind)
+
+
+def parse_structure(text: str) -> DocumentStructure:
+    """
+    Monta a árvore estrutural do texto em uma única varredura.
+    
+    Cada nó termina onde começa o próximo nó de nível igual ou superior
+    (ou no fim do texto).
+    """
+    length = len(text)
+    root = StructuralNode("documento", None, 0, length)
+    stack = [root]
+    
+    # "\n" prefixado permite casar marcadores na primeira linha; offsets -1
+    for match in STRUCTURE_PATTERN.finditer("\n" + text):
+        # lastgroup é o grupo externo (artigo, paragrafo, inciso ou alinea)
+        kind = match.lastgroup
+        level = LEVELS[kind]
+        start = match.start(kind) - 1
+        
+        # Fechar nós de nível igual ou mais interno
+        while stack[-1].level >= level:
+            stack.pop().end = start
+        
+        label = match.group(LABEL_GROUPS[kind])
+        if label is None:
+            label = "único"  # Parágrafo único
+        
+        parent = stack[-1]
+        node = StructuralNode(kind, label, start, length, parent)
+        parent.children.append(node)
+        stack.append(node)
+    
+    return DocumentStructure(text, root)
+
+
+def article_number(label: str, strip_ordinal: bool = False) -> str:
+    """Normaliza rótulo de artigo ("Art. 5º" ou "5º" -> "5º" / "5")"""
+    number = ARTICLE_PREFIX_PATTERN.sub("", label).strip()
+    if strip_ordinal:
+        number = ORDINAL_PATTERN.sub("", number).strip()
+    return number
@@ -0,0 +1,224 @@
+"""
+Serviço de sincronização incremental do corpus regulatório.
+
+Em intervalos regulares (SYNC_INTERVAL_MINUTES):
+
+1. Sincroniza o feed de normativos do Bacen (app.ingestion.bacen_feed): só
+   normativos novos ou alterados desde o ciclo anterior são baixados
+   (<updated> do feed + VersaoNormativo/ETag da API)
+2. Para cada normativo alterado, compara os artigos novos com os pontos já
+   indexados no Qdrant (artigo + hash do texto): só artigos novos ou com
+   texto diferente geram embedding; artigos que sumiram são removidos
+3. Normativos revogados ou cancelados são retirados do índice
+
+Cada domínio é sincronizado com o lock do domínio (app.ingestion.locks): com
+uma ingestão em andamento, ou uma reindexação completa interrompida ainda
+não publicada (coleção sombra esperando resume), o domínio fica para o
+próximo ciclo - deltas gravados no alias atual se perderiam na troca.
+
+Substitui o ciclo manual "baixar scripts + /reindex force=True", que recria
+a coleção inteira.
+
+Uso:
+    python -m app.ingestion.sync                 # serviço contínuo
+    python -m app.ingestion.sync --once          # um ciclo e sai
+    python -m app.ingestion.sync --interval 60   # intervalo em minutos
+"""
+import hashlib
+import signal
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+from app.config import get_settings
+from app.ingestion.bacen_feed import default_years, sync_feed
+from app.ingestion.chunker import JuridicalChunker
+from app.ingestion.corpus import archive_file, is_retired, iter_corpus, list_corpus_files
+from app.ingestion.document_parser import DocumentParser
+from app.ingestion.locks import DomainLocked, domain_lock
+from app.rag.vector_store import VectorStore
+from app.utils.logger import setup_logger, get_logger
+from app.utils.tracing import setup_tracing, shutdown_tracing, span, traced
+
+logger = get_logger(__name__)
+
+
+def _content_key(artigo: Optional[str], text: str) -> tuple:
+    """Identidade de um chunk para o diff: artigo + hash do texto"""
+    return artigo or "", hashlib.sha1(text.strip().encode("utf-8")).hexdigest()
+
+
+class RegulatorySync:
+    """Aplica no índice vetorial o delta de normativos vindo do feed"""
+    
+    def __init__(self, vector_store: Optional[VectorStore] = None, chunker: Optional[JuridicalChunker] = None):
+        self.settings = get_settings()
+        self.vector_store = vector_store or VectorStore()
+        self.chunker = chunker or JuridicalChunker(max_tokens=600)
+        self.parser = DocumentParser()
+        self._collections_ready = set()
+    
+    def _collection(self, domain: str) -> str:
+        # O alias do domínio aponta para a versão publicada (blue/green)
+        if domain not in self._collections_ready:
+            self.vector_store.ensure_collection(domain)
+            self._collections_ready.add(domain)
+        return domain
+    
+    def apply_normativo(self, corpus_file: Path, domain: str) -> Dict:
+        """
+        Atualiza no índice um normativo a partir do seu arquivo de corpus.
+        
+        Returns:
+            dict: artigos indexados, removidos e mantidos
+        """
+        with span("sync.apply_normativo", domain=domain, file=corpus_file.name):
+            return self._apply_normativo(corpus_file, domain)
+    
+    def _apply_normativo(self, corpus_file: Path, domain: str) -> Dict:
+        collection = self._collection(domain)
+        first = next(iter_corpus(corpus_file), None)
+        if first is None:
+            return {"indexados": 0, "removidos": 0, "mantidos": 0, "retirado": False}
+        
+        metadata = first.get("metadata", {})
+        norma, numero = metadata.get("tipo", ""), str(metadata.get("numero", ""))
+        
+        if is_retired(metadata):
+            self.vector_store.delete_normativo(collection, norma, numero)
+            logger.info("Normativo revogado/cancelado retirado do índice", norma=norma, numero=numero, domain=domain)
+            return {"indexados": 0, "removidos": None, "mantidos": 0, "retirado": True}
+        
+        chunks = self.chunker.chunk_prechunked(self.parser.parse_corpus(corpus_file))
+        existing = self.vector_store.list_normativo_points(collection, norma, numero)
+        
+        existing_keys = {}
+        for point_id, payload in existing:
+            existing_keys.setdefault(_content_key(payload.get("artigo"), payload.get("text", "")), []).append(point_id)
+        
+        new_chunks = []
+        kept_keys = set()
+        for chunk in chunks:
+            key = _content_key(chunk.metadata.artigo, chunk.text)
+            if key in existing_keys:
+                kept_keys.add(key)
+            else:
+                new_chunks.append(chunk)
+        
+        # Remover primeiro as versões antigas, depois indexar só o que mudou
+        stale_ids = [
+            point_id
+            for key, point_ids in existing_keys.items()
+            for i, point_id in enumerate(point_ids)
+            if key not in kept_keys or i > 0  # duplicatas também saem
+        ]
+        self.vector_store.delete_points(collection, stale_ids)
+        self.vector_store.index_chunks(collection, new_chunks)
+        
+        stats = {
+            "indexados": len(new_chunks),
+            "removidos": len(stale_ids),
+            "mantidos": len(kept_keys),
+            "retirado": False
+        }
+        logger.info("Normativo sincronizado no índice", norma=norma, numero=numero, domain=domain, **stats)
+        return stats
+    
+    def _archive(self, corpus_file: Path, domain: str):
+        """Move o arquivo (e sua entrada do corpus.index) para processed"""
+        archive_file(corpus_file, Path(self.settings.data_processed_path) / domain)
+    
+    @traced("sync.run")
+    def run_once(self, years: Optional[List[int]] = None) -> Dict:
+        """Um ciclo: feed → download do delta (data/raw/<tema>) → atualização do índice"""
+        started = time.perf_counter()
+        domains = self.settings.domain_list
+        results = sync_feed(years or default_years(), domains=domains)
+        
+        failed_downloads = sum(1 for result in results if not result.get("success"))
+        summary = {"normativos": 0, "indexados": 0, "removidos": 0, "retirados": 0, "falhas": failed_downloads, "adiados": 0}
+        
+        # Arquivos de corpus pendentes: baixados agora ou que falharam no ciclo anterior
+        for domain in domains:
+            raw_dir = Path(self.settings.data_raw_path) / domain
+            if not raw_dir.exists():
+                continue
+            try:
+                with domain_lock(domain):
+                    self._sync_domain(domain, raw_dir, summary)
+            except DomainLocked:
+                # Arquivos ficam em data/raw para o próximo ciclo
+                summary["adiados"] += 1
+                logger.warning("Ingestão em andamento no domínio, sincronização adiada", domain=domain)
+        
+        logger.info("Ciclo de sincronização concluído", duracao_s=round(time.perf_counter() - started, 1), **summary)
+        return summary
+    
+    def _sync_domain(self, domain: str, raw_dir: Path, summary: Dict):
+        """Aplica os arquivos pendentes do domínio (com o lock do domínio)"""
+        pending = self.vector_store.find_unpublished_version(domain)
+        if pending:
+            # Resume da reindexação não veria deltas gravados no alias atual
+            summary["adiados"] += 1
+            logger.warning(
+                "Reindexação completa não publicada no domínio, sincronização adiada até o resume",
+                domain=domain,
+                collection=pending
+            )
+            return
+        
+        for corpus_file in list_corpus_files(raw_dir):
+            try:
+                stats = self.apply_normativo(corpus_file, domain)
+                self._archive(corpus_file, domain)
+            except Exception as e:
+                # Arquivo fica em data/raw e é reprocessado no próximo ciclo
+                summary["falhas"] += 1
+                logger.error("Erro ao sincronizar normativo no índice", file=str(corpus_file), error=str(e), exc_info=True)
+                continue
+            
+            summary["normativos"] += 1
+            summary["indexados"] += stats["indexados"]
+            summary["removidos"] += stats["removidos"] or 0
+            summary["retirados"] += int(stats["retirado"])
+    
+    def run_forever(self, interval_minutes: float, stop: threading.Event):
+        """Executa ciclos até stop ser sinalizado (SIGTERM/SIGINT)"""
+        logger.info("Serviço de sincronização iniciado", intervalo_minutos=interval_minutes)
+        while not stop.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                # Falha de um ciclo (rede, Qdrant) não derruba o serviço
+                logger.error("Erro no ciclo de sincronização", error=str(e), exc_info=True)
+            stop.wait(interval_minutes * 60)
+        logger.info("Serviço de sincronização encerrado")
+
+
+def main():
+    """Entry point: python -m app.ingestion.sync [--once] [--interval MINUTOS]"""
+    setup_logger()
+    settings = get_settings()
+    
+    interval = settings.sync_interval_minutes
+    if "--interval" in sys.argv:
+        interval = float(sys.argv[sys.argv.index("--interval") + 1])
+    
+    setup_tracing("rag-regulatorio-sync")
+    sync = RegulatorySync()
+    try:
+        if "--once" in sys.argv:
+            sync.run_once()
+            return
+        
+        stop = threading.Event()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(sig, lambda *_: stop.set())
+        sync.run_forever(interval, stop)
+    finally:
+        shutdown_tracing()
+
+
+if __name__ == "__main__":
+    main()
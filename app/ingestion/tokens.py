@@ -0,0 +1,70 @@
+"""
+Contagem incremental de tokens.
+
+O documento é codificado uma única vez; cada token é mapeado para o offset
+de caractere onde começa e uma soma de prefixos permite obter a quantidade
+de tokens de qualquer span [start, end) em O(1), sem recodificar o trecho.
+
+A contagem de um span é a quantidade de tokens do documento que começam
+dentro dele; pode diferir em ±1 da codificação isolada do trecho (fusões
+BPE nas bordas), o que é suficiente para decisões de tamanho de chunk.
+"""
+from array import array
+from itertools import chain, repeat
+from typing import Dict
+
+# Bytes de continuação UTF-8 (0x80-0xBF) não iniciam caractere
+_CONTINUATION_BYTES = bytes(range(0x80, 0xC0))
+
+
+class _TokenCharLengths(dict):
+    """
+    Cache id do token → caracteres iniciados nele (bytes que não são de continuação).
+    
+    Um token que só completa um caractere multibyte inicia 0 caracteres e
+    passa a contar para o caractere seguinte.
+    """
+    
+    def __init__(self, encoding):
+        super().__init__()
+        self.encoding = encoding
+    
+    def __missing__(self, token: int) -> int:
+        length = len(self.encoding.decode_single_token_bytes(token).translate(None, _CONTINUATION_BYTES))
+        self[token] = length
+        return length
+
+
+# Um cache por encoding, compartilhado por todos os documentos do processo
+_char_lengths: Dict[object, _TokenCharLengths] = {}
+
+
+def _char_lengths_for(encoding) -> _TokenCharLengths:
+    cache = _char_lengths.get(encoding)
+    if cache is None:
+        cache = _char_lengths[encoding] = _TokenCharLengths(encoding)
+    return cache
+
+
+class TokenOffsetMap:
+    """Mapa caractere → posição de token de um texto"""
+    
+    __slots__ = ("length", "total_tokens", "_prefix")
+    
+    def __init__(self, encoding, text: str):
+        tokens = encoding.encode(text, disallowed_special=())
+        char_lengths = map(_char_lengths_for(encoding).__getitem__, tokens)
+        self.length = len(text)
+        self.total_tokens = len(tokens)
+        
+        # _prefix[c] = quantidade de tokens que começam antes do caractere c
+        self._prefix = array("I", [0])
+        self._prefix.extend(chain.from_iterable(map(repeat, range(1, len(tokens) + 1), char_lengths)))
+    
+    def count(self, start: int, end: int) -> int:
+        """Tokens do span [start, end) em O(1)"""
+        start = max(0, min(start, self.length))
+        end = max(0, min(end, self.length))
+        if end <= start:
+            return 0
+        return self._prefix[end] - self._prefix[start]
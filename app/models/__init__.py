@@ -3,16 +3,21 @@ from .schemas import (
     ChatResponse,
     HealthResponse,
     ReindexResponse,
+    ReindexJobResponse,
     DocumentChunk,
     Metadata,
 )
+from .records import ChunkMetadata, ChunkRecord
 
 __all__ = [
     "ChatRequest",
     "ChatResponse",
     "HealthResponse",
     "ReindexResponse",
+    "ReindexJobResponse",
     "DocumentChunk",
     "Metadata",
+    "ChunkMetadata",
+    "ChunkRecord",
 ]
 
@@ -0,0 +1,115 @@
+"""
+Representação interna e compacta de chunks.
+
+Ingestão (chunking → embedding → payload) e recuperação (payload → contexto)
+usam dataclasses com __slots__, sem validação por instância. Os modelos
+Pydantic (schemas.Metadata / schemas.DocumentChunk) ficam na fronteira da
+API: a validação dos metadados acontece uma vez por documento
+(ChunkMetadata.validated) e a conversão de volta só quando necessária
+(to_model).
+"""
+from dataclasses import dataclass, replace
+from typing import Optional
+from app.models.schemas import DocumentChunk, Metadata
+
+
+@dataclass(slots=True)
+class ChunkMetadata:
+    """Metadados de um chunk (mesmos campos de schemas.Metadata)"""
+    fonte: str
+    norma: str
+    numero_norma: str
+    ano: int
+    tema: str
+    artigo: Optional[str] = None
+    url: Optional[str] = None
+    
+    @classmethod
+    def validated(cls, base_metadata: dict) -> "ChunkMetadata":
+        """Valida os metadados base de um documento com o schema Pydantic (uma vez)"""
+        metadata = Metadata(**base_metadata)
+        return cls(
+            fonte=metadata.fonte,
+            norma=metadata.norma,
+            numero_norma=metadata.numero_norma,
+            ano=metadata.ano,
+            tema=metadata.tema,
+            artigo=metadata.artigo,
+            url=metadata.url,
+        )
+    
+    @classmethod
+    def from_payload(cls, payload: dict) -> "ChunkMetadata":
+        return cls(
+            fonte=payload.get("fonte", ""),
+            norma=payload.get("norma", ""),
+            numero_norma=payload.get("numero_norma", ""),
+            ano=payload.get("ano", 2023),
+            tema=payload.get("tema", ""),
+            artigo=payload.get("artigo"),
+            url=payload.get("url"),
+        )
+    
+    def with_artigo(self, artigo: Optional[str]) -> "ChunkMetadata":
+        return replace(self, artigo=artigo)
+    
+    def to_dict(self) -> dict:
+        """Dict no formato de Metadata.model_dump()"""
+        return {
+            "fonte": self.fonte,
+            "norma": self.norma,
+            "numero_norma": self.numero_norma,
+            "artigo": self.artigo,
+            "ano": self.ano,
+            "tema": self.tema,
+            "url": self.url,
+        }
+    
+    def to_model(self) -> Metadata:
+        return Metadata.model_construct(**self.to_dict())
+
+
+@dataclass(slots=True)
+class ChunkRecord:
+    """Chunk de documento (mesmos campos de schemas.DocumentChunk)"""
+    text: str
+    metadata: ChunkMetadata
+    chunk_id: Optional[str] = None
+    score: Optional[float] = None
+    token_count: Optional[int] = None
+    
+    @classmethod
+    def from_payload(cls, payload: dict, chunk_id: Optional[str] = None, score: Optional[float] = None) -> "ChunkRecord":
+        text = payload.get("text", "")
+        return cls(
+            text=str(text) if text else "",
+            metadata=ChunkMetadata.from_payload(payload),
+            chunk_id=chunk_id,
+            score=score,
+            token_count=payload.get("token_count"),
+        )
+    
+    def payload(self) -> dict:
+        """Payload gravado no Qdrant"""
+        metadata = self.metadata
+        return {
+            "text": self.text,
+            "fonte": metadata.fonte,
+            "norma": metadata.norma,
+            "numero_norma": metadata.numero_norma,
+            "artigo": metadata.artigo or "",
+            "ano": metadata.ano,
+            "tema": metadata.tema,
+            "url": metadata.url or "",
+            "token_count": self.token_count,
+        }
+    
+    def to_model(self) -> DocumentChunk:
+        """Conversão para o modelo Pydantic (fronteira da API)"""
+        return DocumentChunk.model_construct(
+            text=self.text,
+            metadata=self.metadata.to_model(),
+            chunk_id=self.chunk_id,
+            score=self.score,
+            token_count=self.token_count,
+        )
@@ -20,6 +20,7 @@ class DocumentChunk(BaseModel):
     metadata: Metadata
     chunk_id: Optional[str] = None
     score: Optional[float] = None
+    token_count: Optional[int] = None  # Tokens do texto (calculado no chunking)
 
 
 class ChatRequest(BaseModel):
@@ -39,6 +40,15 @@ class ChatResponse(BaseModel):
     timestamp: datetime = Field(default_factory=datetime.now)
 
 
+class ChatTimeoutResponse(BaseModel):
+    """Response 504 do chat: prazo esgotado, com as fontes já recuperadas"""
+    detail: str
+    stage: Optional[str] = Field(None, description="Estágio em que o prazo acabou (search, llm)")
+    timeout_seconds: Optional[float] = Field(None, description="Limite que esgotou (API_TIMEOUT ou o do estágio)")
+    sources: List[Dict[str, Any]] = Field(default_factory=list)
+    timestamp: datetime = Field(default_factory=datetime.now)
+
+
 class HealthResponse(BaseModel):
     """Response do health check"""
     status: str
@@ -55,3 +65,24 @@ class ReindexResponse(BaseModel):
     chunks_created: int
     timestamp: datetime = Field(default_factory=datetime.now)
 
+
+
+class ReindexJobResponse(BaseModel):
+    """Status de um job de reindexação em background"""
+    job_id: str
+    domain: str
+    force: bool
+    resume: bool = False
+    status: str = Field(..., description="queued, running, succeeded, failed ou cancelled")
+    message: str = ""
+    error: Optional[str] = None
+    files_total: int = 0
+    files_processed: int = 0
+    chunks_total: int = 0
+    embeddings_done: int = 0
+    embeddings_resumed: int = Field(0, description="Embeddings reaproveitados do journal (resume), fora da taxa")
+    embeddings_per_second: float = 0.0
+    eta_seconds: Optional[float] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
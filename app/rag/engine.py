@@ -1,10 +1,18 @@
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 import time
-from openai import OpenAI, RateLimitError
+from openai import OpenAI
+from app.rag.model_router import get_model_router
 from app.rag.vector_store import VectorStore
-from app.models.schemas import DocumentChunk
+from app.models.records import ChunkRecord
 from app.config import get_settings
+from app.utils.deadline import Deadline, DeadlineExceeded
 from app.utils.logger import get_logger
+from app.utils.tracing import set_attributes, span
+from app.utils.metrics import (
+    QUERY_DURATION,
+    observe_stage,
+    record_empty_context,
+)
 from app.utils.validators import validate_response, extract_citations
 
 logger = get_logger(__name__)
@@ -32,15 +40,18 @@ Se realmente não conseguir encontrar informação relevante nos trechos, diga:
 class RegulatoryRAGEngine:
     """Engine RAG principal com validações anti-alucinação"""
     
-    def __init__(self):
+    def __init__(self, vector_store: Optional[VectorStore] = None):
         self.settings = get_settings()
         if not self.settings.openai_api_key:
             raise ValueError("OPENAI_API_KEY não configurada. Configure a variável de ambiente.")
         
-        self.vector_store = VectorStore()
-        self.llm_client = OpenAI(api_key=self.settings.openai_api_key)
+        self.vector_store = vector_store or VectorStore()
+        # Retentativas ficam no gateway (Retry-After + orçamento compartilhado)
+        self.llm_client = OpenAI(api_key=self.settings.openai_api_key, max_retries=0)
+        # Fallback entre modelos e hedge dentro de api_timeout
+        self.model_router = get_model_router()
     
-    def _build_context(self, chunks: List[DocumentChunk]) -> str:
+    def _build_context(self, chunks: List[ChunkRecord]) -> str:
         """Constrói contexto a partir dos chunks"""
         context_parts = []
         
@@ -141,54 +152,77 @@ Sua resposta DEVE usar informações dos trechos fornecidos. Analise o CONTEÚDO
 RESPONDA AGORA:
 """
     
-    def _call_llm(self, prompt: str) -> str:
-        """Chama o LLM com retry para rate limits"""
-        max_retries = 5
-        retry_delay = 1
+    def _call_llm(self, prompt: str, deadline: Deadline) -> Tuple[str, str]:
+        """
+        Chama o LLM pelo roteador de modelos (fallback e hedge) e gateway OpenAI
+        (fila, orçamento de rate limit e retentativas), sem passar do prazo.
         
-        for attempt in range(max_retries):
-            try:
-                response = self.llm_client.chat.completions.create(
-                    model=self.settings.llm_model,
-                    messages=[
-                        {"role": "system", "content": SYSTEM_PROMPT},
-                        {"role": "user", "content": prompt}
-                    ],
-                    max_tokens=self.settings.max_tokens_response,
-                    temperature=0.1,  # Baixa temperatura para respostas mais determinísticas
-                )
-                
-                return response.choices[0].message.content.strip()
-                
-            except RateLimitError as e:
-                if attempt < max_retries - 1:
-                    wait_time = retry_delay * (2 ** attempt)  # Backoff exponencial
-                    logger.warning(
-                        "Rate limit no LLM, aguardando",
-                        attempt=attempt + 1,
-                        wait_seconds=wait_time
-                    )
-                    time.sleep(wait_time)
-                else:
-                    logger.error("Rate limit no LLM após múltiplas tentativas")
-                    raise
-            except Exception as e:
-                logger.error("Erro ao chamar LLM", error=str(e))
-                raise
+        Returns:
+            (resposta, modelo usado)
+        """
+        try:
+            response, model = self.model_router.complete(
+                self.llm_client,
+                deadline,
+                messages=[
+                    {"role": "system", "content": SYSTEM_PROMPT},
+                    {"role": "user", "content": prompt}
+                ],
+                max_tokens=self.settings.max_tokens_response,
+                temperature=0.1,  # Baixa temperatura para respostas mais determinísticas
+            )
+        except Exception as e:
+            logger.error("Erro ao chamar LLM", error=str(e), error_type=type(e).__name__)
+            raise
+        
+        return response.choices[0].message.content.strip(), model
     
     def query(
         self,
         question: str,
         domain: str,
         top_k: Optional[int] = None,
-        min_score: Optional[float] = None
+        min_score: Optional[float] = None,
+        deadline: Optional[Deadline] = None
     ) -> Dict[str, Any]:
         """
         Executa query completa com validações.
         
+        Args:
+            deadline: prazo da requisição (criado na API); sem ele, api_timeout
+                a partir desta chamada
+        
         Returns:
             dict com answer, sources, citations, has_sufficient_context
+        
+        Raises:
+            DeadlineExceeded: prazo esgotado (com as fontes já recuperadas)
         """
+        started = time.perf_counter()
+        deadline = deadline or Deadline(self.settings.api_timeout)
+        outcome = "error"
+        try:
+            with span("rag.query", domain=domain, top_k=top_k, min_score=min_score) as current:
+                try:
+                    result = self._query(question, domain, top_k, min_score, deadline)
+                except DeadlineExceeded as e:
+                    outcome = "timeout"
+                    set_attributes(current, outcome=outcome, deadline_stage=e.stage, sources=len(e.sources))
+                    raise
+                outcome = "answered" if result["has_sufficient_context"] else "empty_context"
+                set_attributes(current, outcome=outcome, sources=len(result["sources"]))
+            return result
+        finally:
+            QUERY_DURATION.labels(domain=domain, outcome=outcome).observe(time.perf_counter() - started)
+    
+    def _query(
+        self,
+        question: str,
+        domain: str,
+        top_k: Optional[int],
+        min_score: Optional[float],
+        deadline: Deadline
+    ) -> Dict[str, Any]:
         # Parâmetros
         top_k = top_k or self.settings.top_k_results
         min_score = min_score or self.settings.min_similarity_score
@@ -196,16 +230,26 @@ RESPONDA AGORA:
         logger.info("Iniciando query RAG", question=question[:100], domain=domain)
         
         # 1. Buscar contexto
-        sources = self.vector_store.search(
-            collection_name=domain,
-            query=question,
-            top_k=top_k,
-            min_score=min_score
-        )
+        try:
+            sources = self.vector_store.search(
+                collection_name=domain,
+                query=question,
+                top_k=top_k,
+                min_score=min_score,
+                # Busca limitada para sobrar prazo para o LLM
+                deadline=deadline.child(self.settings.search_timeout_seconds)
+            )
+        except DeadlineExceeded as e:
+            e.stage = "search"
+            if not deadline.expired():
+                # Só o limite da busca acabou; o prazo da consulta ainda corre
+                e.timeout = self.settings.search_timeout_seconds
+            raise
         
         # 2. Validar se há contexto suficiente
         if not sources or len(sources) == 0:
             logger.warning("Sem contexto suficiente", question=question[:100])
+            record_empty_context(domain, "no_sources")
             return {
                 "answer": "Não há base normativa explícita nos documentos analisados para responder a esta pergunta.",
                 "sources": [],
@@ -214,7 +258,8 @@ RESPONDA AGORA:
             }
         
         # 3. Construir contexto e prompt
-        context = self._build_context(sources)
+        with observe_stage("context"), span("rag.build_context", chunks=len(sources)):
+            context = self._build_context(sources)
         
         # Se não há contexto válido após filtrar chunks vazios, retornar erro
         if not context or len(context.strip()) < 50:
@@ -223,6 +268,7 @@ RESPONDA AGORA:
                 original_sources_count=len(sources),
                 question=question[:100]
             )
+            record_empty_context(domain, "empty_chunks")
             return {
                 "answer": "Não há base normativa explícita nos documentos analisados para responder a esta pergunta.",
                 "sources": [],
@@ -236,6 +282,7 @@ RESPONDA AGORA:
         logger.info(
             "Contexto construído para LLM",
             context_length=len(context),
+            context_tokens=sum(s.token_count or 0 for s in sources),
             context_preview=context[:500],
             sources_count=len(sources),
             valid_sources_count=len([s for s in sources if s.text and len(s.text.strip()) >= 10]),
@@ -261,13 +308,22 @@ RESPONDA AGORA:
         )
         
         # 4. Chamar LLM
-        answer = self._call_llm(prompt)
+        try:
+            with observe_stage("llm"), span("openai.chat", model=self.model_router.primary_model) as current:
+                answer, model = self._call_llm(prompt, deadline)
+                set_attributes(current, model=model)
+        except DeadlineExceeded as e:
+            # Resposta parcial: a API devolve as fontes já recuperadas no 504
+            e.stage = "llm"
+            e.sources = [s.metadata.to_dict() for s in sources]
+            raise
         
         # 5. Validar resposta
-        validations = validate_response(answer, sources, min_sources=1)
-        
-        # 6. Extrair citações dos sources (sempre, mesmo se resposta não citar)
-        citations = extract_citations(answer, sources)
+        with observe_stage("validation"), span("rag.validate"):
+            validations = validate_response(answer, sources, min_sources=1)
+            
+            # 6. Extrair citações dos sources (sempre, mesmo se resposta não citar)
+            citations = extract_citations(answer, sources)
         
         # Se tiver sources mas resposta não citou, incluir citações dos sources
         if sources and not citations:
@@ -278,7 +334,7 @@ RESPONDA AGORA:
             citations = list(set(citations))
         
         # Converter sources para dict para compatibilidade com ChatResponse
-        sources_dict = [s.metadata.model_dump() for s in sources]
+        sources_dict = [s.metadata.to_dict() for s in sources]
         
         # 7. Se não passar validação, retornar resposta mas com aviso
         if not validations["is_valid"]:
@@ -305,12 +361,13 @@ RESPONDA AGORA:
         logger.info(
             "Query concluída",
             question=question[:100],
+            model=model,
             sources_count=len(sources),
             has_citations=len(citations) > 0
         )
         
         # Converter sources para dict para compatibilidade com ChatResponse
-        sources_dict = [s.metadata.model_dump() for s in sources]
+        sources_dict = [s.metadata.to_dict() for s in sources]
         
         return {
             "answer": answer,
@@ -0,0 +1,491 @@
+"""
+Avaliação da recuperação (retrieval) contra um golden set versionado.
+
+Mede, para cada configuração de busca, se os normativos esperados de cada
+pergunta aparecem entre os chunks recuperados:
+
+- recall@k: fração das referências esperadas recuperadas (média por pergunta)
+- hit@k: fração das perguntas com ao menos uma referência recuperada
+- MRR: média de 1/posição da primeira referência correta (0 se nenhuma)
+- vazias: perguntas sem nenhum chunk acima de min_score (a API responde
+  "sem contexto normativo")
+- latência da busca no Qdrant (p50/p95; embeddings vêm do cache)
+
+Golden set: app/rag/golden/retrieval_<versão>.json, com perguntas por domínio
+e referências (norma, numero_norma e, opcionalmente, artigo).
+
+Cada pergunta é buscada uma vez com o maior top_k, e as combinações de
+top_k x min_score são calculadas sobre o ranking retornado. Os embeddings
+(perguntas e, no modo --corpus, chunks) ficam em cache em disco, então
+varreduras repetidas não chamam a OpenAI de novo.
+
+Modos:
+- coleção publicada (padrão): avalia o alias do domínio, ou --collection
+  (ex: uma versão blue/green ainda não publicada)
+- --corpus DIR: indexa o corpus em Qdrant embutido para cada tamanho de
+  chunk (--chunk-tokens) e dimensão de embedding (--dims). Dimensões
+  menores usam o prefixo do embedding do text-embedding-3 (equivale ao
+  parâmetro dimensions da API), sem novas chamadas
+
+Com --baseline, compara com uma execução anterior e termina com código 1 se
+recall@k ou MRR de alguma configuração cair mais que --max-drop.
+
+Uso:
+    python -m app.rag.evaluation --domain pix
+    python -m app.rag.evaluation --top-k 3,5,10 --min-score 0,0.15,0.3
+    python -m app.rag.evaluation --domain pix --corpus data/raw/pix --chunk-tokens 400,600,800 --dims 3072,1024
+    python -m app.rag.evaluation --output data/eval/pr.json --baseline data/eval/main.json
+"""
+import argparse
+import base64
+import hashlib
+import json
+import logging
+import re
+import struct
+import sys
+import time
+import unicodedata
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+from app.config import get_settings
+from app.models.records import ChunkRecord
+from app.utils.logger import get_logger
+from app.utils.metrics import record_cache
+
+logger = get_logger(__name__)
+
+GOLDEN_DIR = Path(__file__).parent / "golden"
+DEFAULT_GOLDEN = GOLDEN_DIR / "retrieval_v1.json"
+
+
+# Golden set
+
+def _normalize_norma(value: Optional[str]) -> str:
+    """"Resolução  BCB" -> "resolucao bcb" (sem acentos, caixa ou espaços extras)"""
+    text = unicodedata.normalize("NFKD", value or "")
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return " ".join(text.lower().split())
+
+
+def _normalize_numero(value) -> str:
+    """"4.015" / "0032" / "5º" -> "4015" / "32" / "5" """
+    digits = re.sub(r"\D", "", str(value or ""))
+    return digits.lstrip("0") or digits
+
+
+@dataclass(frozen=True)
+class ExpectedReference:
+    norma: str
+    numero_norma: str
+    artigo: Optional[str] = None
+    
+    def matches(self, chunk: ChunkRecord) -> bool:
+        """
+        Mesmo normativo (e artigo, se informado).
+        
+        A norma casa por prefixo ("Resolução" extraída do nome do arquivo
+        casa com "Resolução BCB" do corpus do Bacen).
+        """
+        metadata = chunk.metadata
+        if _normalize_numero(metadata.numero_norma) != _normalize_numero(self.numero_norma):
+            return False
+        expected, found = _normalize_norma(self.norma), _normalize_norma(metadata.norma)
+        if not (found.startswith(expected) or expected.startswith(found)) or not found:
+            return False
+        if self.artigo is not None:
+            return _normalize_numero(metadata.artigo) == _normalize_numero(self.artigo)
+        return True
+
+
+@dataclass
+class GoldenQuestion:
+    id: str
+    question: str
+    expected: List[ExpectedReference]
+    match: str = "all"  # "all": recall por referência; "any": qualquer uma basta
+
+
+@dataclass
+class GoldenSet:
+    version: str
+    domains: Dict[str, List[GoldenQuestion]] = field(default_factory=dict)
+
+
+def load_golden_set(path: Path = DEFAULT_GOLDEN) -> GoldenSet:
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    
+    domains = {}
+    for domain, questions in data["domains"].items():
+        domains[domain] = [
+            GoldenQuestion(
+                id=item["id"],
+                question=item["question"],
+                expected=[ExpectedReference(**reference) for reference in item["expected"]],
+                match=item.get("match", "all")
+            )
+            for item in questions
+        ]
+    return GoldenSet(version=data["version"], domains=domains)
+
+
+# Métricas
+
+def score_ranking(question: GoldenQuestion, ranking: List[ChunkRecord], top_k: int, min_score: float) -> Dict[str, float]:
+    """recall, hit, reciprocal rank e vazio de uma pergunta para (top_k, min_score)"""
+    retrieved = [chunk for chunk in ranking[:top_k] if (chunk.score or 0.0) >= min_score]
+    
+    first_rank = None
+    for rank, chunk in enumerate(retrieved, start=1):
+        if any(reference.matches(chunk) for reference in question.expected):
+            first_rank = rank
+            break
+    
+    found = sum(1 for reference in question.expected if any(reference.matches(chunk) for chunk in retrieved))
+    if question.match == "any":
+        recall = 1.0 if found else 0.0
+    else:
+        recall = found / len(question.expected) if question.expected else 0.0
+    
+    return {
+        "recall": recall,
+        "hit": 1.0 if first_rank else 0.0,
+        "rr": 1.0 / first_rank if first_rank else 0.0,
+        "empty": 0.0 if retrieved else 1.0,
+    }
+
+
+def evaluate_rankings(
+    questions: List[GoldenQuestion],
+    rankings: Dict[str, List[ChunkRecord]],
+    top_ks: List[int],
+    min_scores: List[float]
+) -> List[Dict]:
+    """Métricas agregadas para cada combinação de top_k x min_score"""
+    results = []
+    for top_k in top_ks:
+        for min_score in min_scores:
+            scores = [score_ranking(q, rankings[q.id], top_k, min_score) for q in questions]
+            count = len(scores) or 1
+            results.append({
+                "top_k": top_k,
+                "min_score": min_score,
+                "recall": round(sum(s["recall"] for s in scores) / count, 4),
+                "hit_rate": round(sum(s["hit"] for s in scores) / count, 4),
+                "mrr": round(sum(s["rr"] for s in scores) / count, 4),
+                "empty_rate": round(sum(s["empty"] for s in scores) / count, 4),
+                "misses": [q.id for q, s in zip(questions, scores) if not s["hit"]],
+            })
+    return results
+
+
+# Embeddings em cache
+
+def _encode_vector(vector: List[float]) -> str:
+    return base64.b64encode(struct.pack(f"<{len(vector)}f", *vector)).decode("ascii")
+
+
+def _decode_vector(data: str) -> List[float]:
+    raw = base64.b64decode(data)
+    return list(struct.unpack(f"<{len(raw) // 4}f", raw))
+
+
+class EmbeddingCache:
+    """
+    Embeddings em disco por (modelo, texto), em float32/base64 (JSON por linha).
+    
+    O arquivo só recebe novas linhas; o cache inteiro é carregado na criação.
+    """
+    
+    def __init__(self, vector_store, directory: Path):
+        self.vector_store = vector_store
+        model = vector_store.embedding_model
+        self.path = Path(directory) / f"embeddings_{re.sub(r'[^a-zA-Z0-9_.-]', '_', model)}.jsonl"
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.hits = 0
+        self.misses = 0
+        self._vectors: Dict[str, str] = {}
+        if self.path.exists():
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self._vectors[entry["key"]] = entry["vector"]
+    
+    def __len__(self) -> int:
+        return len(self._vectors)
+    
+    @staticmethod
+    def _key(text: str) -> str:
+        return hashlib.sha1(text.encode("utf-8")).hexdigest()
+    
+    def embed(self, text: str) -> List[float]:
+        key = self._key(text)
+        cached = self._vectors.get(key)
+        record_cache("evaluation_embeddings", cached is not None)
+        if cached is not None:
+            self.hits += 1
+            return _decode_vector(cached)
+        
+        self.misses += 1
+        vector = self.vector_store._get_embedding_with_retry(text)
+        encoded = _encode_vector(vector)
+        self._vectors[key] = encoded
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"key": key, "vector": encoded}) + "\n")
+        return vector
+
+
+# Execução
+
+def _rank_questions(vector_store, cache: EmbeddingCache, collection: str, questions: List[GoldenQuestion], limit: int, dims: Optional[int] = None):
+    """Ranking (sem min_score) e latência de busca de cada pergunta"""
+    rankings, latencies = {}, []
+    for question in questions:
+        vector = cache.embed(question.question)
+        if dims:
+            vector = vector[:dims]
+        started = time.perf_counter()
+        rankings[question.id] = vector_store.search_by_vector(collection, vector, top_k=limit, min_score=0.0, query=question.question)
+        latencies.append(time.perf_counter() - started)
+    return rankings, latencies
+
+
+def evaluate_collection(
+    vector_store,
+    cache: EmbeddingCache,
+    collection: str,
+    questions: List[GoldenQuestion],
+    top_ks: List[int],
+    min_scores: List[float]
+) -> Dict:
+    """Avalia uma coleção já indexada (alias do domínio ou versão blue/green)"""
+    from app.bench import summarize
+    
+    rankings, latencies = _rank_questions(vector_store, cache, collection, questions, max(top_ks))
+    return {
+        "index": {"collection": collection},
+        "latency": summarize(latencies),
+        "configs": evaluate_rankings(questions, rankings, top_ks, min_scores),
+    }
+
+
+def load_corpus_documents(directory: Path, domain: str) -> List[tuple]:
+    """(arquivo, artigos) de cada arquivo ingerível, parseados uma vez para todos os tamanhos de chunk"""
+    from app.ingestion.corpus import is_corpus_file
+    from app.ingestion.document_parser import DocumentParser
+    from app.ingestion.main import list_ingestion_files
+    
+    parser = DocumentParser()
+    documents = []
+    for file_path in sorted(list_ingestion_files(directory)):
+        if is_corpus_file(file_path):
+            documents.append((file_path, parser.parse_corpus(file_path)))
+        else:
+            text, base_metadata = parser.parse(file_path, tema=domain)
+            documents.append((file_path, [(text, base_metadata)]))
+    return documents
+
+
+def chunk_documents(documents: List[tuple], max_tokens: int) -> List[ChunkRecord]:
+    from app.ingestion.chunker import JuridicalChunker
+    from app.ingestion.document_parser import DocumentParser
+    
+    chunker = JuridicalChunker(max_tokens=max_tokens)
+    chunks = []
+    for file_path, articles in documents:
+        if DocumentParser.is_prechunked(file_path):
+            chunks.extend(chunker.chunk_prechunked(articles))
+        else:
+            text, base_metadata = articles[0]
+            if text and text.strip():
+                chunks.extend(chunker.chunk(text, base_metadata))
+    return chunks
+
+
+def evaluate_corpus(
+    vector_store,
+    cache: EmbeddingCache,
+    documents: List[tuple],
+    questions: List[GoldenQuestion],
+    chunk_tokens: List[int],
+    dims_list: List[int],
+    top_ks: List[int],
+    min_scores: List[float]
+) -> List[Dict]:
+    """Indexa o corpus em Qdrant embutido para cada (tamanho de chunk, dimensão) e avalia"""
+    from qdrant_client import QdrantClient
+    from qdrant_client.models import Distance, PointStruct, VectorParams
+    from app.bench import summarize
+    from app.rag.vector_store import VectorStore
+    
+    reports = []
+    for max_tokens in chunk_tokens:
+        chunks = chunk_documents(documents, max_tokens)
+        vectors = [cache.embed(chunk.text) for chunk in chunks]
+        
+        for dims in dims_list:
+            # Prefixo do embedding; a distância cosseno normaliza o vetor truncado
+            client = QdrantClient(":memory:")
+            client.create_collection("evaluation", vectors_config=VectorParams(size=dims, distance=Distance.COSINE))
+            points = []
+            for chunk, vector in zip(chunks, vectors):
+                payload = chunk.payload()
+                payload["text"] = chunk.text
+                points.append(PointStruct(id=str(uuid.uuid4()), vector=vector[:dims], payload=payload))
+            for start in range(0, len(points), 256):
+                client.upsert(collection_name="evaluation", points=points[start:start + 256])
+            
+            store = VectorStore(client=client, openai_client=vector_store.openai_client)
+            rankings, latencies = _rank_questions(store, cache, "evaluation", questions, max(top_ks), dims=dims)
+            reports.append({
+                "index": {"chunk_tokens": max_tokens, "dims": dims, "chunks": len(chunks)},
+                "latency": summarize(latencies),
+                "configs": evaluate_rankings(questions, rankings, top_ks, min_scores),
+            })
+    return reports
+
+
+def _config_key(domain: str, index: Dict, config: Dict) -> str:
+    index_part = ",".join(f"{key}={value}" for key, value in sorted(index.items()) if key != "chunks")
+    return f"{domain}|{index_part}|k={config['top_k']}|min={config['min_score']}"
+
+
+def compare_with_baseline(current: Dict, baseline: Dict, max_drop: float) -> List[str]:
+    """Configurações em que recall ou MRR caíram mais que max_drop"""
+    previous = {}
+    for report in baseline.get("reports", []):
+        for config in report["configs"]:
+            previous[_config_key(report["domain"], report["index"], config)] = config
+    
+    regressions = []
+    for report in current["reports"]:
+        for config in report["configs"]:
+            key = _config_key(report["domain"], report["index"], config)
+            old = previous.get(key)
+            if old is None:
+                continue
+            for metric in ("recall", "mrr"):
+                if old[metric] - config[metric] > max_drop:
+                    regressions.append(f"{key}: {metric} {old[metric]:.3f} → {config[metric]:.3f}")
+    return regressions
+
+
+def print_report(domain: str, report: Dict, settings):
+    index = ", ".join(f"{key} {value}" for key, value in report["index"].items())
+    latency = report["latency"]
+    print(f"\n[{domain}] {index}   busca p50 {latency['p50_ms']:.1f} ms   p95 {latency['p95_ms']:.1f} ms")
+    print(f"    {'top_k':>5} {'min_score':>9} {'recall':>7} {'hit':>6} {'MRR':>6} {'vazias':>7}")
+    for config in report["configs"]:
+        current = config["top_k"] == settings.top_k_results and config["min_score"] == settings.min_similarity_score
+        print(
+            f"  {'*' if current else ' '} {config['top_k']:>5} {config['min_score']:>9.2f} {config['recall']:>7.3f} "
+            f"{config['hit_rate']:>6.3f} {config['mrr']:>6.3f} {config['empty_rate']:>7.1%}"
+        )
+
+
+def _parse_list(value: str, cast) -> List:
+    return [cast(item) for item in value.split(",") if item.strip()]
+
+
+def main(argv: Optional[List[str]] = None):
+    settings = get_settings()
+    parser = argparse.ArgumentParser(prog="python -m app.rag.evaluation", description="Avaliação da recuperação contra o golden set")
+    parser.add_argument("--golden", default=str(DEFAULT_GOLDEN), help="Arquivo do golden set")
+    parser.add_argument("--domain", help="Domínio avaliado (padrão: todos do golden set)")
+    parser.add_argument("--collection", help="Coleção avaliada (padrão: alias do domínio)")
+    parser.add_argument("--top-k", default=f"1,3,{settings.top_k_results},10", help="Valores de top_k (ex: 3,5,10)")
+    parser.add_argument("--min-score", default=f"0,{settings.min_similarity_score},0.3", help="Valores de min_score (ex: 0,0.15,0.3)")
+    parser.add_argument("--corpus", help="Diretório de documentos: indexa em Qdrant embutido em vez de usar a coleção")
+    parser.add_argument("--chunk-tokens", default="600", help="Tamanhos de chunk com --corpus (ex: 400,600,800)")
+    parser.add_argument("--dims", default="3072", help="Dimensões do embedding com --corpus (ex: 3072,1536,768)")
+    parser.add_argument("--cache-dir", default=settings.evaluation_cache_path, help="Cache de embeddings")
+    parser.add_argument("--output", help="Arquivo JSON de resultados (padrão: data/eval/retrieval_<commit>_<data>.json)")
+    parser.add_argument("--baseline", help="JSON de uma execução anterior para comparar")
+    parser.add_argument("--max-drop", type=float, default=0.02, help="Queda máxima tolerada de recall/MRR em relação ao baseline")
+    parser.add_argument("--verbose", action="store_true", help="Manter logs INFO de cada busca")
+    args = parser.parse_args(argv)
+    
+    golden = load_golden_set(Path(args.golden))
+    domains = [args.domain] if args.domain else list(golden.domains)
+    unknown = [domain for domain in domains if domain not in golden.domains]
+    if unknown:
+        parser.error(f"domínio sem perguntas no golden set {golden.version}: {', '.join(unknown)}")
+    if args.corpus and len(domains) != 1:
+        parser.error("--corpus requer --domain")
+    
+    top_ks = sorted(_parse_list(args.top_k, int))
+    min_scores = sorted(_parse_list(args.min_score, float))
+    
+    if not args.verbose:
+        logging.getLogger().setLevel(logging.WARNING)
+    
+    from qdrant_client import QdrantClient
+    from app.bench import git_commit
+    from app.rag.vector_store import VectorStore
+    
+    # Modo --corpus: as coleções avaliadas são criadas em Qdrant embutido
+    vector_store = VectorStore(client=QdrantClient(":memory:") if args.corpus else None)
+    cache = EmbeddingCache(vector_store, Path(args.cache_dir))
+    
+    reports = []
+    for domain in domains:
+        questions = golden.domains[domain]
+        if args.corpus:
+            documents = load_corpus_documents(Path(args.corpus), domain)
+            domain_reports = evaluate_corpus(
+                vector_store, cache, documents, questions,
+                _parse_list(args.chunk_tokens, int), _parse_list(args.dims, int), top_ks, min_scores
+            )
+        else:
+            domain_reports = [evaluate_collection(vector_store, cache, args.collection or domain, questions, top_ks, min_scores)]
+        for report in domain_reports:
+            report["domain"] = domain
+            print_report(domain, report, settings)
+        reports.extend(domain_reports)
+    
+    print(f"\n* configuração atual (TOP_K_RESULTS={settings.top_k_results}, MIN_SIMILARITY_SCORE={settings.min_similarity_score})")
+    print(f"Embeddings: {cache.hits} do cache, {cache.misses} calculados ({cache.path})")
+    
+    commit = git_commit()
+    results = {
+        "commit": commit,
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "golden_version": golden.version,
+        "embedding_model": vector_store.embedding_model,
+        "config": vars(args),
+        "reports": reports,
+    }
+    output = Path(args.output) if args.output else (
+        Path("data/eval") / f"retrieval_{commit or 'local'}_{datetime.now().strftime('%Y%m%d%H%M%S')}.json"
+    )
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    print(f"Resultados: {output}")
+    
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("golden_version") != golden.version:
+            print(f"\n⚠️  Baseline usa o golden set {baseline.get('golden_version')} (atual: {golden.version}); comparação ignorada")
+            return 0
+        regressions = compare_with_baseline(results, baseline, args.max_drop)
+        if regressions:
+            print(f"\n❌ Qualidade caiu em relação a {baseline.get('commit') or 'baseline'} (tolerância {args.max_drop}):")
+            for line in regressions:
+                print(f"    {line}")
+            return 1
+        print(f"\n✅ Sem queda de recall/MRR em relação a {baseline.get('commit') or 'baseline'}")
+    return 0
+
+
+if __name__ == "__main__":
+    # Configurar encoding para Windows
+    if sys.platform == "win32":
+        sys.stdout.reconfigure(encoding='utf-8')
+    sys.exit(main())
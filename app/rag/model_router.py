@@ -0,0 +1,218 @@
+"""
+Roteamento de modelos do LLM: fallback ordenado, timeout por modelo e
+requisição hedged.
+
+LLM_MODELS="gpt-4o-mini:15:hedge,gpt-4o:25" define a ordem dos modelos, com
+o timeout (segundos) de cada um e se ele aceita hedge. Vazio = só LLM_MODEL
+com LLM_TIMEOUT_SECONDS.
+
+- Cada modelo recebe min(timeout do modelo, tempo restante até o prazo da
+  consulta); o último da lista recebe todo o tempo restante
+- Timeout, rate limit persistente, 5xx, erro de rede ou modelo indisponível
+  (404/403) passam para o próximo modelo
+- Hedge: se a resposta do modelo não chegou no p95 das latências recentes
+  dele, uma segunda requisição igual é enviada e vale a primeira que
+  responder. A perdedora não é cancelada (o cliente OpenAI é síncrono) e
+  termina no próprio timeout HTTP
+- Sem tempo para nenhum modelo: DeadlineExceeded (nunca espera além do prazo)
+"""
+import contextvars
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Deque, Dict, List, Optional, Tuple
+from openai import APITimeoutError, NotFoundError, PermissionDeniedError, RateLimitError
+from app.config import get_settings
+from app.rag.openai_gateway import RETRYABLE_ERRORS, get_openai_gateway
+from app.utils.deadline import Deadline, DeadlineExceeded
+from app.utils.logger import get_logger
+from app.utils.metrics import record_llm_fallback, record_llm_hedge
+
+logger = get_logger(__name__)
+
+# Abaixo disso não vale enviar uma requisição ao LLM
+MIN_ATTEMPT_SECONDS = 0.5
+
+FALLBACK_ERRORS = RETRYABLE_ERRORS + (NotFoundError, PermissionDeniedError, DeadlineExceeded)
+
+
+@dataclass
+class ModelPolicy:
+    """Modelo da lista de fallback com seu timeout e política de hedge"""
+    name: str
+    timeout: float
+    hedge: bool = False
+
+
+def parse_model_policies(value: str, default_model: str, default_timeout: float) -> List[ModelPolicy]:
+    """"gpt-4o-mini:15:hedge,gpt-4o:25" -> [ModelPolicy, ...]"""
+    policies = []
+    for item in (value or "").split(","):
+        parts = [part.strip() for part in item.split(":")]
+        if not parts[0]:
+            continue
+        timeout = default_timeout
+        if len(parts) > 1 and parts[1]:
+            try:
+                timeout = float(parts[1])
+            except ValueError:
+                logger.warning("Timeout de modelo inválido ignorado", item=item)
+        policies.append(ModelPolicy(name=parts[0], timeout=timeout, hedge="hedge" in parts[2:]))
+    return policies or [ModelPolicy(name=default_model, timeout=default_timeout)]
+
+
+def _fallback_reason(error: Exception) -> str:
+    if isinstance(error, DeadlineExceeded) and error.__cause__ is not None:
+        # Gateway desistiu de retentar por falta de tempo: vale o erro original
+        error = error.__cause__
+    if isinstance(error, (DeadlineExceeded, APITimeoutError)):
+        return "timeout"
+    if isinstance(error, RateLimitError):
+        return "rate_limit"
+    if isinstance(error, (NotFoundError, PermissionDeniedError)):
+        return "unavailable"
+    return "error"
+
+
+class LatencyTracker:
+    """Latências recentes (sucessos) por modelo para o prazo do hedge"""
+    
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        self.window = window
+        self.min_samples = min_samples
+        self._samples: Dict[str, Deque[float]] = {}
+        self._lock = threading.Lock()
+    
+    def record(self, model: str, seconds: float):
+        with self._lock:
+            self._samples.setdefault(model, deque(maxlen=self.window)).append(seconds)
+    
+    def p95(self, model: str) -> Optional[float]:
+        """None enquanto não houver amostras suficientes"""
+        with self._lock:
+            samples = sorted(self._samples.get(model, ()))
+        if len(samples) < self.min_samples:
+            return None
+        return samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+
+
+class ModelRouter:
+    """Chat completions com fallback entre modelos dentro do prazo da consulta"""
+    
+    def __init__(self, policies: List[ModelPolicy], gateway=None, hedge_min_samples: int = 20, max_workers: int = 16):
+        self.policies = policies
+        self.gateway = gateway or get_openai_gateway()
+        self.latency = LatencyTracker(min_samples=hedge_min_samples)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._max_workers = max_workers
+        self._lock = threading.Lock()
+    
+    @property
+    def primary_model(self) -> str:
+        return self.policies[0].name
+    
+    def complete(self, client, deadline: Deadline, **kwargs) -> Tuple[object, str]:
+        """
+        client.chat.completions.create(model=..., **kwargs) no primeiro modelo
+        que responder antes do prazo.
+        
+        Returns:
+            (resposta, modelo usado)
+        """
+        last_error: Optional[Exception] = None
+        for index, policy in enumerate(self.policies):
+            if deadline.remaining() < MIN_ATTEMPT_SECONDS:
+                break
+            is_last = index == len(self.policies) - 1
+            attempt_deadline = deadline if is_last else deadline.child(policy.timeout)
+            try:
+                return self._complete_model(client, policy, attempt_deadline, kwargs), policy.name
+            except FALLBACK_ERRORS as e:
+                if isinstance(e, RateLimitError) and getattr(e, "code", None) == "insufficient_quota":
+                    # Cota da conta vale para todos os modelos
+                    raise
+                last_error = e
+                reason = _fallback_reason(e)
+                record_llm_fallback(policy.name, reason)
+                logger.warning(
+                    "Modelo do LLM falhou",
+                    model=policy.name,
+                    reason=reason,
+                    error_type=type(e).__name__,
+                    next_model=None if is_last else self.policies[index + 1].name,
+                    remaining_seconds=round(deadline.remaining(), 2)
+                )
+        else:
+            # Todos os modelos falharam antes do prazo: erro real, não timeout
+            if last_error is not None and not isinstance(last_error, (DeadlineExceeded, APITimeoutError)):
+                raise last_error
+        raise DeadlineExceeded("Prazo da consulta esgotado antes de uma resposta do LLM", stage="llm") from last_error
+    
+    def _complete_model(self, client, policy: ModelPolicy, deadline: Deadline, kwargs: Dict):
+        hedge_after = self.latency.p95(policy.name) if policy.hedge else None
+        if hedge_after is None or hedge_after >= deadline.remaining():
+            return self._timed_call(client, policy.name, deadline, kwargs)
+        
+        executor = self._get_executor()
+        primary = executor.submit(contextvars.copy_context().run, self._timed_call, client, policy.name, deadline, kwargs)
+        done, _ = wait([primary], timeout=hedge_after)
+        if done:
+            return primary.result()
+        
+        logger.info("Enviando requisição hedged ao LLM", model=policy.name, hedge_after=round(hedge_after, 3))
+        hedged = executor.submit(contextvars.copy_context().run, self._timed_call, client, policy.name, deadline, kwargs)
+        pending = {primary: "primary", hedged: "hedge"}
+        error: Optional[BaseException] = None
+        while pending:
+            done, _ = wait(list(pending), timeout=deadline.remaining(), return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            for future in done:
+                winner = pending.pop(future)
+                if future.exception() is None:
+                    record_llm_hedge(policy.name, winner)
+                    return future.result()
+                error = future.exception()
+        
+        record_llm_hedge(policy.name, "none")
+        if error is not None and not pending:
+            raise error
+        raise DeadlineExceeded(f"Timeout do modelo {policy.name} (com hedge)", stage="llm")
+    
+    def _timed_call(self, client, model: str, deadline: Deadline, kwargs: Dict):
+        started = time.monotonic()
+        response = self.gateway.chat(client, deadline=deadline, model=model, **kwargs)
+        self.latency.record(model, time.monotonic() - started)
+        return response
+    
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self._max_workers, thread_name_prefix="llm-hedge")
+            return self._executor
+
+
+_router_instance: Optional[ModelRouter] = None
+_router_lock = threading.Lock()
+
+
+def get_model_router() -> ModelRouter:
+    """Roteador único por processo (latências e pool de hedge compartilhados)"""
+    global _router_instance
+    if _router_instance is None:
+        with _router_lock:
+            if _router_instance is None:
+                settings = get_settings()
+                policies = parse_model_policies(settings.llm_models, settings.llm_model, settings.llm_timeout_seconds)
+                logger.info(
+                    "Roteador de modelos do LLM",
+                    models=[f"{p.name}:{p.timeout:g}{':hedge' if p.hedge else ''}" for p in policies]
+                )
+                _router_instance = ModelRouter(
+                    policies,
+                    hedge_min_samples=settings.llm_hedge_min_samples,
+                    max_workers=get_openai_gateway().max_concurrency * 2
+                )
+    return _router_instance
@@ -0,0 +1,466 @@
+"""
+Gateway único para chamadas à OpenAI (chat e embeddings).
+
+Todas as chamadas do processo (consultas da API, busca, ingestão, avaliação)
+passam por aqui, para que os workers não disparem contra a API ao mesmo tempo:
+
+- limite de concorrência (quem espera fica na fila, rag_openai_queue_seconds):
+  - OPENAI_CONCURRENCY_BACKEND=memory (padrão): semáforo por processo com
+    OPENAI_MAX_CONCURRENCY / OPENAI_PROCESSES vagas (mínimo 1). Com mais
+    processos que vagas o total passa do configurado (o gunicorn avisa)
+  - OPENAI_CONCURRENCY_BACKEND=redis: semáforo compartilhado no Redis
+    (RATE_LIMIT_REDIS_URL) com OPENAI_MAX_CONCURRENCY vagas para todos os
+    processos - API, sincronização e CLI; vagas de processos que morreram
+    expiram em OPENAI_SLOT_LEASE_SECONDS. Redis indisponível: cai para o
+    semáforo local
+- orçamento por modelo: requisições e tokens restantes lidos dos headers
+  x-ratelimit-remaining-* / x-ratelimit-reset-* de cada resposta; sem
+  orçamento, a chamada espera o reset em vez de receber um 429. Os headers
+  refletem a conta toda, então com N processos cada reserva desconta N x a
+  estimativa (os outros workers consomem em paralelo até a próxima resposta)
+- 429: espera o Retry-After (retry-after-ms / retry-after) do servidor; sem
+  header, backoff exponencial com jitter (full jitter). Retry-After maior que
+  OPENAI_MAX_WAIT_SECONDS (ou que o prazo) falha na hora com o erro de rate
+  limit: retentar antes só ganharia outro 429. Falhas de rede, timeouts e
+  5xx também são retentadas; cota esgotada (insufficient_quota) não
+- as retentativas são só do gateway: os clientes OpenAI são criados com
+  max_retries=0
+
+Com deadline (app.utils.deadline), fila, esperas e retentativas param no
+prazo: a chamada falha com DeadlineExceeded em vez de esperar além dele, e o
+timeout HTTP é o tempo restante.
+
+Clientes sem with_raw_response (ex: embedders falsos de benchmark) funcionam,
+apenas sem leitura de headers.
+"""
+import random
+import re
+import threading
+import time
+import uuid
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+from openai import APIConnectionError, APITimeoutError, InternalServerError, RateLimitError
+from app.config import get_settings
+from app.utils.deadline import Deadline, DeadlineExceeded
+from app.utils.logger import get_logger
+from app.utils.metrics import OPENAI_IN_FLIGHT, OPENAI_QUEUE_DURATION, record_rate_limit_retry, record_usage
+
+logger = get_logger(__name__)
+
+# Redis (opcional): semáforo compartilhado entre processos
+try:
+    import redis
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+
+RETRYABLE_ERRORS = (RateLimitError, APITimeoutError, APIConnectionError, InternalServerError)
+
+# Backoff sem Retry-After: 1s, 2s, 4s... (teto de 20s), sorteado em [0, teto]
+BACKOFF_BASE_SECONDS = 1.0
+BACKOFF_MAX_SECONDS = 20.0
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+_DURATION_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+
+def parse_reset(value: Optional[str]) -> Optional[float]:
+    """Duração dos headers x-ratelimit-reset-* ("1s", "6m0s", "20ms") em segundos"""
+    if not value:
+        return None
+    parts = _DURATION_PART.findall(value)
+    if not parts:
+        return None
+    return sum(float(number) * _DURATION_UNITS[unit] for number, unit in parts)
+
+
+def parse_retry_after(headers) -> Optional[float]:
+    """Espera pedida pelo servidor: retry-after-ms, retry-after (segundos ou data HTTP)"""
+    if headers is None:
+        return None
+    value = headers.get("retry-after-ms")
+    if value:
+        try:
+            return float(value) / 1000
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+
+def _int_header(headers, name: str) -> Optional[int]:
+    try:
+        return int(headers.get(name))
+    except (TypeError, ValueError):
+        return None
+
+
+class _HeaderBucket:
+    """
+    Estado de um limite (requisições ou tokens) segundo os headers.
+    
+    x-ratelimit-reset-* é o tempo até o limite voltar ao valor inicial; a
+    reposição é contínua, então o bucket enche linearmente até lá.
+    """
+    
+    def __init__(self):
+        self.limit: Optional[int] = None
+        self.remaining: Optional[float] = None
+        self.rate: Optional[float] = None  # unidades repostas por segundo
+        self.reset_at = 0.0
+        self.updated = 0.0
+    
+    def update(self, limit: Optional[int], remaining: int, reset: float, now: float):
+        self.limit = limit or self.limit
+        self.remaining = float(remaining)
+        self.reset_at = now + reset
+        self.updated = now
+        if self.limit and reset > 0 and self.limit > remaining:
+            self.rate = (self.limit - remaining) / reset
+    
+    def available(self, now: float) -> Optional[float]:
+        if self.remaining is None:
+            return None
+        if self.rate:
+            value = self.remaining + (now - self.updated) * self.rate
+            return min(float(self.limit), value) if self.limit else value
+        if now >= self.reset_at and self.limit:
+            return float(self.limit)
+        return self.remaining
+    
+    def wait_for(self, amount: float, now: float) -> float:
+        value = self.available(now)
+        if value is None or value >= amount:
+            return 0.0
+        if self.rate:
+            return (amount - value) / self.rate
+        return max(0.0, self.reset_at - now)
+    
+    def consume(self, amount: float, now: float):
+        value = self.available(now)
+        if value is not None:
+            self.remaining = value - amount
+            self.updated = now
+
+
+class RateLimitBudget:
+    """
+    Requisições e tokens restantes de um modelo, segundo os headers da OpenAI.
+    
+    Entre respostas, cada chamada liberada desconta a sua estimativa, para que
+    chamadas concorrentes não usem todas o mesmo "remaining" desatualizado.
+    """
+    
+    def __init__(self, processes: int = 1):
+        self.processes = max(1, processes)
+        self.requests = _HeaderBucket()
+        self.tokens = _HeaderBucket()
+        self._lock = threading.Lock()
+    
+    def update(self, headers, now: Optional[float] = None):
+        if headers is None:
+            return
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            for kind, bucket in (("requests", self.requests), ("tokens", self.tokens)):
+                remaining = _int_header(headers, f"x-ratelimit-remaining-{kind}")
+                if remaining is None:
+                    continue
+                reset = parse_reset(headers.get(f"x-ratelimit-reset-{kind}")) or 0.0
+                bucket.update(_int_header(headers, f"x-ratelimit-limit-{kind}"), remaining, reset, now)
+    
+    def reserve(self, tokens: int, now: Optional[float] = None) -> float:
+        """Desconta uma requisição de `tokens`; se não houver orçamento, retorna quanto esperar"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            # Parte deste processo: os demais gastam o mesmo orçamento em paralelo
+            requests = self.processes
+            tokens = tokens * self.processes
+            if self.requests.limit:
+                requests = min(requests, self.requests.limit)
+            if self.tokens.limit:
+                # Prompt maior que o limite por minuto: esperar o bucket cheio basta
+                tokens = min(tokens, self.tokens.limit)
+            wait = max(self.requests.wait_for(requests, now), self.tokens.wait_for(tokens, now))
+            if wait > 0:
+                return wait
+            self.requests.consume(requests, now)
+            self.tokens.consume(tokens, now)
+            return 0.0
+
+
+class LocalSlots:
+    """Vagas de concorrência do processo (threading.BoundedSemaphore)"""
+    
+    def __init__(self, limit: int):
+        self.limit = limit
+        self._semaphore = threading.BoundedSemaphore(limit)
+    
+    def acquire(self, timeout: Optional[float] = None) -> Optional[object]:
+        """Token da vaga, ou None se não conseguiu até o timeout"""
+        return True if self._semaphore.acquire(timeout=timeout) else None
+    
+    def release(self, token: object):
+        self._semaphore.release()
+
+
+# Vaga com prazo (lease) num sorted set: score = instante em que expira
+_REDIS_ACQUIRE_SLOT = """
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', ARGV[2])
+if redis.call('ZCARD', KEYS[1]) < tonumber(ARGV[1]) then
+    redis.call('ZADD', KEYS[1], ARGV[3], ARGV[4])
+    redis.call('EXPIRE', KEYS[1], math.ceil(tonumber(ARGV[5])) + 1)
+    return 1
+end
+return 0
+"""
+
+
+class RedisSlots:
+    """
+    Vagas de concorrência compartilhadas por todos os processos (Redis).
+    
+    Cada vaga é um membro de um sorted set com o instante em que expira: um
+    processo que morre segurando vagas as perde após lease_seconds. Com o
+    Redis fora do ar, usa as vagas locais (fallback) em vez de travar as
+    chamadas.
+    """
+    
+    def __init__(self, url: str, limit: int, lease_seconds: float, fallback: LocalSlots, key: str = "openai:slots"):
+        if not REDIS_AVAILABLE:
+            raise RuntimeError("OPENAI_CONCURRENCY_BACKEND=redis requer o pacote redis (pip install redis)")
+        self.limit = limit
+        self.lease_seconds = lease_seconds
+        self.fallback = fallback
+        self.key = key
+        self._client = redis.Redis.from_url(url)
+        self._script = self._client.register_script(_REDIS_ACQUIRE_SLOT)
+        self._random = random.Random()
+    
+    def _try_acquire(self, token: str) -> bool:
+        now = time.time()
+        acquired = self._script(
+            keys=[self.key],
+            args=[self.limit, now, now + self.lease_seconds, token, self.lease_seconds]
+        )
+        return bool(int(acquired))
+    
+    def acquire(self, timeout: Optional[float] = None) -> Optional[object]:
+        token = uuid.uuid4().hex
+        give_up_at = None if timeout is None else time.monotonic() + timeout
+        while True:
+            try:
+                if self._try_acquire(token):
+                    return token
+            except redis.RedisError as e:
+                logger.warning("Semáforo da OpenAI no Redis indisponível, usando limite local", error=str(e))
+                remaining = None if give_up_at is None else max(0.0, give_up_at - time.monotonic())
+                local = self.fallback.acquire(timeout=remaining)
+                return None if local is None else ("local", local)
+            if give_up_at is not None and time.monotonic() >= give_up_at:
+                return None
+            # Polling com jitter: processos esperando não batem no Redis juntos
+            pause = 0.02 + 0.03 * self._random.random()
+            if give_up_at is not None:
+                pause = min(pause, max(0.0, give_up_at - time.monotonic()))
+            time.sleep(pause)
+    
+    def release(self, token: object):
+        if isinstance(token, tuple):
+            self.fallback.release(token[1])
+            return
+        try:
+            self._client.zrem(self.key, token)
+        except redis.RedisError as e:
+            # A vaga expira sozinha após lease_seconds
+            logger.warning("Falha ao liberar vaga da OpenAI no Redis", error=str(e))
+
+
+def estimate_tokens(text_length: int) -> int:
+    """Estimativa barata (~4 caracteres por token), sem carregar o tiktoken na API"""
+    return max(1, text_length // 4)
+
+
+class OpenAIGateway:
+    """Concorrência, orçamento de rate limit e retentativas das chamadas à OpenAI"""
+    
+    def __init__(
+        self,
+        max_concurrency: int = 8,
+        max_retries: int = 5,
+        max_wait_seconds: float = 30.0,
+        processes: int = 1,
+        slots=None
+    ):
+        """
+        max_concurrency é o total entre `processes` processos com gateway
+        próprio; com `slots` compartilhados (RedisSlots) o limite já é global.
+        """
+        self.processes = max(1, processes)
+        self.max_concurrency = slots.limit if slots is not None else max(1, max_concurrency // self.processes)
+        self.max_retries = max_retries
+        self.max_wait_seconds = max_wait_seconds
+        self._slots = slots or LocalSlots(self.max_concurrency)
+        self._budgets: Dict[str, RateLimitBudget] = {}
+        self._budgets_lock = threading.Lock()
+        self._random = random.Random()
+    
+    def budget(self, model: str) -> RateLimitBudget:
+        with self._budgets_lock:
+            if model not in self._budgets:
+                self._budgets[model] = RateLimitBudget(self.processes)
+            return self._budgets[model]
+    
+    def chat(self, client, deadline: Optional[Deadline] = None, **kwargs):
+        """client.chat.completions.create(**kwargs) pelo gateway"""
+        characters = sum(len(str(message.get("content") or "")) for message in kwargs.get("messages", []))
+        # max_tokens conta no limite de tokens por minuto desde o envio
+        tokens = estimate_tokens(characters) + (kwargs.get("max_tokens") or 0)
+        return self._call("chat", "llm", client.chat.completions, tokens, kwargs, deadline)
+    
+    def embeddings(self, client, deadline: Optional[Deadline] = None, **kwargs):
+        """client.embeddings.create(**kwargs) pelo gateway"""
+        inputs = kwargs.get("input")
+        characters = sum(len(text) for text in inputs) if isinstance(inputs, list) else len(str(inputs or ""))
+        return self._call("embeddings", "embeddings", client.embeddings, estimate_tokens(characters), kwargs, deadline)
+    
+    def _call(self, kind: str, service: str, resource, tokens: int, kwargs: Dict, deadline: Optional[Deadline] = None):
+        model = kwargs.get("model", "")
+        attempt = 0
+        while True:
+            try:
+                response = self._attempt(kind, model, resource, tokens, kwargs, deadline)
+                record_usage(model, response)
+                return response
+            except RETRYABLE_ERRORS as e:
+                if isinstance(e, RateLimitError) and getattr(e, "code", None) == "insufficient_quota":
+                    logger.error("Cota da OpenAI esgotada", kind=kind, model=model)
+                    raise
+                if attempt >= self.max_retries:
+                    logger.error("Falha na OpenAI após múltiplas tentativas", kind=kind, model=model, attempts=attempt + 1, error=str(e))
+                    raise
+                
+                headers = getattr(getattr(e, "response", None), "headers", None)
+                self.budget(model).update(headers)
+                retry_after = parse_retry_after(headers)
+                if retry_after is not None and retry_after > self.max_wait_seconds:
+                    # Retentar antes do pedido pelo servidor só gasta tentativas com novos 429
+                    logger.error(
+                        "Retry-After da OpenAI acima da espera máxima, desistindo",
+                        kind=kind,
+                        model=model,
+                        retry_after=round(retry_after, 3),
+                        max_wait_seconds=self.max_wait_seconds
+                    )
+                    raise
+                wait = self._retry_wait(retry_after, attempt)
+                if deadline is not None and wait >= deadline.remaining():
+                    logger.warning("Sem tempo para nova tentativa na OpenAI", kind=kind, model=model, attempt=attempt + 1, error_type=type(e).__name__)
+                    raise DeadlineExceeded(f"Prazo esgotado após {type(e).__name__} na OpenAI ({kind})") from e
+                if isinstance(e, RateLimitError):
+                    record_rate_limit_retry(service)
+                logger.warning(
+                    "Erro na OpenAI, aguardando nova tentativa",
+                    kind=kind,
+                    model=model,
+                    attempt=attempt + 1,
+                    wait_seconds=round(wait, 3),
+                    error_type=type(e).__name__
+                )
+                time.sleep(wait)
+                attempt += 1
+    
+    def _attempt(self, kind: str, model: str, resource, tokens: int, kwargs: Dict, deadline: Optional[Deadline]):
+        queued = time.perf_counter()
+        slot = self._slots.acquire(timeout=None if deadline is None else deadline.remaining())
+        if slot is None:
+            OPENAI_QUEUE_DURATION.labels(kind=kind).observe(time.perf_counter() - queued)
+            raise DeadlineExceeded(f"Prazo esgotado na fila do gateway OpenAI ({kind})")
+        try:
+            self._wait_for_budget(model, tokens, deadline)
+            OPENAI_QUEUE_DURATION.labels(kind=kind).observe(time.perf_counter() - queued)
+            
+            OPENAI_IN_FLIGHT.labels(kind=kind).inc()
+            try:
+                raw = getattr(resource, "with_raw_response", None)
+                if raw is None:
+                    return resource.create(**kwargs)
+                if deadline is not None:
+                    # Timeout HTTP = tempo restante até o prazo
+                    kwargs = {**kwargs, "timeout": max(0.001, deadline.remaining())}
+                response = raw.create(**kwargs)
+                self.budget(model).update(response.headers)
+                return response.parse()
+            finally:
+                OPENAI_IN_FLIGHT.labels(kind=kind).dec()
+        finally:
+            self._slots.release(slot)
+    
+    def _wait_for_budget(self, model: str, tokens: int, deadline: Optional[Deadline] = None):
+        budget = self.budget(model)
+        waited = 0.0
+        while True:
+            wait = budget.reserve(tokens)
+            if wait <= 0:
+                return
+            if deadline is not None and wait >= deadline.remaining():
+                raise DeadlineExceeded(f"Orçamento de rate limit de {model} só volta após o prazo")
+            if waited >= self.max_wait_seconds:
+                # Orçamento local pode estar desatualizado: o servidor decide (429 + Retry-After)
+                logger.warning("Orçamento de rate limit esgotado, enviando mesmo assim", model=model, waited_seconds=round(waited, 3))
+                return
+            # Jitter: workers que esperam o mesmo reset não voltam todos juntos
+            wait = min(wait * (1 + 0.1 * self._random.random()), self.max_wait_seconds - waited)
+            time.sleep(wait)
+            waited += wait
+    
+    def _retry_wait(self, retry_after: Optional[float], attempt: int) -> float:
+        if retry_after is not None:
+            # Nunca antes do pedido pelo servidor; jitter só para depois
+            return retry_after * (1 + 0.1 * self._random.random())
+        ceiling = min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * (2 ** attempt))
+        return self._random.uniform(0, ceiling)
+
+
+_gateway_instance: Optional[OpenAIGateway] = None
+_gateway_lock = threading.Lock()
+
+
+def get_openai_gateway() -> OpenAIGateway:
+    global _gateway_instance
+    if _gateway_instance is None:
+        with _gateway_lock:
+            if _gateway_instance is None:
+                settings = get_settings()
+                processes = settings.openai_processes or 1
+                slots = None
+                if settings.openai_concurrency_backend == "redis":
+                    slots = RedisSlots(
+                        settings.rate_limit_redis_url,
+                        limit=max(1, settings.openai_max_concurrency),
+                        lease_seconds=settings.openai_slot_lease_seconds,
+                        fallback=LocalSlots(max(1, settings.openai_max_concurrency // processes))
+                    )
+                _gateway_instance = OpenAIGateway(
+                    max_concurrency=settings.openai_max_concurrency,
+                    max_retries=settings.openai_max_retries,
+                    max_wait_seconds=settings.openai_max_wait_seconds,
+                    processes=processes,
+                    slots=slots
+                )
+                logger.info(
+                    "Gateway OpenAI",
+                    max_concurrency=_gateway_instance.max_concurrency,
+                    processes=_gateway_instance.processes,
+                    backend=settings.openai_concurrency_backend
+                )
+    return _gateway_instance
@@ -1,13 +1,33 @@
-from typing import List, Optional
+from typing import List, Optional, TYPE_CHECKING
 from qdrant_client import QdrantClient
-from qdrant_client.models import Distance, VectorParams, PointStruct
+from qdrant_client.models import (
+    Distance,
+    VectorParams,
+    PointStruct,
+    CreateAlias,
+    CreateAliasOperation,
+    DeleteAlias,
+    DeleteAliasOperation,
+    FieldCondition,
+    Filter,
+    FilterSelector,
+    MatchValue,
+    PointIdsList,
+)
 import uuid
-import time
-from app.models.schemas import DocumentChunk, Metadata
+from datetime import datetime
+from app.models.records import ChunkRecord
 from app.config import get_settings
+from app.utils.deadline import Deadline, DeadlineExceeded
 from app.utils.logger import get_logger
-from openai import OpenAI, RateLimitError
-import tenacity
+from app.utils.metrics import observe_stage
+from app.utils.tracing import span
+from app.rag.openai_gateway import get_openai_gateway
+from openai import OpenAI
+
+if TYPE_CHECKING:
+    from app.ingestion.checkpoint import IngestionJournal
+    from app.ingestion.progress import IngestionProgress
 
 logger = get_logger(__name__)
 
@@ -15,11 +35,26 @@ logger = get_logger(__name__)
 class VectorStore:
     """Gerenciador do Qdrant para armazenamento vetorial"""
     
-    def __init__(self):
+    def __init__(self, client: Optional[QdrantClient] = None, openai_client=None):
+        """
+        Args:
+            client: Cliente Qdrant já configurado (ex: QdrantClient(":memory:")
+                em benchmarks); padrão: conexão definida em settings
+            openai_client: Cliente de embeddings com a interface do OpenAI
+                (ex: embedder falso no profiling); padrão: OpenAI(OPENAI_API_KEY)
+        """
         settings = get_settings()
-        if not settings.openai_api_key:
+        if openai_client is None and not settings.openai_api_key:
             raise ValueError("OPENAI_API_KEY não configurada. Configure a variável de ambiente.")
         
+        self.client = client if client is not None else self._connect(settings)
+        # Retentativas ficam no gateway (Retry-After + orçamento compartilhado)
+        self.openai_client = openai_client or OpenAI(api_key=settings.openai_api_key, max_retries=0)
+        self.embedding_model = settings.embedding_model
+        self.settings = settings
+    
+    @staticmethod
+    def _connect(settings) -> QdrantClient:
         # Configurar Qdrant com API key se disponível
         is_cloud = "cloud.qdrant.io" in settings.qdrant_host or "gcp.cloud.qdrant.io" in settings.qdrant_host
         
@@ -84,13 +119,13 @@ class VectorStore:
             host=settings.qdrant_host
         )
         
-        self.client = QdrantClient(**qdrant_kwargs)
+        client = QdrantClient(**qdrant_kwargs)
         
         # Testar conexão se for Cloud
         if is_cloud:
             try:
                 # Tentar uma operação simples para validar autenticação
-                self.client.get_collections()
+                client.get_collections()
                 logger.info("Conexão com Qdrant Cloud validada com sucesso")
             except Exception as e:
                 logger.error(
@@ -102,32 +137,38 @@ class VectorStore:
                     f"Falha na autenticação com Qdrant Cloud: {str(e)}\n"
                     "Verifique se QDRANT_API_KEY está correta no arquivo .env"
                 )
-        self.openai_client = OpenAI(api_key=settings.openai_api_key)
-        self.embedding_model = settings.embedding_model
-        self.settings = settings
+        return client
     
     def ensure_collection(self, collection_name: str):
-        """Cria coleção se não existir"""
+        """Cria coleção se não existir (aliases blue/green contam como existentes)"""
         try:
             collections = self.client.get_collections().collections
             collection_names = [c.name for c in collections]
             
-            if collection_name not in collection_names:
-                # Criar coleção
-                self.client.create_collection(
-                    collection_name=collection_name,
-                    vectors_config=VectorParams(
-                        size=3072,  # text-embedding-3-large
-                        distance=Distance.COSINE
-                    )
+            if collection_name in collection_names:
+                logger.info("Coleção já existe", collection=collection_name)
+            elif self.get_alias_target(collection_name):
+                logger.info(
+                    "Coleção já existe (alias)",
+                    collection=collection_name,
+                    target=self.get_alias_target(collection_name)
                 )
-                logger.info("Coleção criada", collection=collection_name)
             else:
-                logger.info("Coleção já existe", collection=collection_name)
+                self._create_collection(collection_name)
         except Exception as e:
             logger.error("Erro ao criar coleção", collection=collection_name, error=str(e))
             raise
     
+    def _create_collection(self, collection_name: str):
+        self.client.create_collection(
+            collection_name=collection_name,
+            vectors_config=VectorParams(
+                size=3072,  # text-embedding-3-large
+                distance=Distance.COSINE
+            )
+        )
+        logger.info("Coleção criada", collection=collection_name)
+    
     def delete_collection(self, collection_name: str):
         """Deleta coleção"""
         try:
@@ -136,67 +177,187 @@ class VectorStore:
         except Exception as e:
             logger.warning("Erro ao deletar coleção (pode não existir)", collection=collection_name, error=str(e))
     
-    @tenacity.retry(
-        wait=tenacity.wait_exponential(multiplier=1, min=1, max=16),
-        stop=tenacity.stop_after_attempt(5),
-        retry=tenacity.retry_if_exception_type(RateLimitError),
-        before_sleep=tenacity.before_sleep_log(logger, "info"),
-        reraise=True
-    )
-    def _get_embedding_with_retry(self, text: str) -> List[float]:
-        """Tenta obter embedding com retry em caso de RateLimitError."""
-        response = self.openai_client.embeddings.create(
+    # Blue/green: cada reindexação completa é construída em uma coleção versionada
+    # (ex: pix_v20261017093000) e publicada trocando o alias "pix" atomicamente.
+    # search() e get_collection_info() leem através do alias.
+    
+    def get_alias_target(self, alias_name: str) -> Optional[str]:
+        """Retorna a coleção apontada pelo alias, ou None"""
+        try:
+            aliases = self.client.get_aliases().aliases
+        except Exception as e:
+            logger.warning("Erro ao listar aliases", alias=alias_name, error=str(e))
+            return None
+        for alias in aliases:
+            if alias.alias_name == alias_name:
+                return alias.collection_name
+        return None
+    
+    def list_versions(self, domain: str) -> List[str]:
+        """Coleções versionadas do domínio, da mais antiga para a mais recente"""
+        prefix = f"{domain}_v"
+        names = [
+            c.name for c in self.client.get_collections().collections
+            if c.name.startswith(prefix) and c.name[len(prefix):].isdigit()
+        ]
+        return sorted(names)
+    
+    def create_versioned_collection(self, domain: str) -> str:
+        """Cria coleção sombra para reindexação completa do domínio"""
+        name = f"{domain}_v{datetime.now().strftime('%Y%m%d%H%M%S')}"
+        self._create_collection(name)
+        return name
+    
+    def find_unpublished_version(self, domain: str) -> Optional[str]:
+        """Última coleção sombra mais nova que a publicada (reindexação interrompida)"""
+        current = self.get_alias_target(domain)
+        versions = self.list_versions(domain)
+        if not versions or versions[-1] == current:
+            return None
+        if current and versions[-1] < current:
+            return None
+        return versions[-1]
+    
+    def discard_unpublished_versions(self, domain: str):
+        """Remove coleções sombra de reindexações interrompidas"""
+        current = self.get_alias_target(domain)
+        for name in self.list_versions(domain):
+            if current is None or name > current:
+                logger.info("Removendo versão não publicada", domain=domain, collection=name)
+                self.delete_collection(name)
+    
+    def publish_version(self, domain: str, collection_name: str):
+        """Aponta o alias do domínio para a coleção versionada (troca atômica)"""
+        operations = []
+        current = self.get_alias_target(domain)
+        
+        if current:
+            operations.append(DeleteAliasOperation(delete_alias=DeleteAlias(alias_name=domain)))
+        else:
+            # Migração: coleção física com o nome do domínio (antes do blue/green)
+            # precisa ser removida para o nome poder virar alias
+            legacy = [c.name for c in self.client.get_collections().collections]
+            if domain in legacy:
+                logger.warning(
+                    "Removendo coleção legada para criar alias",
+                    collection=domain,
+                    new_version=collection_name
+                )
+                self.client.delete_collection(domain)
+        
+        operations.append(CreateAliasOperation(
+            create_alias=CreateAlias(collection_name=collection_name, alias_name=domain)
+        ))
+        self.client.update_collection_aliases(change_aliases_operations=operations)
+        
+        logger.info(
+            "Alias atualizado",
+            alias=domain,
+            collection=collection_name,
+            previous=current
+        )
+    
+    def gc_versions(self, domain: str, keep: Optional[int] = None):
+        """
+        Remove versões antigas do domínio.
+        
+        Mantém a versão publicada e as `keep` versões anteriores mais recentes (rollback).
+        """
+        keep = self.settings.collection_versions_to_keep if keep is None else keep
+        current = self.get_alias_target(domain)
+        if not current:
+            return
+        
+        older = [v for v in self.list_versions(domain) if v < current]
+        stale = older[:max(len(older) - keep, 0)]
+        
+        for name in stale:
+            self.delete_collection(name)
+        
+        if stale:
+            logger.info("Versões antigas removidas", domain=domain, removed=stale, current=current)
+    
+    def _get_embedding_with_retry(self, text: str, deadline: Optional[Deadline] = None) -> List[float]:
+        """Embedding pelo gateway OpenAI (fila, orçamento de rate limit e retentativas)"""
+        response = get_openai_gateway().embeddings(
+            self.openai_client,
+            deadline=deadline,
             model=self.embedding_model,
             input=text
         )
         return response.data[0].embedding
     
-    def index_chunks(self, collection_name: str, chunks: List[DocumentChunk]):
-        """Indexa chunks na coleção"""
+    def _get_embeddings_with_retry(self, texts: List[str], deadline: Optional[Deadline] = None) -> List[List[float]]:
+        """Embeddings de um lote em uma requisição (input=[...]), na ordem de `texts`"""
+        response = get_openai_gateway().embeddings(
+            self.openai_client,
+            deadline=deadline,
+            model=self.embedding_model,
+            input=texts
+        )
+        return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+    
+    def index_chunks(
+        self,
+        collection_name: str,
+        chunks: List[ChunkRecord],
+        journal: Optional["IngestionJournal"] = None,
+        progress: Optional["IngestionProgress"] = None
+    ):
+        """
+        Indexa chunks na coleção.
+        
+        Gera embeddings e faz upsert em lotes de `index_batch_size` (uma
+        requisição de embeddings por lote). Com journal, cada embedding é
+        persistido antes do upsert e cada lote gravado é marcado como commit,
+        permitindo retomar a ingestão do último chunk gravado.
+        Com progress, contabiliza embeddings e interrompe se houver cancelamento.
+        """
         if not chunks:
             return
         
-        points = []
+        batch_size = max(1, self.settings.index_batch_size)
+        batch: List[tuple] = []  # (índice do chunk, PointStruct)
+        indexed = 0
         
+        # Retomada: gravar primeiro os embeddings do journal que não chegaram ao Qdrant
+        if journal is not None:
+            pending = journal.uncommitted()
+            if pending:
+                logger.info(
+                    "Regravando embeddings pendentes do journal",
+                    collection=collection_name,
+                    count=len(pending)
+                )
+            for record in pending:
+                batch.append((
+                    record["index"],
+                    PointStruct(id=record["id"], vector=record["vector"], payload=record["payload"])
+                ))
+                if len(batch) >= batch_size:
+                    indexed += self._upsert_batch(collection_name, batch, journal)
+                    batch = []
+            skipped = len(journal.embedded)
+            if progress is not None and skipped:
+                progress.add_resumed(skipped)
+            if skipped:
+                logger.info(
+                    "Retomando indexação a partir do journal",
+                    collection=collection_name,
+                    chunks_reaproveitados=skipped,
+                    chunks_restantes=len(chunks) - skipped
+                )
+        
+        if batch:
+            indexed += self._upsert_batch(collection_name, batch, journal)
+            batch = []
+        
+        to_embed: List[tuple] = []  # (índice do chunk, chunk, texto validado)
         for i, chunk in enumerate(chunks):
-            # Gerar embedding usando OpenAI diretamente com retry
-            max_retries = 5
-            retry_delay = 1
-            
-            for attempt in range(max_retries):
-                try:
-                    response = self.openai_client.embeddings.create(
-                        model=self.embedding_model,
-                        input=chunk.text
-                    )
-                    embedding = response.data[0].embedding
-                    break
-                except RateLimitError as e:
-                    if attempt < max_retries - 1:
-                        wait_time = retry_delay * (2 ** attempt)  # Backoff exponencial
-                        logger.warning(
-                            "Rate limit atingido, aguardando",
-                            attempt=attempt + 1,
-                            wait_seconds=wait_time,
-                            chunk_index=i
-                        )
-                        time.sleep(wait_time)
-                    else:
-                        logger.error("Rate limit após múltiplas tentativas", chunk_index=i)
-                        raise
-                except Exception as e:
-                    logger.error("Erro ao gerar embedding", error=str(e), chunk_index=i)
-                    raise
-            
-            # Pequeno delay entre requisições para evitar rate limit
-            if i < len(chunks) - 1:
-                time.sleep(0.1)  # 100ms entre requisições
-            
-            # Criar ponto
-            point_id = str(uuid.uuid4())
-            chunk.chunk_id = point_id
+            if journal is not None and journal.is_embedded(i):
+                continue
             
-            # Validar que o texto não está vazio antes de indexar
+            # Validar que o texto não está vazio antes de gerar embedding
             chunk_text = chunk.text.strip() if chunk.text else ""
             if not chunk_text or len(chunk_text) < 10:
                 logger.warning(
@@ -208,22 +369,6 @@ class VectorStore:
                 )
                 continue
             
-            point = PointStruct(
-                id=point_id,
-                vector=embedding,
-                payload={
-                    "text": chunk_text,  # Usar texto validado
-                    "fonte": chunk.metadata.fonte,
-                    "norma": chunk.metadata.norma,
-                    "numero_norma": chunk.metadata.numero_norma,
-                    "artigo": chunk.metadata.artigo or "",
-                    "ano": chunk.metadata.ano,
-                    "tema": chunk.metadata.tema,
-                    "url": chunk.metadata.url or "",
-                }
-            )
-            points.append(point)
-            
             # Log do primeiro chunk para debug
             if i == 0:
                 logger.debug(
@@ -233,30 +378,109 @@ class VectorStore:
                     norma=chunk.metadata.norma,
                     artigo=chunk.metadata.artigo
                 )
+            
+            to_embed.append((i, chunk, chunk_text))
+            if len(to_embed) >= batch_size:
+                indexed += self._embed_and_upsert(collection_name, to_embed, journal, progress)
+                to_embed = []
         
-        # Inserir em batch
+        if to_embed:
+            indexed += self._embed_and_upsert(collection_name, to_embed, journal, progress)
+        
+        logger.info("Chunks indexados", collection=collection_name, count=indexed)
+    
+    def _embed_and_upsert(
+        self,
+        collection_name: str,
+        pending: List[tuple],
+        journal: Optional["IngestionJournal"] = None,
+        progress: Optional["IngestionProgress"] = None
+    ) -> int:
+        """Embeddings de um lote (uma requisição pelo gateway), journal e upsert"""
+        indices = [i for i, _, _ in pending]
+        # O ritmo segue o orçamento de rate limit informado pela OpenAI, sem
+        # pausa fixa entre requisições
         try:
-            self.client.upsert(
-                collection_name=collection_name,
-                points=points
-            )
-            logger.info("Chunks indexados", collection=collection_name, count=len(points))
+            # Um span por lote (não por chunk): a ingestão de um corpus grande não gera milhares de spans
+            with span(
+                "openai.embeddings",
+                model=self.embedding_model,
+                batch_size=len(pending),
+                first_chunk_index=indices[0],
+                last_chunk_index=indices[-1]
+            ):
+                embeddings = self._get_embeddings_with_retry([chunk.text for _, chunk, _ in pending])
+        except Exception as e:
+            logger.error("Erro ao gerar embeddings", error=str(e), chunk_indices=f"{indices[0]}-{indices[-1]}")
+            raise
+        
+        if len(embeddings) != len(pending):
+            raise RuntimeError(f"OpenAI retornou {len(embeddings)} embeddings para {len(pending)} chunks")
+        
+        batch: List[tuple] = []  # (índice do chunk, PointStruct)
+        for (i, chunk, chunk_text), embedding in zip(pending, embeddings):
+            point_id = str(uuid.uuid4())
+            chunk.chunk_id = point_id
+            
+            payload = chunk.payload()
+            payload["text"] = chunk_text  # Usar texto validado
+            
+            # Persistir embedding antes do upsert para não perdê-lo em caso de falha
+            if journal is not None:
+                journal.record_embedding(i, point_id, embedding, payload)
+            
+            batch.append((i, PointStruct(id=point_id, vector=embedding, payload=payload)))
+        
+        if progress is not None:
+            progress.add_embeddings(len(batch))
+        
+        return self._upsert_batch(collection_name, batch, journal)
+    
+    def _upsert_batch(
+        self,
+        collection_name: str,
+        batch: List[tuple],
+        journal: Optional["IngestionJournal"] = None
+    ) -> int:
+        """Grava um lote de pontos no Qdrant e registra o commit no journal"""
+        try:
+            with span("qdrant.upsert", collection=collection_name, points=len(batch)):
+                self.client.upsert(
+                    collection_name=collection_name,
+                    points=[point for _, point in batch]
+                )
         except Exception as e:
             logger.error("Erro ao indexar chunks", collection=collection_name, error=str(e))
             raise
+        
+        if journal is not None:
+            journal.record_commit([index for index, _ in batch])
+        
+        logger.debug("Lote gravado", collection=collection_name, count=len(batch))
+        return len(batch)
     
     def search(
         self,
         collection_name: str,
         query: str,
         top_k: int = 5,
-        min_score: float = 0.15  # Reduzido para 0.15 - scores de similaridade estão em ~0.19
-    ) -> List[DocumentChunk]:
-        """Busca semântica na coleção"""
+        min_score: float = 0.15,  # Reduzido para 0.15 - scores de similaridade estão em ~0.19
+        deadline: Optional[Deadline] = None
+    ) -> List[ChunkRecord]:
+        """
+        Busca semântica na coleção.
+        
+        Com deadline, embedding e Qdrant usam o tempo restante como timeout e
+        o fim do prazo é propagado como DeadlineExceeded (demais erros
+        continuam retornando lista vazia).
+        """
         try:
             # Verificar se a coleção existe e tem documentos
             try:
-                collection_info = self.client.get_collection(collection_name)
+                if deadline is not None:
+                    deadline.check("collection_check")
+                with observe_stage("collection_check"), span("qdrant.get_collection", collection=collection_name):
+                    collection_info = self.client.get_collection(collection_name)
                 if collection_info.points_count == 0:
                     logger.warning(
                         "Coleção vazia - nenhum documento indexado",
@@ -264,7 +488,11 @@ class VectorStore:
                         query=query[:100]
                     )
                     return []
+            except DeadlineExceeded:
+                raise
             except Exception as e:
+                if deadline is not None and deadline.expired():
+                    raise DeadlineExceeded("Prazo esgotado ao verificar a coleção", stage="search") from e
                 logger.warning(
                     "Erro ao verificar coleção (pode não existir)",
                     collection=collection_name,
@@ -273,18 +501,50 @@ class VectorStore:
                 return []
             
             # Gerar embedding da query usando função com retry unificado
-            query_embedding = self._get_embedding_with_retry(query)
+            with observe_stage("embed"), span("openai.embeddings", model=self.embedding_model, query=True):
+                query_embedding = self._get_embedding_with_retry(query, deadline)
             
-            # Buscar usando query_points() - método atual do qdrant-client >= 1.7
-            # Verificar dimensão do embedding
-            embedding_dim = len(query_embedding)
-            logger.debug(
-                "Gerando query de busca",
-                collection=collection_name,
-                embedding_dim=embedding_dim,
-                query_length=len(query)
-            )
+            return self.search_by_vector(collection_name, query_embedding, top_k, min_score, query=query, deadline=deadline)
             
+        except DeadlineExceeded as e:
+            e.stage = "search"
+            raise
+        except Exception as e:
+            if deadline is not None and deadline.expired():
+                raise DeadlineExceeded("Prazo esgotado na busca", stage="search") from e
+            logger.error("Erro na busca", collection=collection_name, error=str(e))
+            return []
+    
+    def search_by_vector(
+        self,
+        collection_name: str,
+        query_embedding: List[float],
+        top_k: int = 5,
+        min_score: float = 0.15,
+        query: str = "",
+        deadline: Optional[Deadline] = None
+    ) -> List[ChunkRecord]:
+        """
+        Busca com o embedding já calculado (ex: embeddings em cache da avaliação).
+        
+        Diferente de search(), erros do Qdrant são propagados.
+        """
+        # Timeout do Qdrant (segundos inteiros) = tempo restante, não os 30s do cliente
+        timeout = None
+        if deadline is not None:
+            deadline.check("search")
+            timeout = max(1, int(deadline.remaining()))
+        # Buscar usando query_points() - método atual do qdrant-client >= 1.7
+        # Verificar dimensão do embedding
+        embedding_dim = len(query_embedding)
+        logger.debug(
+            "Gerando query de busca",
+            collection=collection_name,
+            embedding_dim=embedding_dim,
+            query_length=len(query)
+        )
+        
+        with observe_stage("search"), span("qdrant.query_points", collection=collection_name, limit=top_k):
             # Para coleções simples (sem named vectors), usar lista diretamente
             try:
                 # Tentar primeiro com lista direta (mais simples)
@@ -292,7 +552,8 @@ class VectorStore:
                 query_result = self.client.query_points(
                     collection_name=collection_name,
                     query=query_embedding,  # Lista de floats diretamente
-                    limit=top_k
+                    limit=top_k,
+                    timeout=timeout
                     # score_threshold removido para debug
                 )
             except (TypeError, ValueError) as e:
@@ -305,81 +566,107 @@ class VectorStore:
                         name="",  # Nome vazio para vetor padrão
                         vector=query_embedding
                     ),
-                    limit=top_k
+                    limit=top_k,
+                    timeout=timeout
                     # score_threshold removido para debug
                 )
+        
+        # query_points retorna um objeto QueryResponse com .points
+        all_points = query_result.points if hasattr(query_result, 'points') else []
+        
+        # Filtrar por score_threshold manualmente
+        results = []
+        for point in all_points:
+            score = point.score if hasattr(point, 'score') else 0.0
+            if score >= min_score:
+                results.append(point)
+        
+        logger.info(
+            "Busca realizada",
+            collection=collection_name,
+            query_length=len(query),
+            total_points=len(all_points),
+            filtered_results=len(results),
+            min_score=min_score,
+            scores=[p.score for p in all_points[:5]] if all_points and hasattr(all_points[0], 'score') else []
+        )
+        
+        # Converter para ChunkRecord (sem validação Pydantic por resultado)
+        chunks = []
+        for result in results:
+            # Result pode ser ScoredPoint ou dict
+            if hasattr(result, 'payload'):
+                payload = result.payload
+                point_id = result.id
+                score = result.score
+            else:
+                # Se for dict
+                payload = result.get('payload', {})
+                point_id = result.get('id')
+                score = result.get('score', 0.0)
             
-            # query_points retorna um objeto QueryResponse com .points
-            all_points = query_result.points if hasattr(query_result, 'points') else []
-            
-            # Filtrar por score_threshold manualmente
-            results = []
-            for point in all_points:
-                score = point.score if hasattr(point, 'score') else 0.0
-                if score >= min_score:
-                    results.append(point)
-            
-            logger.info(
-                "Busca realizada",
-                collection=collection_name,
-                query_length=len(query),
-                total_points=len(all_points),
-                filtered_results=len(results),
-                min_score=min_score,
-                scores=[p.score for p in all_points[:5]] if all_points and hasattr(all_points[0], 'score') else []
-            )
+            # Extrair texto do payload
+            text_from_payload = payload.get("text", "")
             
-            # Converter para DocumentChunk
-            chunks = []
-            for result in results:
-                # Result pode ser ScoredPoint ou dict
-                if hasattr(result, 'payload'):
-                    payload = result.payload
-                    point_id = result.id
-                    score = result.score
-                else:
-                    # Se for dict
-                    payload = result.get('payload', {})
-                    point_id = result.get('id')
-                    score = result.get('score', 0.0)
-                
-                # Extrair texto do payload
-                text_from_payload = payload.get("text", "")
-                
-                # Log para debug se texto estiver vazio
-                if not text_from_payload or len(str(text_from_payload).strip()) < 10:
-                    logger.warning(
-                        "Chunk recuperado com texto vazio ou muito curto",
-                        point_id=str(point_id),
-                        text_length=len(str(text_from_payload)) if text_from_payload else 0,
-                        payload_keys=list(payload.keys()) if isinstance(payload, dict) else [],
-                        payload_text_type=type(text_from_payload).__name__,
-                        payload_preview=str(payload)[:200] if payload else "None"
-                    )
-                
-                chunk = DocumentChunk(
-                    text=str(text_from_payload) if text_from_payload else "",
-                    metadata=Metadata(
-                        fonte=payload.get("fonte", ""),
-                        norma=payload.get("norma", ""),
-                        numero_norma=payload.get("numero_norma", ""),
-                        artigo=payload.get("artigo"),
-                        ano=payload.get("ano", 2023),
-                        tema=payload.get("tema", ""),
-                        url=payload.get("url"),
-                    ),
-                    chunk_id=str(point_id),
-                    score=score
+            # Log para debug se texto estiver vazio
+            if not text_from_payload or len(str(text_from_payload).strip()) < 10:
+                logger.warning(
+                    "Chunk recuperado com texto vazio ou muito curto",
+                    point_id=str(point_id),
+                    text_length=len(str(text_from_payload)) if text_from_payload else 0,
+                    payload_keys=list(payload.keys()) if isinstance(payload, dict) else [],
+                    payload_text_type=type(text_from_payload).__name__,
+                    payload_preview=str(payload)[:200] if payload else "None"
                 )
-                chunks.append(chunk)
-            
-            # Log já feito acima
-            
-            return chunks
             
-        except Exception as e:
-            logger.error("Erro na busca", collection=collection_name, error=str(e))
-            return []
+            chunks.append(ChunkRecord.from_payload(payload, chunk_id=str(point_id), score=score))
+        
+        # Log já feito acima
+        
+        return chunks
+    
+
+    @staticmethod
+    def _normativo_filter(norma: str, numero_norma: str) -> Filter:
+        return Filter(must=[
+            FieldCondition(key="norma", match=MatchValue(value=norma)),
+            FieldCondition(key="numero_norma", match=MatchValue(value=numero_norma)),
+        ])
+    
+    def list_normativo_points(self, collection_name: str, norma: str, numero_norma: str) -> List[tuple]:
+        """(id, payload) de todos os pontos de um normativo (sem vetores)"""
+        points = []
+        offset = None
+        while True:
+            batch, offset = self.client.scroll(
+                collection_name=collection_name,
+                scroll_filter=self._normativo_filter(norma, numero_norma),
+                limit=256,
+                offset=offset,
+                with_payload=True,
+                with_vectors=False
+            )
+            points.extend((point.id, point.payload or {}) for point in batch)
+            if offset is None:
+                return points
+    
+    def delete_points(self, collection_name: str, point_ids: List):
+        """Remove pontos pelo ID"""
+        if not point_ids:
+            return
+        self.client.delete(
+            collection_name=collection_name,
+            points_selector=PointIdsList(points=list(point_ids))
+        )
+        logger.info("Pontos removidos", collection=collection_name, count=len(point_ids))
+    
+    def delete_normativo(self, collection_name: str, norma: str, numero_norma: str):
+        """Remove todos os pontos de um normativo (ex: revogado/cancelado)"""
+        self.client.delete(
+            collection_name=collection_name,
+            points_selector=FilterSelector(filter=self._normativo_filter(norma, numero_norma))
+        )
+        logger.info("Normativo removido do índice", collection=collection_name, norma=norma, numero_norma=numero_norma)
     
     def get_collection_info(self, collection_name: str) -> Optional[dict]:
         """Retorna informações da coleção"""
@@ -0,0 +1,70 @@
+"""
+Prazo por requisição (deadline) propagado por todo o pipeline do /chat.
+
+Criado na borda da API (timeout_middleware, API_TIMEOUT) e repassado para
+RegulatoryRAGEngine.query -> VectorStore.search -> gateway OpenAI. Cada
+estágio dimensiona seus timeouts e retentativas pelo tempo restante e, sem
+tempo, falha na hora com DeadlineExceeded (a API responde 504 com as fontes
+já recuperadas).
+"""
+import time
+from typing import Any, Dict, List, Optional
+
+
+class DeadlineExceeded(TimeoutError):
+    """
+    O prazo da requisição terminou.
+    
+    stage: estágio em que o prazo acabou (search, llm...)
+    sources: fontes já recuperadas até ali (metadados), para resposta parcial
+    timeout: limite do estágio (s) quando só ele acabou, não o prazo da
+        requisição (ex.: SEARCH_TIMEOUT_SECONDS); None = prazo da requisição
+    """
+    
+    def __init__(
+        self,
+        message: str,
+        stage: Optional[str] = None,
+        sources: Optional[List[Dict[str, Any]]] = None,
+        timeout: Optional[float] = None
+    ):
+        super().__init__(message)
+        self.stage = stage
+        self.sources = sources or []
+        self.timeout = timeout
+
+
+class Deadline:
+    """Instante-limite em time.monotonic() (imune a ajustes do relógio)"""
+    
+    def __init__(self, seconds: float):
+        self.expires_at = time.monotonic() + seconds
+    
+    @classmethod
+    def at(cls, expires_at: float) -> "Deadline":
+        deadline = cls(0)
+        deadline.expires_at = expires_at
+        return deadline
+    
+    def remaining(self) -> float:
+        """Segundos até o prazo (0 se já passou)"""
+        return max(0.0, self.expires_at - time.monotonic())
+    
+    def expired(self) -> bool:
+        return time.monotonic() >= self.expires_at
+    
+    def timeout(self, cap: Optional[float] = None) -> float:
+        """Timeout de uma operação: o tempo restante, limitado a cap"""
+        remaining = self.remaining()
+        return remaining if cap is None else min(cap, remaining)
+    
+    def child(self, seconds: Optional[float]) -> "Deadline":
+        """Prazo de um estágio: no máximo `seconds` e nunca além deste"""
+        if seconds is None:
+            return self
+        return Deadline.at(min(self.expires_at, time.monotonic() + seconds))
+    
+    def check(self, stage: str):
+        """Lança DeadlineExceeded se o prazo já passou"""
+        if self.expired():
+            raise DeadlineExceeded(f"Prazo esgotado antes do estágio {stage}", stage=stage)
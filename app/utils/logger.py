@@ -19,12 +19,16 @@ def setup_logger():
     log_dir = Path("logs")
     log_dir.mkdir(exist_ok=True)
     
+    # trace_id/span_id do OpenTelemetry em cada log (import tardio: tracing usa este módulo)
+    from app.utils.tracing import add_trace_context
+    
     # Configurar structlog
     structlog.configure(
         processors=[
             structlog.stdlib.filter_by_level,
             structlog.stdlib.add_logger_name,
             structlog.stdlib.add_log_level,
+            add_trace_context,
             structlog.stdlib.PositionalArgumentsFormatter(),
             structlog.processors.TimeStamper(fmt="iso"),
             structlog.processors.StackInfoRenderer(),
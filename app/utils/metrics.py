@@ -0,0 +1,206 @@
+"""
+Métricas Prometheus (endpoint /metrics).
+
+- rag_stage_duration_seconds{stage}: latência por estágio da consulta RAG
+  (collection_check, embed, search, context, llm, validation)
+- rag_query_duration_seconds{domain, outcome}: consulta completa
+- http_request_duration_seconds{method, route, status}: requisições da API
+- rag_cache_requests_total{cache, result}: acertos/faltas de cache
+- rag_rate_limit_retries_total{service}: retentativas por rate limit (OpenAI, Bacen)
+- rag_tokens_total{model, kind}: tokens consumidos (prompt, completion, embedding)
+- rag_empty_context_total{domain, reason}: respostas sem contexto normativo
+- rag_openai_queue_seconds{kind}: espera no gateway OpenAI (fila do semáforo
+  + orçamento de rate limit) antes do envio
+- rag_openai_in_flight{kind}: requisições em andamento na OpenAI
+- rag_llm_fallbacks_total{model, reason}: falhas de um modelo do LLM que
+  passaram a consulta para o próximo da lista (timeout, rate_limit, ...)
+- rag_llm_hedges_total{model, winner}: requisições hedged e qual respondeu
+  (primary, hedge ou none)
+
+Requer prometheus_client; sem ele as métricas viram no-ops e /metrics
+responde 503. Com vários workers (gunicorn), defina PROMETHEUS_MULTIPROC_DIR
+para agregar as métricas de todos os processos.
+"""
+import os
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterator, List, Tuple
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Prometheus (opcional)
+try:
+    from prometheus_client import (
+        CONTENT_TYPE_LATEST,
+        CollectorRegistry,
+        Counter,
+        Gauge,
+        Histogram,
+        REGISTRY,
+        generate_latest,
+    )
+    from prometheus_client import multiprocess
+    PROMETHEUS_AVAILABLE = True
+except ImportError:
+    PROMETHEUS_AVAILABLE = False
+    CONTENT_TYPE_LATEST = "text/plain; version=0.0.4; charset=utf-8"
+
+# Estágios curtos (busca, contexto) a longos (LLM com retentativas)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class _NoopMetric:
+    """Substituto sem custo quando prometheus_client não está instalado"""
+    
+    def labels(self, *args, **kwargs) -> "_NoopMetric":
+        return self
+    
+    def observe(self, value: float):
+        pass
+    
+    def inc(self, amount: float = 1):
+        pass
+    
+    def dec(self, amount: float = 1):
+        pass
+
+
+if PROMETHEUS_AVAILABLE:
+    STAGE_DURATION = Histogram(
+        "rag_stage_duration_seconds",
+        "Latência por estágio da consulta RAG",
+        ["stage"],
+        buckets=LATENCY_BUCKETS
+    )
+    QUERY_DURATION = Histogram(
+        "rag_query_duration_seconds",
+        "Latência da consulta RAG completa",
+        ["domain", "outcome"],
+        buckets=LATENCY_BUCKETS
+    )
+    HTTP_REQUEST_DURATION = Histogram(
+        "http_request_duration_seconds",
+        "Latência das requisições da API",
+        ["method", "route", "status"],
+        buckets=LATENCY_BUCKETS
+    )
+    CACHE_REQUESTS = Counter(
+        "rag_cache_requests_total",
+        "Consultas a caches (hit/miss)",
+        ["cache", "result"]
+    )
+    RATE_LIMIT_RETRIES = Counter(
+        "rag_rate_limit_retries_total",
+        "Retentativas por rate limit de serviços externos",
+        ["service"]
+    )
+    TOKENS = Counter(
+        "rag_tokens_total",
+        "Tokens consumidos na OpenAI",
+        ["model", "kind"]
+    )
+    EMPTY_CONTEXT = Counter(
+        "rag_empty_context_total",
+        "Consultas respondidas sem contexto normativo",
+        ["domain", "reason"]
+    )
+    OPENAI_QUEUE_DURATION = Histogram(
+        "rag_openai_queue_seconds",
+        "Espera no gateway OpenAI antes do envio (concorrência e rate limit)",
+        ["kind"],
+        buckets=LATENCY_BUCKETS
+    )
+    OPENAI_IN_FLIGHT = Gauge(
+        "rag_openai_in_flight",
+        "Requisições em andamento na OpenAI",
+        ["kind"],
+        multiprocess_mode="livesum"
+    )
+    LLM_FALLBACKS = Counter(
+        "rag_llm_fallbacks_total",
+        "Falhas de modelo do LLM com fallback para o próximo",
+        ["model", "reason"]
+    )
+    LLM_HEDGES = Counter(
+        "rag_llm_hedges_total",
+        "Requisições hedged ao LLM por vencedora",
+        ["model", "winner"]
+    )
+else:
+    STAGE_DURATION = QUERY_DURATION = HTTP_REQUEST_DURATION = _NoopMetric()
+    CACHE_REQUESTS = RATE_LIMIT_RETRIES = TOKENS = EMPTY_CONTEXT = _NoopMetric()
+    OPENAI_QUEUE_DURATION = OPENAI_IN_FLIGHT = LLM_FALLBACKS = LLM_HEDGES = _NoopMetric()
+
+
+# Ouvintes das durações por estágio (ex: app.bench calcula percentis por requisição)
+_stage_listeners: List[Callable[[str, float], None]] = []
+
+
+def add_stage_listener(listener: Callable[[str, float], None]):
+    _stage_listeners.append(listener)
+
+
+def remove_stage_listener(listener: Callable[[str, float], None]):
+    if listener in _stage_listeners:
+        _stage_listeners.remove(listener)
+
+
+@contextmanager
+def observe_stage(stage: str) -> Iterator[None]:
+    """Mede a duração de um estágio (mesmo se lançar exceção)"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_DURATION.labels(stage=stage).observe(elapsed)
+        for listener in _stage_listeners:
+            listener(stage, elapsed)
+
+
+def record_cache(cache: str, hit: bool):
+    CACHE_REQUESTS.labels(cache=cache, result="hit" if hit else "miss").inc()
+
+
+def record_rate_limit_retry(service: str):
+    RATE_LIMIT_RETRIES.labels(service=service).inc()
+
+
+def record_usage(model: str, response) -> None:
+    """Soma os tokens do campo usage de uma resposta da OpenAI"""
+    usage = getattr(response, "usage", None)
+    if usage is None:
+        return
+    completion_tokens = getattr(usage, "completion_tokens", None)
+    if completion_tokens is None:
+        # Embeddings: só prompt_tokens
+        TOKENS.labels(model=model, kind="embedding").inc(getattr(usage, "prompt_tokens", 0) or 0)
+        return
+    TOKENS.labels(model=model, kind="prompt").inc(getattr(usage, "prompt_tokens", 0) or 0)
+    TOKENS.labels(model=model, kind="completion").inc(completion_tokens or 0)
+
+
+def record_llm_fallback(model: str, reason: str):
+    LLM_FALLBACKS.labels(model=model, reason=reason).inc()
+
+
+def record_llm_hedge(model: str, winner: str):
+    LLM_HEDGES.labels(model=model, winner=winner).inc()
+
+
+def record_empty_context(domain: str, reason: str):
+    EMPTY_CONTEXT.labels(domain=domain, reason=reason).inc()
+
+
+def render_metrics() -> Tuple[bytes, str]:
+    """(corpo, content-type) no formato de exposição do Prometheus"""
+    if not PROMETHEUS_AVAILABLE:
+        raise RuntimeError("Métricas indisponíveis - instale prometheus_client")
+    
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        # Vários workers: agregar os arquivos de métricas de todos os processos
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
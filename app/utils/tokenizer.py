@@ -0,0 +1,79 @@
+"""
+Registro de encoders tiktoken compartilhado pelo processo.
+
+O tiktoken só é importado e os ranks BPE só são carregados no primeiro uso
+(a API não paga esse custo no cold start). Os arquivos BPE são lidos de um
+cache local (settings.tiktoken_cache_dir); sem o arquivo em cache o tiktoken
+tentaria baixá-lo, o que falha em workers sem acesso à rede.
+
+Para empacotar o cache (ex: no build da imagem):
+    python -m app.utils.tokenizer
+"""
+import os
+import threading
+from pathlib import Path
+from typing import Dict
+from app.config import get_settings
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+_encodings: Dict[str, object] = {}
+_lock = threading.Lock()
+
+
+def _configure_cache_dir():
+    """Aponta o tiktoken para o cache empacotado (TIKTOKEN_CACHE_DIR tem prioridade)"""
+    if "TIKTOKEN_CACHE_DIR" in os.environ:
+        return
+    cache_dir = get_settings().tiktoken_cache_dir
+    if cache_dir:
+        os.environ["TIKTOKEN_CACHE_DIR"] = str(Path(cache_dir).resolve())
+
+
+def get_encoding(model: str = None):
+    """
+    Encoder tiktoken do modelo (padrão: settings.tokenizer_model).
+    
+    Carregado uma única vez por processo e reutilizado por todas as instâncias.
+    """
+    model = model or get_settings().tokenizer_model
+    encoding = _encodings.get(model)
+    if encoding is not None:
+        return encoding
+    
+    with _lock:
+        encoding = _encodings.get(model)
+        if encoding is None:
+            _configure_cache_dir()
+            import tiktoken
+            
+            try:
+                encoding = tiktoken.encoding_for_model(model)
+            except Exception as e:
+                raise RuntimeError(
+                    f"Não foi possível carregar o encoder tiktoken de '{model}' "
+                    f"(cache: {os.environ.get('TIKTOKEN_CACHE_DIR')}). "
+                    "Sem acesso à rede, gere o cache com: python -m app.utils.tokenizer"
+                ) from e
+            
+            _encodings[model] = encoding
+            logger.info("Encoder tiktoken carregado", model=model, encoding=encoding.name)
+    
+    return encoding
+
+
+def count_tokens(text: str, model: str = None) -> int:
+    """Conta tokens de um texto com o encoder compartilhado"""
+    return len(get_encoding(model).encode(text, disallowed_special=()))
+
+
+def main():
+    """Baixa os arquivos BPE para o cache local (para uso offline)"""
+    settings = get_settings()
+    encoding = get_encoding(settings.tokenizer_model)
+    print(f"✅ Encoder '{encoding.name}' em cache: {os.environ.get('TIKTOKEN_CACHE_DIR')}")
+
+
+if __name__ == "__main__":
+    main()
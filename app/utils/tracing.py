@@ -0,0 +1,195 @@
+"""
+Tracing distribuído (OpenTelemetry).
+
+Spans principais:
+- API: "POST /chat" → rag.query → openai.embeddings → qdrant.query_points → openai.chat
+- Ingestão: ingestion.run → ingestion.parse / ingestion.ocr_page → ingestion.chunk
+  → ingestion.index → openai.embeddings (um por lote de INDEX_BATCH_SIZE) / qdrant.upsert
+- Sincronização: sync.run → sync.apply_normativo
+
+Exportadores (TRACING_EXPORTER):
+- "none" (padrão): spans não são gravados (custo desprezível)
+- "otlp": coletor OTLP/HTTP (TRACING_OTLP_ENDPOINT ou variáveis OTEL_EXPORTER_OTLP_*)
+- "file": um span JSON por linha em TRACING_FILE_PATH
+
+Os logs estruturados recebem trace_id e span_id do span corrente, então uma
+requisição lenta pode ser cruzada entre logs e trace.
+
+Requer opentelemetry-sdk (e opentelemetry-exporter-otlp-proto-http para
+OTLP); sem eles, span() e traced() são no-ops.
+"""
+import functools
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional
+from app.config import get_settings
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# OpenTelemetry (opcional)
+try:
+    from opentelemetry import trace
+    from opentelemetry.propagate import extract
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor, SpanExporter, SpanExportResult
+    from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
+    from opentelemetry.trace import Status, StatusCode
+    OTEL_AVAILABLE = True
+except ImportError:
+    OTEL_AVAILABLE = False
+
+_tracing_enabled = False
+_setup_lock = threading.Lock()
+
+
+if OTEL_AVAILABLE:
+    class JsonLinesSpanExporter(SpanExporter):
+        """Grava cada span finalizado como uma linha JSON (sem coletor)"""
+        
+        def __init__(self, path: Path):
+            self.path = Path(path)
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._lock = threading.Lock()
+        
+        def export(self, spans) -> "SpanExportResult":
+            lines = "".join(span.to_json(indent=None) + "\n" for span in spans)
+            try:
+                with self._lock, open(self.path, "a", encoding="utf-8") as f:
+                    f.write(lines)
+            except OSError:
+                return SpanExportResult.FAILURE
+            return SpanExportResult.SUCCESS
+        
+        def shutdown(self):
+            pass
+
+
+def _build_exporter(settings):
+    if settings.tracing_exporter == "file":
+        return JsonLinesSpanExporter(Path(settings.tracing_file_path))
+    if settings.tracing_exporter == "otlp":
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        if settings.tracing_otlp_endpoint:
+            return OTLPSpanExporter(endpoint=settings.tracing_otlp_endpoint)
+        return OTLPSpanExporter()
+    raise ValueError(f"TRACING_EXPORTER inválido: {settings.tracing_exporter}")
+
+
+def setup_tracing(service_name: Optional[str] = None) -> bool:
+    """
+    Configura o TracerProvider do processo (idempotente).
+    
+    Returns:
+        bool: True se os spans estão sendo exportados
+    """
+    global _tracing_enabled
+    settings = get_settings()
+    if settings.tracing_exporter == "none":
+        return False
+    if not OTEL_AVAILABLE:
+        logger.warning("Tracing desativado - instale opentelemetry-sdk", exporter=settings.tracing_exporter)
+        return False
+    
+    with _setup_lock:
+        if _tracing_enabled:
+            return True
+        try:
+            exporter = _build_exporter(settings)
+        except (ImportError, ValueError) as e:
+            logger.error("Erro ao configurar exportador de traces", exporter=settings.tracing_exporter, error=str(e))
+            return False
+        
+        provider = TracerProvider(
+            resource=Resource.create({"service.name": service_name or settings.tracing_service_name}),
+            sampler=ParentBased(TraceIdRatioBased(settings.tracing_sample_ratio))
+        )
+        provider.add_span_processor(BatchSpanProcessor(exporter))
+        trace.set_tracer_provider(provider)
+        _tracing_enabled = True
+    
+    logger.info("Tracing ativado", exporter=settings.tracing_exporter, service=service_name or settings.tracing_service_name)
+    return True
+
+
+def shutdown_tracing():
+    """Exporta os spans pendentes (chamar ao encerrar o processo)"""
+    if _tracing_enabled:
+        trace.get_tracer_provider().shutdown()
+
+
+def _clean_attributes(attributes: Dict[str, Any]) -> Dict[str, Any]:
+    # OpenTelemetry aceita apenas str, bool, int e float (None é descartado)
+    return {
+        key: value if isinstance(value, (str, bool, int, float)) else str(value)
+        for key, value in attributes.items()
+        if value is not None
+    }
+
+
+@contextmanager
+def span(name: str, context=None, **attributes) -> Iterator[Optional[Any]]:
+    """
+    Span filho do span corrente; exceções são registradas no span e relançadas.
+    
+    Sem OpenTelemetry instalado, não faz nada (yield None).
+    """
+    if not OTEL_AVAILABLE:
+        yield None
+        return
+    
+    tracer = trace.get_tracer("app")
+    with tracer.start_as_current_span(name, context=context, attributes=_clean_attributes(attributes)) as current:
+        yield current
+
+
+def traced(name: str):
+    """Decorator: executa a função dentro de um span"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def set_attributes(current, **attributes):
+    """Adiciona atributos a um span retornado por span() (ignora None)"""
+    if current is not None:
+        current.set_attributes(_clean_attributes(attributes))
+
+
+def mark_error(current, description: str):
+    """Marca o span como erro sem exceção (ex: resposta HTTP 5xx)"""
+    if current is not None:
+        current.set_status(Status(StatusCode.ERROR, description))
+
+
+def extract_context(headers) -> Optional[Any]:
+    """Contexto W3C (traceparent) recebido nos headers da requisição"""
+    if not OTEL_AVAILABLE:
+        return None
+    return extract(dict(headers))
+
+
+def current_trace_id() -> Optional[str]:
+    if not OTEL_AVAILABLE:
+        return None
+    context = trace.get_current_span().get_span_context()
+    if not context.is_valid:
+        return None
+    return format(context.trace_id, "032x")
+
+
+def add_trace_context(logger, method_name: str, event_dict: Dict) -> Dict:
+    """Processor do structlog: trace_id/span_id do span corrente em cada log"""
+    if not OTEL_AVAILABLE:
+        return event_dict
+    context = trace.get_current_span().get_span_context()
+    if context.is_valid:
+        event_dict.setdefault("trace_id", format(context.trace_id, "032x"))
+        event_dict.setdefault("span_id", format(context.span_id, "016x"))
+    return event_dict
@@ -1,6 +1,6 @@
 import re
 from typing import List, Dict, Any
-from app.models.schemas import DocumentChunk
+from app.models.records import ChunkRecord
 
 
 def validate_normative_reference(text: str) -> bool:
@@ -22,7 +22,7 @@ def validate_normative_reference(text: str) -> bool:
 
 def validate_response(
     response_text: str,
-    sources: List[DocumentChunk],
+    sources: List[ChunkRecord],
     min_sources: int = 1
 ) -> Dict[str, Any]:
     """
@@ -46,7 +46,7 @@ def validate_response(
     return validations
 
 
-def extract_citations(response_text: str, sources: List[DocumentChunk]) -> List[str]:
+def extract_citations(response_text: str, sources: List[ChunkRecord]) -> List[str]:
     """
     Extrai citações normativas da resposta e dos sources.
     """
@@ -0,0 +1,143 @@
+"""
+Microbenchmark da representação de chunks nos caminhos quentes.
+
+Compara, por lote de chunks (padrão 10k), os modelos Pydantic usados antes
+(Metadata + DocumentChunk por chunk, payload e reconstrução na busca) com os
+registros internos com __slots__ (app.models.records).
+
+Mede tempo e memória (tracemalloc: pico e memória retida pela lista de chunks).
+
+Uso:
+    python scripts/benchmark_chunk_records.py
+    python scripts/benchmark_chunk_records.py --chunks 50000 --repeat 5
+"""
+import argparse
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+# Configurar encoding para Windows
+if sys.platform == "win32":
+    sys.stdout.reconfigure(encoding='utf-8')
+    sys.stderr.reconfigure(encoding='utf-8')
+
+# Adicionar raiz do projeto ao path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from app.models.schemas import DocumentChunk, Metadata
+from app.models.records import ChunkMetadata, ChunkRecord
+
+BASE_METADATA = {
+    "fonte": "resolucao_bcb_1_2020.json",
+    "norma": "Resolução BCB",
+    "numero_norma": "1",
+    "ano": 2020,
+    "tema": "pix",
+    "url": "https://www.bcb.gov.br/estabilidadefinanceira/exibenormativo?tipo=Resolução BCB&numero=1",
+}
+
+TEXT = "Art. 1º Os participantes do arranjo devem observar as regras deste Regulamento. " * 4
+
+
+# Ingestão: chunker -> payload do Qdrant
+
+def pydantic_ingest(count: int):
+    chunks = []
+    for i in range(count):
+        metadata = Metadata(**BASE_METADATA, artigo=f"{i}º")
+        chunks.append(DocumentChunk(text=TEXT, metadata=metadata, token_count=120))
+    payloads = [{
+        "text": chunk.text,
+        "fonte": chunk.metadata.fonte,
+        "norma": chunk.metadata.norma,
+        "numero_norma": chunk.metadata.numero_norma,
+        "artigo": chunk.metadata.artigo or "",
+        "ano": chunk.metadata.ano,
+        "tema": chunk.metadata.tema,
+        "url": chunk.metadata.url or "",
+        "token_count": chunk.token_count,
+    } for chunk in chunks]
+    return chunks, payloads
+
+
+def records_ingest(count: int):
+    document_metadata = ChunkMetadata.validated(BASE_METADATA)
+    chunks = [
+        ChunkRecord(text=TEXT, metadata=document_metadata.with_artigo(f"{i}º"), token_count=120)
+        for i in range(count)
+    ]
+    payloads = [chunk.payload() for chunk in chunks]
+    return chunks, payloads
+
+
+# Busca: payload -> chunk -> dict de sources
+
+def pydantic_search(payloads):
+    chunks = [DocumentChunk(
+        text=payload["text"],
+        metadata=Metadata(
+            fonte=payload.get("fonte", ""),
+            norma=payload.get("norma", ""),
+            numero_norma=payload.get("numero_norma", ""),
+            artigo=payload.get("artigo"),
+            ano=payload.get("ano", 2023),
+            tema=payload.get("tema", ""),
+            url=payload.get("url"),
+        ),
+        chunk_id=str(i),
+        score=0.5,
+        token_count=payload.get("token_count")
+    ) for i, payload in enumerate(payloads)]
+    return chunks, [chunk.metadata.model_dump() for chunk in chunks]
+
+
+def records_search(payloads):
+    chunks = [ChunkRecord.from_payload(payload, chunk_id=str(i), score=0.5) for i, payload in enumerate(payloads)]
+    return chunks, [chunk.metadata.to_dict() for chunk in chunks]
+
+
+def measure(label: str, func, arg, repeat: int):
+    # Tempo (melhor de N)
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(arg)
+        best = min(best, time.perf_counter() - start)
+    
+    # Memória: pico durante a execução e memória retida pelos chunks
+    tracemalloc.start()
+    chunks, outputs = func(arg)
+    peak = tracemalloc.get_traced_memory()[1]
+    del outputs
+    retained = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del chunks
+    
+    print(f"  {label:<28} {best * 1000:9.2f} ms   pico {peak / 1_048_576:7.2f} MB   chunks {retained / 1_048_576:7.2f} MB")
+    return best, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Microbenchmark Pydantic x registros com __slots__")
+    parser.add_argument("--chunks", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    
+    print(f"\n{args.chunks} chunks, melhor de {args.repeat}\n")
+    
+    print("Ingestão (chunk + payload):")
+    t_old, m_old = measure("Pydantic", pydantic_ingest, args.chunks, args.repeat)
+    t_new, m_new = measure("ChunkRecord (slots)", records_ingest, args.chunks, args.repeat)
+    print(f"  tempo {t_old / t_new:.2f}x mais rápido, pico {m_old / m_new:.2f}x menor\n")
+    
+    _, payloads = records_ingest(args.chunks)
+    print("Busca (payload -> chunk -> sources):")
+    t_old, m_old = measure("Pydantic", pydantic_search, payloads, args.repeat)
+    t_new, m_new = measure("ChunkRecord (slots)", records_search, payloads, args.repeat)
+    print(f"  tempo {t_old / t_new:.2f}x mais rápido, pico {m_old / m_new:.2f}x menor\n")
+
+
+if __name__ == "__main__":
+    main()
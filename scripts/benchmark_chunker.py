@@ -0,0 +1,211 @@
+"""
+Benchmark de throughput da segmentação de normativos.
+
+Compara a segmentação antiga (regex não compilado, uma varredura por função)
+com o tokenizador estrutural de varredura única (app.ingestion.structure).
+
+Uso:
+    python scripts/benchmark_chunker.py                  # normativo sintético
+    python scripts/benchmark_chunker.py data/raw/pix/*.json --repeat 20
+"""
+import argparse
+import json
+import logging
+import re
+import sys
+import time
+from pathlib import Path
+
+# Configurar encoding para Windows
+if sys.platform == "win32":
+    sys.stdout.reconfigure(encoding='utf-8')
+    sys.stderr.reconfigure(encoding='utf-8')
+
+# Adicionar raiz do projeto ao path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import structlog
+from app.ingestion.structure import parse_structure
+from app.ingestion.chunker import NORMATIVE_REFERENCE_PATTERN
+from app.ingestion import bacen_normativos
+
+
+# Implementações anteriores, mantidas aqui apenas como referência de comparação
+
+def legacy_split_by_article(text: str):
+    article_pattern = r'(?i)(Art\.?\s*\d+[º°]?)\s*[–-]?\s*'
+    matches = list(re.finditer(article_pattern, text))
+    if not matches:
+        return [(text, None)]
+    articles = []
+    for i, match in enumerate(matches):
+        end = matches[i + 1].start() if i + 1 < len(matches) else len(text)
+        article_num = re.sub(r'(?i)art\.?\s*', '', match.group(1)).strip()
+        articles.append((text[match.start():end].strip(), article_num))
+    return articles
+
+
+def legacy_split_article_by_inciso(article_text: str, article_num: str):
+    matches = list(re.finditer(r'(?i)([IVX]+[º°]?)\s*[–-]?\s*', article_text))
+    if not matches:
+        return [(article_text, f"Art. {article_num}")]
+    incisos = []
+    for i, match in enumerate(matches):
+        end = matches[i + 1].start() if i + 1 < len(matches) else len(article_text)
+        incisos.append((article_text[match.start():end].strip(), f"Art. {article_num}, {match.group(1)}"))
+    return incisos
+
+
+LEGACY_REFERENCE_PATTERNS = [
+    r'(?i)\b(artigo|art\.?)\s+\d+',
+    r'(?i)\b(inciso|inc\.?)\s+[IVX]+',
+    r'(?i)\b(parágrafo|par\.?)\s+\d+',
+    r'(?i)\b(resolução|circular|comunicado|instrução)',
+    r'(?i)\b(norma|normativo|regulamenta)',
+    r'(?i)\b(bacen|banco\s+central)',
+    r'(?i)\b(pix|open\s+finance)',
+    r'(?i)\b(obrigação|dever|proibição|permissão)',
+]
+
+
+def legacy_has_normative_reference(text: str) -> bool:
+    text_lower = text.lower()
+    if len(text.strip()) < 50:
+        return False
+    return any(re.search(pattern, text_lower) for pattern in LEGACY_REFERENCE_PATTERNS)
+
+
+def synthetic_normativo(articles: int = 2000) -> str:
+    """Gera normativo grande com artigos, parágrafos, incisos e alíneas"""
+    parts = ["RESOLUÇÃO BCB Nº 1, DE 12 DE AGOSTO DE 2020\n",
+             "Institui o arranjo de pagamentos Pix e aprova o seu Regulamento.\n"]
+    for n in range(1, articles + 1):
+        parts.append(f"Art. {n}º Os participantes do arranjo devem observar as regras deste Regulamento.\n")
+        if n % 3 == 0:
+            for r, roman in enumerate(["I", "II", "III", "IV", "V"]):
+                parts.append(f"{roman} - obrigação do participante número {r + 1} relativa ao Pix;\n")
+                if r == 1:
+                    parts.append("a) prestar informações ao Banco Central;\n")
+                    parts.append("b) manter registros pelo prazo de cinco anos.\n")
+        if n % 4 == 0:
+            parts.append("§ 1º O disposto neste artigo aplica-se às instituições de pagamento.\n")
+            parts.append("§ 2º Compete ao Banco Central regulamentar o disposto no caput.\n")
+        if n % 5 == 0:
+            parts.append("Parágrafo único. Esta norma entra em vigor na data de sua publicação.\n")
+    return "".join(parts)
+
+
+BENCH_METADATA = {"fonte": "benchmark", "norma": "Resolução BCB", "numero_norma": "1", "ano": 2020, "tema": "pix"}
+
+
+def load_texts(paths):
+    texts = []
+    for path in paths:
+        path = Path(path)
+        if path.suffix.lower() == ".json":
+            with open(path, "r", encoding="utf-8") as f:
+                texts.append(json.load(f).get("text", ""))
+        else:
+            texts.append(path.read_text(encoding="utf-8", errors="ignore"))
+    return texts
+
+
+def timeit(label: str, func, texts, repeat: int, total_chars: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for text in texts:
+            func(text)
+    elapsed = time.perf_counter() - start
+    mb_s = (total_chars * repeat) / elapsed / 1_000_000
+    print(f"  {label:<45} {elapsed * 1000 / repeat:9.2f} ms/iter  {mb_s:8.2f} MB/s")
+    return elapsed
+
+
+def legacy_full(text: str):
+    """Pipeline antigo: artigos + incisos de cada artigo + validação por chunk"""
+    for article_text, article_num in legacy_split_by_article(text):
+        for inciso_text, _ in legacy_split_article_by_inciso(article_text, article_num or "N/A"):
+            legacy_has_normative_reference(inciso_text)
+
+
+def structural_full(text: str):
+    """Pipeline novo: uma varredura estrutural + regex de referência combinado"""
+    structure = parse_structure(text)
+    for article in structure.articles or [structure.root]:
+        incisos = [node for node in article.walk() if node.kind == "inciso"] or [article]
+        for i, node in enumerate(incisos):
+            end = incisos[i + 1].start if i + 1 < len(incisos) else article.end
+            segment = text[node.start:end].strip()
+            len(segment.strip()) >= 50 and NORMATIVE_REFERENCE_PATTERN.search(segment)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark da segmentação de normativos")
+    parser.add_argument("files", nargs="*", help="Arquivos .json (save_chunks) ou texto puro")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--articles", type=int, default=2000, help="Artigos do normativo sintético")
+    args = parser.parse_args()
+    
+    # Logs de debug por artigo distorcem a medição
+    structlog.configure(wrapper_class=structlog.make_filtering_bound_logger(logging.WARNING))
+    
+    texts = load_texts(args.files) if args.files else [synthetic_normativo(args.articles)]
+    total_chars = sum(len(t) for t in texts)
+    print(f"\nCorpus: {len(texts)} texto(s), {total_chars / 1_000_000:.2f} M caracteres, repeat={args.repeat}\n")
+    
+    # Conferir que as fronteiras de artigos não mudaram
+    for text in texts:
+        legacy = [(num, body) for body, num in legacy_split_by_article(text)]
+        structure = parse_structure(text)
+        new = [(a.label, text[a.start:a.end].strip()) for a in structure.articles] or [(None, text)]
+        if legacy != new:
+            print("⚠️  Divergência nas fronteiras de artigos entre implementações")
+            break
+    else:
+        print("✅ Fronteiras de artigos idênticas à implementação anterior\n")
+    
+    print("Varredura:")
+    timeit("legacy split_by_article (só artigos)", legacy_split_by_article, texts, args.repeat, total_chars)
+    timeit("parse_structure (árvore completa)", parse_structure, texts, args.repeat, total_chars)
+    timeit("bacen_normativos.chunk_by_article", bacen_normativos.chunk_by_article, texts, args.repeat, total_chars)
+    print()
+    
+    print("Pipeline completo (artigo -> inciso -> referência normativa):")
+    t_old = timeit("legacy (3 varreduras + 8 regex/chunk)", legacy_full, texts, args.repeat, total_chars)
+    t_new = timeit("estrutural (1 varredura + 1 regex/chunk)", structural_full, texts, args.repeat, total_chars)
+    print(f"  speedup: {t_old / t_new:.2f}x\n")
+    
+    print("Contagem de tokens no JuridicalChunker:")
+    try:
+        from app.ingestion.chunker import JuridicalChunker
+        JuridicalChunker()
+    except Exception as e:
+        print(f"  ⚠️  tiktoken indisponível ({e})\n")
+        return
+    
+    class EncodePerSpan:
+        """Contagem antiga: recodifica cada span avaliado"""
+        
+        def __init__(self, chunker, text):
+            self.chunker = chunker
+            self.text = text
+        
+        def count(self, start, end):
+            return self.chunker.count_tokens(self.text[start:end])
+    
+    class LegacyCountingChunker(JuridicalChunker):
+        def token_map(self, text):
+            return EncodePerSpan(self, text)
+    
+    for max_tokens in (600, 100):
+        legacy = LegacyCountingChunker(max_tokens)
+        chunker = JuridicalChunker(max_tokens)
+        t_old = timeit(f"encode por span (max_tokens={max_tokens})", lambda text: legacy.chunk(text, BENCH_METADATA), texts, args.repeat, total_chars)
+        t_new = timeit(f"TokenOffsetMap (max_tokens={max_tokens})", lambda text: chunker.chunk(text, BENCH_METADATA), texts, args.repeat, total_chars)
+        print(f"  speedup: {t_old / t_new:.2f}x")
+    print()
+
+
+if __name__ == "__main__":
+    main()
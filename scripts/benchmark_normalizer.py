@@ -0,0 +1,186 @@
+"""
+Benchmark e verificação do normalizador de HTML dos normativos do Bacen.
+
+Compara a normalização anterior (BeautifulSoup com várias passadas sobre a
+árvore: find_all/get_text/replace_with por tag) com normalize_html atual
+(uma única passada pelos eventos do parser lxml).
+
+Corpus de fixtures:
+- resoluções sintéticas no formato do campo 'Texto' da API (artigos,
+  parágrafos, incisos, <s> revogado, span/font aninhados, tabelas, scripts)
+- respostas reais do cache em disco (--cached), se existirem
+
+Antes de medir, verifica que as duas versões produzem exatamente o mesmo
+texto para todo o corpus.
+
+Uso:
+    python scripts/benchmark_normalizer.py
+    python scripts/benchmark_normalizer.py --artigos 400 --repeat 5
+    python scripts/benchmark_normalizer.py --cached
+"""
+import argparse
+import random
+import re
+import sys
+import time
+from pathlib import Path
+
+# Configurar encoding para Windows
+if sys.platform == "win32":
+    sys.stdout.reconfigure(encoding='utf-8')
+    sys.stderr.reconfigure(encoding='utf-8')
+
+# Adicionar raiz do projeto ao path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from bs4 import BeautifulSoup
+from app.ingestion.bacen_cache import get_response_cache
+from app.ingestion.bacen_normativos import normalize_html
+
+
+def legacy_normalize_html(html: str) -> str:
+    """Normalização anterior (BeautifulSoup), sem logs"""
+    if not html or not html.strip():
+        return ""
+    
+    soup = BeautifulSoup(html, "lxml")
+    for revoked in soup.find_all("s"):
+        revoked.decompose()
+    for tag in soup.find_all(["script", "style", "noscript"]):
+        tag.decompose()
+    for tag in soup.find_all(["span", "div", "font"]):
+        if not tag.find_all():
+            text = tag.get_text(strip=True)
+            if text:
+                tag.replace_with(text)
+            else:
+                tag.decompose()
+        else:
+            tag.attrs = {}
+    for br in soup.find_all("br"):
+        br.replace_with("\n")
+    for p in soup.find_all("p"):
+        text = p.get_text(separator=" ", strip=True)
+        if text:
+            p.replace_with(f"{text}\n")
+        else:
+            p.decompose()
+    
+    text = soup.get_text(separator="\n", strip=True)
+    if not text or len(text.strip()) < 50:
+        body = soup.find("body") or soup
+        text = body.get_text(separator="\n", strip=True)
+    
+    text = re.sub(r'\n{3,}', '\n\n', text)
+    normalized_lines = []
+    for line in text.split('\n'):
+        leading_spaces = len(line) - len(line.lstrip())
+        content = re.sub(r' +', ' ', line.strip())
+        normalized_lines.append(' ' * leading_spaces + content if content else '')
+    return '\n'.join(normalized_lines).strip()
+
+
+# Fixtures sintéticas
+
+INCISOS = ["I", "II", "III", "IV", "V", "VI", "VII", "VIII"]
+
+FRASES = [
+    "os participantes do arranjo devem observar as regras deste Regulamento",
+    "a instituição de pagamento deverá manter controles internos compatíveis",
+    "o prazo para devolução dos recursos será de até noventa dias",
+    "as transações Pix serão liquidadas no Sistema de Pagamentos Instantâneos",
+    "o consentimento do cliente deverá ser obtido de forma clara e objetiva",
+]
+
+
+def synthetic_normativo(artigos: int, seed: int) -> str:
+    """HTML no formato do campo 'Texto' da API de normativos"""
+    rng = random.Random(seed)
+    parts = [
+        "<html><head><title>Resolução BCB</title><style>p { margin: 0 }</style>",
+        "<script>var x = '<p>não é texto</p>';</script></head><body>",
+        '<div class="ementa"><p style="text-align: justify"><span>Institui o '
+        "Regulamento do arranjo de pagamentos.</span></p></div>",
+    ]
+    for n in range(1, artigos + 1):
+        ordinal = f"{n}º" if n < 10 else f"{n}."
+        frase = rng.choice(FRASES)
+        parts.append(
+            f'<p class="artigo"><font face="Arial"><b>Art. {ordinal}</b></font> '
+            f"<span>{frase.capitalize()}.</span></p>"
+        )
+        if rng.random() < 0.2:
+            parts.append(f"<p><s>Art. {ordinal}-A Revogado pela Resolução BCB nº {n}.</s></p>")
+        for inciso in INCISOS[:rng.randint(0, len(INCISOS))]:
+            parts.append(
+                f'<p style="margin-left: 20px">{inciso} -&nbsp;<span>{rng.choice(FRASES)};</span>'
+                f"<!-- inciso {inciso} --></p>"
+            )
+        if rng.random() < 0.5:
+            parts.append(f"<div><span>§ 1º</span> <span>{rng.choice(FRASES)}.</span><br>"
+                         f"<font>Parágrafo único.</font> {rng.choice(FRASES)}.</div>")
+        if rng.random() < 0.1:
+            parts.append(
+                "<table><tr><td><span>Tarifa</span></td><td>R$ 10,00</td></tr>"
+                "<tr><td>Prazo</td><td><div>  30   dias  </div></td></tr></table>"
+            )
+    parts.append("</body></html>")
+    return "\n".join(parts)
+
+
+def load_corpus(artigos: int, documentos: int, cached: bool):
+    corpus = [
+        (f"sintético {i + 1} ({artigos} artigos)", synthetic_normativo(artigos, seed=i))
+        for i in range(documentos)
+    ]
+    if cached:
+        cache = get_response_cache()
+        for tipo, numero in cache.list_normativos():
+            try:
+                conteudo = cache.load(tipo, numero)["conteudo"][0]
+            except (KeyError, IndexError, TypeError):
+                continue
+            if conteudo.get("Texto"):
+                corpus.append((f"{tipo} {numero}", conteudo["Texto"]))
+    return corpus
+
+
+def best_time(func, corpus, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _, html in corpus:
+            func(html)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do normalizador de HTML do Bacen")
+    parser.add_argument("--artigos", type=int, default=200, help="Artigos por normativo sintético")
+    parser.add_argument("--documentos", type=int, default=10, help="Normativos sintéticos")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--cached", action="store_true", help="Incluir respostas do cache em disco")
+    args = parser.parse_args()
+    
+    corpus = load_corpus(args.artigos, args.documentos, args.cached)
+    total_mb = sum(len(html) for _, html in corpus) / 1_048_576
+    print(f"\n{len(corpus)} documentos, {total_mb:.2f} MB de HTML, melhor de {args.repeat}\n")
+    
+    # Verificação: mesma saída em todo o corpus
+    divergentes = [name for name, html in corpus if legacy_normalize_html(html) != normalize_html(html)]
+    if divergentes:
+        print(f"❌ Saída diferente em {len(divergentes)} documento(s): {', '.join(divergentes[:5])}")
+        sys.exit(1)
+    print("✅ Saída idêntica à normalização anterior em todos os documentos\n")
+    
+    t_old = best_time(legacy_normalize_html, corpus, args.repeat)
+    t_new = best_time(normalize_html, corpus, args.repeat)
+    print(f"  {'BeautifulSoup (anterior)':<28} {t_old * 1000:9.2f} ms   {total_mb / t_old:6.2f} MB/s")
+    print(f"  {'lxml passada única':<28} {t_new * 1000:9.2f} ms   {total_mb / t_new:6.2f} MB/s")
+    print(f"  {t_old / t_new:.2f}x mais rápido\n")
+
+
+if __name__ == "__main__":
+    main()
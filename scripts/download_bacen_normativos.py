@@ -5,6 +5,8 @@ Uso:
     python scripts/download_bacen_normativos.py pix
     python scripts/download_bacen_normativos.py open_finance
     python scripts/download_bacen_normativos.py --tipo "Instrução Normativa BCB" --numero 513
+    python scripts/download_bacen_normativos.py pix --offline          # só do cache de respostas
+    python scripts/download_bacen_normativos.py --cached --output data/renormalizado
 """
 import sys
 import argparse
@@ -19,7 +21,7 @@ if sys.platform == "win32":
 project_root = Path(__file__).parent.parent
 sys.path.insert(0, str(project_root))
 
-from app.ingestion.bacen_normativos import main, process_normativo
+from app.ingestion.bacen_normativos import main, process_normativo, reprocess_cached
 from app.config import get_settings
 from app.utils.logger import setup_logger, get_logger
 
@@ -53,7 +55,7 @@ NORMATIVOS_OPEN_FINANCE = [
 ]
 
 
-def download_by_domain(domain: str):
+def download_by_domain(domain: str, offline: bool = False):
     """Baixa normativos de um domínio específico."""
     settings = get_settings()
     output_dir = Path(settings.data_raw_path)
@@ -73,16 +75,17 @@ def download_by_domain(domain: str):
     print(f"{'='*60}")
     print(f"Total: {len(normativos)} normativos\n")
     
-    results = main(normativos, str(output_dir))
+    results = main(normativos, str(output_dir), offline=offline or None)
     
     # Resumo
     successful = sum(1 for r in results if r.get("success"))
+    not_modified = sum(1 for r in results if r.get("not_modified"))
     print(f"\n{'='*60}")
-    print(f"✅ Concluído: {successful}/{len(normativos)} normativos processados")
+    print(f"✅ Concluído: {successful}/{len(normativos)} normativos processados ({not_modified} sem alterações)")
     print(f"{'='*60}\n")
 
 
-def download_single(tipo: str, numero: int):
+def download_single(tipo: str, numero: int, offline: bool = False):
     """Baixa um normativo específico."""
     settings = get_settings()
     output_dir = Path(settings.data_raw_path)
@@ -91,7 +94,7 @@ def download_single(tipo: str, numero: int):
     print(f"Baixando normativo: {tipo} {numero}")
     print(f"{'='*60}\n")
     
-    result = process_normativo(tipo, numero, output_dir / "temp")
+    result = process_normativo(tipo, numero, output_dir, by_theme=True, offline=offline or None)
     
     if result.get("success"):
         print(f"✅ Sucesso!")
@@ -125,14 +128,35 @@ if __name__ == "__main__":
         help="Número do normativo"
     )
     
+    parser.add_argument(
+        "--offline",
+        action="store_true",
+        help="Usar apenas o cache de respostas (sem rede)"
+    )
+    parser.add_argument(
+        "--cached",
+        action="store_true",
+        help="Renormalizar todos os normativos do cache de respostas (sem rede)"
+    )
+    parser.add_argument(
+        "--output",
+        type=str,
+        help="Diretório de saída para --cached (padrão: DATA_RAW_PATH)"
+    )
+    
     args = parser.parse_args()
     
-    if args.tipo and args.numero:
+    if args.cached:
+        # Reprocessar o corpus inteiro a partir do cache
+        results = reprocess_cached(args.output or get_settings().data_raw_path)
+        successful = sum(1 for r in results if r.get("success"))
+        print(f"\n✅ {successful}/{len(results)} normativos reprocessados do cache\n")
+    elif args.tipo and args.numero:
         # Baixar normativo específico
-        download_single(args.tipo, args.numero)
+        download_single(args.tipo, args.numero, args.offline)
     elif args.domain:
         # Baixar por domínio
-        download_by_domain(args.domain)
+        download_by_domain(args.domain, args.offline)
     else:
         parser.print_help()
         print("\nExemplos:")
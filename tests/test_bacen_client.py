@@ -0,0 +1,189 @@
+"""
+Testes do BacenHttpClient contra um servidor HTTP local (http.server).
+
+Cobrem retentativas com Retry-After (5xx/429), o limite de espera do
+Retry-After, requisições condicionais (ETag / If-Modified-Since -> 304) e o
+limite de requisições por host.
+"""
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List
+
+import pytest
+import requests
+
+from app.ingestion.bacen_client import BacenHttpClient, HostRateLimiter
+
+LAST_MODIFIED = "Wed, 01 Oct 2025 12:00:00 GMT"
+
+
+class StubBacen:
+    """Respostas programadas por caminho e registro das requisições recebidas"""
+    
+    def __init__(self):
+        self.responses: Dict[str, List[tuple]] = {}
+        self.requests: List[dict] = []
+        self.lock = threading.Lock()
+    
+    def program(self, path: str, *responses: tuple):
+        """(status, headers[, body]) por requisição; a última se repete"""
+        self.responses[path] = list(responses)
+    
+    def next_response(self, path: str) -> tuple:
+        with self.lock:
+            queue = self.responses.get(path) or [(404, {})]
+            return queue.pop(0) if len(queue) > 1 else queue[0]
+    
+    def hits(self, path: str) -> List[dict]:
+        return [request for request in self.requests if request["path"] == path]
+
+
+@pytest.fixture
+def stub():
+    state = StubBacen()
+    
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+        
+        def do_GET(self):
+            path = self.path.split("?")[0]
+            with state.lock:
+                state.requests.append({"path": path, "headers": dict(self.headers), "at": time.monotonic()})
+            response = state.next_response(path)
+            status, headers = response[0], response[1]
+            body = response[2] if len(response) > 2 else (b"" if status == 304 else b'{"ok": true}')
+            self.send_response(status)
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+    
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    state.base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    yield state
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def client(tmp_path):
+    http = BacenHttpClient(
+        requests_per_second=0,
+        max_retries=3,
+        timeout=5,
+        validators_path=tmp_path / "validators.json",
+        max_retry_wait=5
+    )
+    yield http
+    http.close()
+
+
+def test_retenta_5xx_respeitando_retry_after(stub, client):
+    stub.program("/normativo", (503, {"Retry-After": "0.3"}), (200, {}))
+    
+    response = client.get(stub.base_url + "/normativo")
+    
+    assert response.status_code == 200
+    hits = stub.hits("/normativo")
+    assert len(hits) == 2
+    assert hits[1]["at"] - hits[0]["at"] >= 0.3
+
+
+def test_retenta_429_com_retry_after_em_data_http(stub, client):
+    retry_at = time.strftime("%a, %d %b %Y %H:%M:%S GMT", time.gmtime(time.time() + 1))
+    stub.program("/normativo", (429, {"Retry-After": retry_at}), (200, {}))
+    
+    response = client.get(stub.base_url + "/normativo")
+    
+    assert response.status_code == 200
+    assert len(stub.hits("/normativo")) == 2
+
+
+def test_desiste_quando_retry_after_passa_do_maximo(stub, client):
+    stub.program("/normativo", (503, {"Retry-After": "3600"}), (200, {}))
+    
+    started = time.monotonic()
+    with pytest.raises(requests.HTTPError):
+        client.get(stub.base_url + "/normativo")
+    
+    assert time.monotonic() - started < 2
+    assert len(stub.hits("/normativo")) == 1
+
+
+def test_erro_persistente_esgota_retentativas(stub, client):
+    stub.program("/normativo", (500, {"Retry-After": "0"}))
+    
+    with pytest.raises(requests.HTTPError):
+        client.get(stub.base_url + "/normativo")
+    
+    assert len(stub.hits("/normativo")) == client.max_retries + 1
+
+
+def test_requisicao_condicional_retorna_304(stub, client, tmp_path):
+    stub.program(
+        "/normativo",
+        (200, {"ETag": '"v1"', "Last-Modified": LAST_MODIFIED}),
+        (304, {"ETag": '"v1"'})
+    )
+    url = stub.base_url + "/normativo"
+    
+    first = client.get(url, params={"numero": "1"}, conditional=True)
+    assert first.status_code == 200
+    assert "If-None-Match" not in stub.hits("/normativo")[0]["headers"]
+    client.remember(first)
+    
+    second = client.get(url, params={"numero": "1"}, conditional=True)
+    assert second.status_code == 304
+    headers = stub.hits("/normativo")[1]["headers"]
+    assert headers["If-None-Match"] == '"v1"'
+    assert headers["If-Modified-Since"] == LAST_MODIFIED
+    
+    # Validadores persistidos valem para um novo cliente (próximo ciclo)
+    client.save()
+    reloaded = BacenHttpClient(requests_per_second=0, validators_path=tmp_path / "validators.json")
+    assert reloaded.validators.headers_for(client.request_url(url, {"numero": "1"}))["If-None-Match"] == '"v1"'
+    reloaded.close()
+
+
+def test_validadores_so_sao_gravados_apos_remember(stub, client):
+    stub.program("/normativo", (200, {"ETag": '"v1"'}))
+    url = stub.base_url + "/normativo"
+    
+    client.get(url, conditional=True)
+    client.get(url, conditional=True)
+    
+    assert all("If-None-Match" not in hit["headers"] for hit in stub.hits("/normativo"))
+
+
+def test_limite_de_requisicoes_por_host(stub, tmp_path):
+    stub.program("/normativo", (200, {}))
+    http = BacenHttpClient(requests_per_second=10, max_retries=0, validators_path=tmp_path / "validators.json")
+    
+    threads = [threading.Thread(target=http.get, args=(stub.base_url + "/normativo",)) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    http.close()
+    
+    times = sorted(hit["at"] for hit in stub.hits("/normativo"))
+    assert len(times) == 5
+    # 5 requisições a 10/s: ao menos 4 intervalos de 100 ms
+    assert times[-1] - times[0] >= 0.35
+
+
+def test_limite_e_independente_por_host():
+    limiter = HostRateLimiter(requests_per_second=2)
+    
+    started = time.monotonic()
+    limiter.wait("a.bcb.gov.br")
+    limiter.wait("b.bcb.gov.br")
+    assert time.monotonic() - started < 0.1
+    
+    limiter.wait("a.bcb.gov.br")
+    assert time.monotonic() - started >= 0.45
@@ -0,0 +1,30 @@
+"""Testes do corpus consolidado: índice acompanha o arquivo ao arquivar"""
+from app.ingestion.corpus import archive_file, read_index, save_normativo_corpus
+
+NORMATIVO = {"Tipo": "Resolução BCB", "Numero": 1, "VersaoNormativo": 2, "Titulo": "Pix"}
+CHUNKS = [{"text": "Art. 1º Fica instituído o Pix.", "metadata": {"artigo": "1", "tema": "pix"}}]
+
+
+def test_archive_file_move_a_entrada_do_indice(tmp_path):
+    raw, processed = tmp_path / "raw", tmp_path / "processed"
+    path = save_normativo_corpus(CHUNKS, raw, NORMATIVO, 2020)
+    save_normativo_corpus(CHUNKS, raw, {**NORMATIVO, "Numero": 2}, 2020)
+    
+    archived = archive_file(path, processed)
+    
+    assert archived == processed / path.name and archived.exists() and not path.exists()
+    assert path.name not in read_index(raw)
+    assert read_index(processed)[path.name]["versao"] == "2"
+    assert len(read_index(raw)) == 1
+
+
+def test_archive_file_sem_entrada_no_indice(tmp_path):
+    raw, processed = tmp_path / "raw", tmp_path / "processed"
+    raw.mkdir()
+    pdf = raw / "manual.pdf"
+    pdf.write_bytes(b"%PDF")
+    
+    archive_file(pdf, processed)
+    
+    assert (processed / "manual.pdf").exists()
+    assert read_index(processed) == {}
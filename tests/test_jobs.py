@@ -0,0 +1,93 @@
+"""Testes do registro de jobs de /reindex compartilhado entre processos (SQLite)"""
+import sqlite3
+import time
+
+from app.ingestion.jobs import ReindexJobStore
+
+
+def test_deduplica_e_reivindica_entre_processos(tmp_path):
+    # Duas instâncias no mesmo arquivo = dois workers do gunicorn
+    worker_a, worker_b = ReindexJobStore(tmp_path / "jobs.db"), ReindexJobStore(tmp_path / "jobs.db")
+    
+    job, created = worker_a.submit("pix", force=True, resume=False)
+    same, created_again = worker_b.submit("pix", force=True, resume=False)
+    assert created and not created_again and same.job_id == job.job_id
+    
+    assert worker_b.claim_next("b:1").job_id == job.job_id
+    assert worker_a.claim_next("a:1") is None
+    assert worker_a.get(job.job_id).worker == "b:1"
+
+
+def test_cancelamento_chega_ao_processo_do_job(tmp_path):
+    store = ReindexJobStore(tmp_path / "jobs.db")
+    job, _ = store.submit("pix", force=True, resume=False)
+    store.claim_next("b:1")
+    
+    assert store.heartbeat(job.job_id, {"embeddings_done": 3}) is False
+    assert ReindexJobStore(tmp_path / "jobs.db").request_cancel(job.job_id).message == "Cancelamento solicitado"
+    assert store.heartbeat(job.job_id, {"embeddings_done": 5}) is True
+    assert store.get(job.job_id).progress["embeddings_done"] == 5
+
+
+def test_job_na_fila_cancelado_nao_e_reivindicado(tmp_path):
+    store = ReindexJobStore(tmp_path / "jobs.db")
+    job, _ = store.submit("pix", force=True, resume=False)
+    
+    assert store.request_cancel(job.job_id).status == "cancelled"
+    assert store.claim_next("a:1") is None
+
+
+def test_job_sem_heartbeat_vira_failed(tmp_path):
+    store = ReindexJobStore(tmp_path / "jobs.db")
+    job, _ = store.submit("pix", force=True, resume=False)
+    store.claim_next("a:1")
+    with sqlite3.connect(tmp_path / "jobs.db") as conn:
+        conn.execute("UPDATE reindex_jobs SET heartbeat_at = 0")
+    
+    assert store.expire_stale() == 1
+    assert store.get(job.job_id).status == "failed"
+    # Domínio liberado para um novo job
+    assert store.submit("pix", force=True, resume=True)[1]
+
+
+def test_criador_morreu_antes_de_reivindicar(tmp_path, monkeypatch):
+    import app.ingestion.jobs as jobs
+    import app.ingestion.main as ingestion
+    
+    ran = []
+    monkeypatch.setattr(ingestion, "ingest_documents", lambda domain, **kwargs: ran.append(domain))
+    monkeypatch.setattr(jobs, "POLL_SECONDS", 0.05)
+    
+    # Worker A enfileirou e morreu sem nunca rodar o loop de worker
+    orphan, _ = ReindexJobStore(tmp_path / "jobs.db").submit("pix", force=True, resume=False)
+    
+    # Worker B, vivo: o POST repetido devolve o mesmo job e B o executa
+    manager = jobs.ReindexJobManager(ReindexJobStore(tmp_path / "jobs.db"))
+    try:
+        assert manager.submit("pix").job_id == orphan.job_id
+        for _ in range(100):
+            if manager.get(orphan.job_id).status == "succeeded":
+                break
+            time.sleep(0.05)
+        assert manager.get(orphan.job_id).status == "succeeded"
+        assert ran == ["pix"]
+    finally:
+        manager.shutdown()
+
+
+def test_job_na_fila_sem_worker_vivo_vira_failed(tmp_path):
+    store = ReindexJobStore(tmp_path / "jobs.db")
+    job, _ = store.submit("pix", force=True, resume=False)
+    
+    # Com um worker vivo o job só está esperando a vez
+    store.touch_worker("b:1")
+    with sqlite3.connect(tmp_path / "jobs.db") as conn:
+        conn.execute("UPDATE reindex_jobs SET heartbeat_at = 0")
+    assert store.expire_stale() == 0
+    
+    # Todos os workers sumiram: o job não bloqueia mais o domínio
+    with sqlite3.connect(tmp_path / "jobs.db") as conn:
+        conn.execute("UPDATE reindex_workers SET seen_at = 0")
+    assert store.expire_stale() == 1
+    assert store.get(job.job_id).status == "failed"
+    assert store.submit("pix", force=True, resume=False)[1]
@@ -0,0 +1,62 @@
+"""
+Testes do OpenAIGateway com um recurso falso no lugar de client.embeddings.
+
+Cobrem a divisão da concorrência entre processos e o Retry-After do
+servidor: respeitado por inteiro e, acima da espera máxima, falha na hora.
+"""
+import time
+from types import SimpleNamespace
+
+import httpx
+import pytest
+from openai import RateLimitError
+
+from app.rag.openai_gateway import OpenAIGateway
+
+
+def rate_limit_error(retry_after: str) -> RateLimitError:
+    request = httpx.Request("POST", "https://api.openai.com/v1/embeddings")
+    response = httpx.Response(429, headers={"retry-after": retry_after}, request=request)
+    return RateLimitError("Rate limit", response=response, body=None)
+
+
+class FakeResource:
+    """create() levanta os erros programados e depois responde"""
+    
+    def __init__(self, *errors: Exception):
+        self.errors = list(errors)
+        self.calls = []
+    
+    def create(self, **kwargs):
+        self.calls.append(time.monotonic())
+        if self.errors:
+            raise self.errors.pop(0)
+        return SimpleNamespace(data=[], usage=None)
+
+
+def test_concorrencia_dividida_entre_processos():
+    assert OpenAIGateway(max_concurrency=8, processes=4).max_concurrency == 2
+    # Mínimo de 1 vaga por processo
+    assert OpenAIGateway(max_concurrency=8, processes=17).max_concurrency == 1
+
+
+def test_retry_after_e_respeitado_por_inteiro():
+    gateway = OpenAIGateway(max_retries=2, max_wait_seconds=5)
+    resource = FakeResource(rate_limit_error("0.3"))
+    
+    gateway.embeddings(SimpleNamespace(embeddings=resource), model="m", input=["texto"])
+    
+    assert len(resource.calls) == 2
+    assert resource.calls[1] - resource.calls[0] >= 0.3
+
+
+def test_retry_after_acima_da_espera_maxima_falha_na_hora():
+    gateway = OpenAIGateway(max_retries=5, max_wait_seconds=1)
+    resource = FakeResource(rate_limit_error("60"))
+    
+    started = time.monotonic()
+    with pytest.raises(RateLimitError):
+        gateway.embeddings(SimpleNamespace(embeddings=resource), model="m", input=["texto"])
+    
+    assert time.monotonic() - started < 1
+    assert len(resource.calls) == 1
@@ -0,0 +1,160 @@
+"""
+Testes do rate limiting da API com o backend em memória e backends falsos.
+
+Cobrem o token bucket (reposição, descarte de ociosos, max_keys), a
+identidade e os limites por API key e rota, o middleware (429 com
+Retry-After) e o fail-open quando o backend compartilhado cai.
+"""
+import asyncio
+from typing import Optional
+
+import pytest
+from fastapi.testclient import TestClient
+from starlette.requests import Request
+
+from app.api.rate_limit import (
+    InMemoryBackend,
+    RateLimiter,
+    RateLimitRule,
+    parse_api_key_limits,
+    set_rate_limiter,
+)
+
+
+def take(backend, key: str, capacity: int, refill: float, now: float):
+    return asyncio.run(backend.take(key, capacity, refill, now))
+
+
+def make_request(path: str, host: str = "10.0.0.1", api_key: Optional[str] = None) -> Request:
+    headers = [(b"x-api-key", api_key.encode())] if api_key else []
+    return Request({
+        "type": "http",
+        "method": "GET",
+        "path": path,
+        "query_string": b"",
+        "headers": headers,
+        "client": (host, 12345),
+        "server": ("testserver", 80),
+        "scheme": "http",
+    })
+
+
+def make_limiter(backend=None, api_keys: str = "", fail_open: bool = True) -> RateLimiter:
+    return RateLimiter(
+        backend or InMemoryBackend(),
+        [
+            ("/chat", RateLimitRule("chat", 2)),
+            ("/reindex", RateLimitRule("reindex", 1)),
+            ("/reindex/jobs", RateLimitRule("reindex_jobs", 5)),
+        ],
+        default_rule=RateLimitRule("default", 3),
+        api_key_limits=parse_api_key_limits(api_keys),
+        fail_open=fail_open
+    )
+
+
+class FailingBackend:
+    """Backend compartilhado fora do ar (ex: Redis caído)"""
+    
+    async def take(self, key, capacity, refill_per_second, now):
+        raise ConnectionError("redis indisponível")
+
+
+def test_bucket_esgota_e_repoe_com_o_tempo():
+    backend = InMemoryBackend()
+    
+    assert take(backend, "k", 2, 1.0, now=100.0)[0]
+    assert take(backend, "k", 2, 1.0, now=100.0)[0]
+    assert not take(backend, "k", 2, 1.0, now=100.0)[0]
+    # 1 token por segundo: meio segundo depois ainda não há um inteiro
+    assert not take(backend, "k", 2, 1.0, now=100.5)[0]
+    assert take(backend, "k", 2, 1.0, now=101.5)[0]
+
+
+def test_buckets_ociosos_sao_descartados():
+    backend = InMemoryBackend(idle_seconds=10)
+    take(backend, "a", 5, 1.0, now=0.0)
+    take(backend, "b", 5, 1.0, now=5.0)
+    
+    take(backend, "c", 5, 1.0, now=12.0)
+    
+    assert len(backend) == 2
+    assert "a" not in backend._buckets
+
+
+def test_max_keys_limita_a_memoria():
+    backend = InMemoryBackend(idle_seconds=3600, max_keys=3)
+    for index in range(10):
+        take(backend, f"ip:{index}", 5, 1.0, now=float(index))
+    
+    assert len(backend) == 3
+    # Sobram os usados por último
+    assert list(backend._buckets) == ["ip:7", "ip:8", "ip:9"]
+
+
+def test_identidade_por_ip_e_por_api_key_configurada():
+    limiter = make_limiter(api_keys="segredo:100")
+    
+    assert limiter.identity(make_request("/chat", host="10.0.0.9")) == ("ip:10.0.0.9", None)
+    # Chave não configurada não ganha bucket próprio
+    assert limiter.identity(make_request("/chat", api_key="inventada"))[0] == "ip:10.0.0.1"
+    identity, limits = limiter.identity(make_request("/chat", api_key="segredo"))
+    assert identity.startswith("key:") and "segredo" not in identity
+    assert limits["chat"] == 100
+
+
+def test_check_usa_a_regra_da_rota():
+    limiter = make_limiter()
+    
+    decisions = [asyncio.run(limiter.check(make_request("/chat"))) for _ in range(3)]
+    assert [decision.allowed for decision in decisions] == [True, True, False]
+    assert decisions[-1].retry_after > 0
+    # Orçamentos separados: /chat esgotado não afeta as demais rotas
+    assert asyncio.run(limiter.check(make_request("/"))).allowed
+    assert asyncio.run(limiter.check(make_request("/chat", host="10.0.0.2"))).allowed
+
+
+def test_status_de_jobs_nao_consome_orcamento_de_reindex():
+    limiter = make_limiter()
+    
+    assert asyncio.run(limiter.check(make_request("/reindex"))).allowed
+    assert not asyncio.run(limiter.check(make_request("/reindex"))).allowed
+    assert asyncio.run(limiter.check(make_request("/reindex/jobs/abc"))).limit == 5
+    assert asyncio.run(limiter.check(make_request("/reindex/jobs"))).allowed
+
+
+def test_limite_da_api_key_vale_por_rota():
+    limiter = make_limiter(api_keys="segredo:50,segredo:reindex:2")
+    
+    assert asyncio.run(limiter.check(make_request("/chat", api_key="segredo"))).limit == 50
+    assert asyncio.run(limiter.check(make_request("/reindex", api_key="segredo"))).limit == 2
+    # Sem limite da chave para a rota: vale o da regra
+    assert asyncio.run(limiter.check(make_request("/reindex/jobs", api_key="segredo"))).limit == 5
+
+
+@pytest.mark.parametrize("fail_open", [True, False])
+def test_backend_indisponivel(fail_open):
+    limiter = make_limiter(backend=FailingBackend(), fail_open=fail_open)
+    
+    decision = asyncio.run(limiter.check(make_request("/chat")))
+    
+    assert decision.allowed is fail_open
+
+
+@pytest.fixture
+def client():
+    from app.api.main import app
+    
+    set_rate_limiter(make_limiter())
+    yield TestClient(app)
+    set_rate_limiter(None)
+
+
+def test_middleware_responde_429_com_retry_after(client):
+    responses = [client.get("/") for _ in range(4)]
+    
+    assert [response.status_code for response in responses] == [200, 200, 200, 429]
+    assert responses[0].headers["X-RateLimit-Limit"] == "3"
+    assert responses[0].headers["X-RateLimit-Remaining"] == "2"
+    assert responses[-1].json() == {"error": "Rate limit exceeded"}
+    assert int(responses[-1].headers["Retry-After"]) >= 1
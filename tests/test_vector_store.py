@@ -0,0 +1,42 @@
+"""Testes da indexação em lotes (Qdrant embutido e embedder falso)"""
+from types import SimpleNamespace
+
+from qdrant_client import QdrantClient
+
+from app.ingestion.checkpoint import IngestionJournal
+from app.ingestion.profiling import StubEmbeddings
+from app.models.records import ChunkMetadata, ChunkRecord
+from app.rag.vector_store import VectorStore
+
+
+class CountingEmbeddings(StubEmbeddings):
+    """Registra o tamanho do input de cada requisição"""
+    
+    def __init__(self):
+        super().__init__()
+        self.requests = []
+    
+    def create(self, model: str, input):
+        self.requests.append(len(input) if isinstance(input, list) else 1)
+        return super().create(model=model, input=input)
+
+
+def test_index_chunks_envia_embeddings_em_lotes(tmp_path, monkeypatch):
+    embeddings = CountingEmbeddings()
+    store = VectorStore(client=QdrantClient(":memory:"), openai_client=SimpleNamespace(embeddings=embeddings))
+    monkeypatch.setattr(store.settings, "index_batch_size", 4)
+    store.ensure_collection("pix")
+    metadata = ChunkMetadata(fonte="bcb", norma="Resolução BCB", numero_norma="1", ano=2024, tema="pix")
+    chunks = [ChunkRecord(text=f"Art. {i}. Texto do artigo {i} do regulamento.", metadata=metadata) for i in range(10)]
+    chunks[3].text = "  "
+    source = tmp_path / "regulamento.json"
+    source.write_text("{}")
+    journal = IngestionJournal(tmp_path / "journal", source, "v1", len(chunks))
+    journal.load()
+    
+    store.index_chunks("pix", chunks, journal=journal)
+    
+    # 9 chunks válidos: uma requisição por lote de 4
+    assert embeddings.requests == [4, 4, 1]
+    assert store.client.count("pix").count == 9
+    assert len(journal.embedded) == 9 and not journal.uncommitted()